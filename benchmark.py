@@ -0,0 +1,377 @@
+"""Pomiary wydajności operacji hurtowni na syntetycznych plikach CSV (bez interfejsu graficznego).
+
+Przykład:
+    python benchmark.py --rows 1000000 --numeric 6 --text 3 --save-baseline bazowy.json
+    python benchmark.py --rows 1000000 --numeric 6 --text 3 --baseline bazowy.json
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine import (CHUNK_ROWS, FilterQuery, Predicate, Session, current_rss, format_cell,
+                    is_numeric_column)
+
+SCREEN_ROWS = 50  # Wiersze i kolumny jednego ekranu tabeli (jak w VirtualTable)
+SCREEN_COLUMNS = 20
+REGRESSION_RATIO = 1.2  # Wolniej o ponad 20% niż w pomiarze bazowym = regresja
+
+
+def generate_csv(path, rows, numeric=4, integers=2, texts=2, dates=1, cardinality=1000, null_ratio=0.05,
+                 seed=0, chunk_rows=CHUNK_ROWS):
+    """Zapisuje syntetyczny CSV (separator ';') fragmentami - rozmiar nie jest ograniczony pamięcią.
+
+    Kolumny: num_* (rozkład normalny), int_* i txt_* (`cardinality` różnych wartości), date_*;
+    każda komórka jest pusta z prawdopodobieństwem `null_ratio`.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"k{i:07d}" for i in range(cardinality)], dtype=object)
+    start_date = np.datetime64('2020-01-01')
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as handle:
+        for first in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - first)
+            chunk = {}
+            for j in range(numeric):
+                chunk[f"num_{j}"] = rng.normal(100.0 * j, 10.0 + j, n)
+            for j in range(integers):
+                chunk[f"int_{j}"] = rng.integers(0, cardinality, n)
+            for j in range(texts):
+                chunk[f"txt_{j}"] = vocabulary[rng.integers(0, cardinality, n)]
+            for j in range(dates):
+                days = rng.integers(0, 3650, n).astype('timedelta64[D]')
+                chunk[f"date_{j}"] = pd.to_datetime(start_date + days).strftime('%Y-%m-%d')
+            frame = pd.DataFrame(chunk)
+            if null_ratio > 0:
+                frame = frame.mask(rng.random(frame.shape) < null_ratio)
+            frame.to_csv(handle, sep=';', index=False, header=first == 0)
+    os.replace(tmp_path, path)
+    return path
+
+
+def dataset_path(data_dir, params):
+    """Plik danych w katalogu roboczym, nazwany skrótem parametrów - generowany tylko raz"""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(data_dir, f"hurtownia_bench_{params['rows']}_{digest}.csv")
+
+
+class RssMonitor:
+    """Szczytowe RSS procesu w czasie operacji - próbkowane w osobnym wątku"""
+
+    INTERVAL = 0.005
+
+    def __enter__(self):
+        self.start = current_rss()
+        self.peak = self.start
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.poll, daemon=True)
+        self.thread.start()
+        return self
+
+    def poll(self):
+        while not self.stopped.wait(self.INTERVAL):
+            self.sample()
+
+    def sample(self):
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+        return False
+
+
+# Operacje odpowiadające akcjom aplikacji; każda dostaje sesję z wczytanymi danymi
+# (poza load_csv) i zwraca liczbę przetworzonych wierszy
+
+def load_csv(session, context):
+    if context['out_of_core']:
+        session.open_out_of_core(context['path'])
+        return context['rows']
+    session.load(context['path'], optimize=context['optimize'])
+    return len(session.view)
+
+
+def show_data(session, context):
+    """Formatowanie ekranu tabeli na początku i w środku danych (jak przewijanie VirtualTable)"""
+    view = session.view
+    columns = list(range(min(SCREEN_COLUMNS, len(view.columns))))
+    for start in (0, len(view) // 2):
+        window = view.window(start, start + SCREEN_ROWS, columns)
+        [[format_cell(value) for value in row] for row in window.itertuples(index=False)]
+    return len(view)
+
+
+def filter_data(session, context):
+    """Filtr AND: kolumna liczbowa powyżej mediany podglądu i najczęstsza wartość tekstowa"""
+    preview = session.view.base
+    predicates = []
+    numeric = [col for col in preview.columns if is_numeric_column(preview[col].dtype)]
+    texts = [col for col in preview.columns if col.startswith('txt_')]
+    if numeric:
+        predicates.append(Predicate(numeric[0], "większe niż", str(preview[numeric[0]].median())))
+    if texts:
+        predicates.append(Predicate(texts[0], "równa się", str(preview[texts[0]].mode().iloc[0])))
+    if not predicates:
+        return 0
+    session.apply_filter(FilterQuery(predicates, 'AND'))
+    rows = context['rows']
+    session.reset_filter()
+    return rows
+
+
+def show_statistics(session, context):
+    session.describe()
+    return context['rows']
+
+
+def calculate_correlation(session, context):
+    if len(session.numeric_columns()):
+        session.correlation()
+    return context['rows']
+
+
+def detect_outliers(session, context):
+    session.outliers()
+    return context['rows']
+
+
+def analyze_missing_data(session, context):
+    session.missing()
+    return context['rows']
+
+
+def save_to_csv(session, context):
+    target = os.path.join(context['data_dir'], f"hurtownia_bench_export{context['export_suffix']}")
+    try:
+        session.export(target)
+    finally:
+        if os.path.exists(target):
+            os.remove(target)
+    return context['rows']
+
+
+OPERATIONS = {
+    'load_csv': load_csv,
+    'show_data': show_data,
+    'filter_data': filter_data,
+    'show_statistics': show_statistics,
+    'calculate_correlation': calculate_correlation,
+    'detect_outliers': detect_outliers,
+    'analyze_missing_data': analyze_missing_data,
+    'save_to_csv': save_to_csv,
+}
+
+
+def run_benchmarks(context, operations, repeat=3, on_result=None):
+    """Mierzy każdą operację `repeat` razy; przed każdym pomiarem pamięci podręczne są czyszczone.
+
+    Zwraca {operacja: {time, min, peak_rss, rss_delta, rows_per_s}} - czas to mediana powtórzeń.
+    """
+    session = Session()
+    session.set_workers(context['workers'])
+    loaded = None
+    results = {}
+    try:
+        for name in operations:
+            times, peaks, deltas, rows = [], [], [], 0
+            for _ in range(repeat):
+                if name == 'load_csv':
+                    session = reset_session(session)
+                elif loaded is None:
+                    load_csv(session, context)
+                    loaded = session.current()
+                else:
+                    restore(session, loaded)
+                gc.collect()
+                with RssMonitor() as memory:
+                    start = time.perf_counter()
+                    rows = OPERATIONS[name](session, context)
+                    times.append(time.perf_counter() - start)
+                if memory.peak is not None and memory.start is not None:
+                    peaks.append(memory.peak)
+                    deltas.append(memory.peak - memory.start)
+                if name == 'load_csv':
+                    loaded = session.current()
+            elapsed = statistics.median(times)
+            results[name] = {
+                'time': elapsed,
+                'min': min(times),
+                'peak_rss': max(peaks) if peaks else None,
+                'rss_delta': max(deltas) if deltas else None,
+                'rows_per_s': rows / elapsed if elapsed > 0 else None,
+            }
+            if on_result is not None:
+                on_result(name, results[name])
+    finally:
+        session.set_workers(1)
+    return results
+
+
+def reset_session(session):
+    workers = session.workers
+    session.set_workers(1)
+    session = Session()
+    session.set_workers(workers)
+    return session
+
+
+def restore(session, loaded):
+    """Te same dane bez kopii, ale z pustymi indeksami i statystykami (pomiar "na zimno")"""
+    if session.out_of_core:
+        session.set_source(loaded.unfiltered(), session.view.base)
+    else:
+        session.set_data(loaded.base, session.memory_report, session.source_path)
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    """Porównanie z pomiarem bazowym: {operacja: (czas bazowy, stosunek, ocena)}"""
+    comparison = {}
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None or not base.get('time'):
+            comparison[name] = (None, None, "brak w bazie")
+            continue
+        change = result['time'] / base['time']
+        verdict = "REGRESJA" if change > ratio else "POPRAWA" if change < 1 / ratio else "OK"
+        comparison[name] = (base['time'], change, verdict)
+    return comparison
+
+
+def format_results(results, comparison=None):
+    def megabytes(value):
+        return f"{value / 1024 ** 2:10.1f}" if value is not None else f"{'-':>10}"
+
+    header = f"{'operacja':<24}{'czas [s]':>10}{'min [s]':>10}{'RSS [MB]':>10}{'przyrost':>10}{'wiersze/s':>14}"
+    if comparison is not None:
+        header += f"{'bazowy [s]':>12}{'zmiana':>9}  ocena"
+    lines = [header, "-" * len(header)]
+    for name, result in results.items():
+        speed = f"{result['rows_per_s']:14.0f}" if result['rows_per_s'] else f"{'-':>14}"
+        line = (f"{name:<24}{result['time']:10.3f}{result['min']:10.3f}{megabytes(result['peak_rss'])}"
+                f"{megabytes(result['rss_delta'])}{speed}")
+        if comparison is not None:
+            base, change, verdict = comparison[name]
+            if base is None:
+                line += f"{'-':>12}{'-':>9}  {verdict}"
+            else:
+                line += f"{base:12.3f}{change:8.2f}x  {verdict}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Pomiary czasu, szczytowej pamięci i przepustowości operacji hurtowni danych.")
+    data = parser.add_argument_group("dane syntetyczne")
+    data.add_argument('--rows', type=int, default=1_000_000)
+    data.add_argument('--numeric', type=int, default=4, help="kolumny zmiennoprzecinkowe")
+    data.add_argument('--integers', type=int, default=2, help="kolumny całkowite")
+    data.add_argument('--text', type=int, default=2, help="kolumny tekstowe")
+    data.add_argument('--dates', type=int, default=1, help="kolumny z datami")
+    data.add_argument('--cardinality', type=int, default=1000, help="liczba różnych wartości w kolumnach "
+                                                                     "tekstowych i całkowitych")
+    data.add_argument('--nulls', type=float, default=0.05, help="udział pustych komórek (0-1)")
+    data.add_argument('--seed', type=int, default=0)
+    data.add_argument('--data-dir', default=tempfile.gettempdir(), help="katalog na wygenerowane pliki")
+    data.add_argument('--file', help="gotowy plik CSV zamiast danych syntetycznych")
+
+    run = parser.add_argument_group("pomiar")
+    run.add_argument('--operations', nargs='+', choices=list(OPERATIONS), default=list(OPERATIONS),
+                     metavar="OPERACJA", help=f"operacje do zmierzenia: {', '.join(OPERATIONS)}")
+    run.add_argument('--repeat', type=int, default=3, help="powtórzenia każdej operacji (mediana)")
+    run.add_argument('--optimize', action='store_true', help="optymalizacja typów przy wczytywaniu")
+    run.add_argument('--out-of-core', action='store_true', help="operacje na pliku czytanym fragmentami")
+    run.add_argument('--workers', type=int, default=1, help="procesy analiz per kolumna")
+    run.add_argument('--export-format', default='.csv', choices=['.csv', '.csv.gz', '.parquet', '.feather'],
+                     help="format zapisu w save_to_csv")
+
+    baseline = parser.add_argument_group("pomiar bazowy")
+    baseline.add_argument('--baseline', help="porównaj z pomiarem bazowym (JSON)")
+    baseline.add_argument('--save-baseline', help="zapisz wyniki jako pomiar bazowy (JSON)")
+    baseline.add_argument('--threshold', type=float, default=REGRESSION_RATIO,
+                          help="stosunek czasów uznawany za regresję (domyślnie 1.2)")
+    baseline.add_argument('--json', action='store_true', help="wyniki w formacie JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    os.makedirs(args.data_dir, exist_ok=True)  # Także dla --file: tam trafia plik testu eksportu
+    params = {'rows': args.rows, 'numeric': args.numeric, 'integers': args.integers, 'texts': args.text,
+              'dates': args.dates, 'cardinality': args.cardinality, 'null_ratio': args.nulls, 'seed': args.seed}
+    if args.file:
+        path = args.file
+        rows = sum(len(chunk) for chunk in pd.read_csv(path, sep=';', chunksize=CHUNK_ROWS, usecols=[0]))
+        params = {'file': os.path.abspath(path), 'rows': rows}
+    else:
+        path = dataset_path(args.data_dir, params)
+        if not os.path.exists(path):
+            print(f"Generowanie danych: {path}", file=sys.stderr)
+            generate_csv(path, **params)
+    params.update(optimize=args.optimize, out_of_core=args.out_of_core, workers=args.workers,
+                  export_format=args.export_format)
+
+    context = {'path': path, 'rows': params['rows'], 'optimize': args.optimize, 'out_of_core': args.out_of_core,
+               'workers': max(1, args.workers), 'data_dir': args.data_dir, 'export_suffix': args.export_format}
+    print(f"Plik: {path} ({os.path.getsize(path) / 1024 ** 2:.1f} MB, {params['rows']} wierszy)",
+          file=sys.stderr)
+
+    def progress(name, result):
+        print(f"  {name}: {result['time']:.3f} s", file=sys.stderr)
+
+    try:
+        results = run_benchmarks(context, args.operations, max(1, args.repeat), progress)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Błąd: {e}", file=sys.stderr)
+        return 1
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        if baseline.get('params') != params:
+            print("Uwaga: parametry pomiaru bazowego różnią się od bieżących.", file=sys.stderr)
+        comparison = compare(results, baseline, args.threshold)
+
+    record = {
+        'params': params,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'file_size': os.path.getsize(path),
+        'results': results,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as handle:
+            json.dump(record, handle, ensure_ascii=False, indent=2)
+
+    if args.json:
+        if comparison is not None:
+            record['comparison'] = {name: dict(zip(('baseline', 'ratio', 'verdict'), values))
+                                    for name, values in comparison.items()}
+        print(json.dumps(record, ensure_ascii=False, indent=2))
+    else:
+        print(format_results(results, comparison))
+
+    regressed = comparison is not None and any(verdict == "REGRESJA" for _, _, verdict in comparison.values())
+    return 2 if regressed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,4182 @@
+"""Silnik analizy danych hurtowni - logika niezależna od interfejsu (GUI i wiersz poleceń)"""
+import glob
+import gzip
+import hashlib
+import json
+import multiprocessing
+import operator
+import os
+import re
+import threading
+import time
+import warnings
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import shared_memory
+from statistics import NormalDist
+
+import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow  # opcjonalnie: napisy Arrow i formaty kolumnowe
+    HAS_PYARROW = True
+    ARROW_ERRORS = (pyarrow.lib.ArrowException,)
+except ImportError:
+    HAS_PYARROW = False
+    ARROW_ERRORS = ()
+
+try:
+    import numexpr  # opcjonalnie: wielowątkowe porównania liczbowe
+    HAS_NUMEXPR = True
+except ImportError:
+    HAS_NUMEXPR = False
+
+try:
+    import scipy  # noqa: F401 - opcjonalnie: grupowanie hierarchiczne kolumn mapy korelacji
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+try:
+    import zstandard  # opcjonalnie: kompresja zstd przy zapisie CSV
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+
+def format_cell(value):
+    """Formatuje pojedynczą wartość komórki do wyświetlenia"""
+    if value is None or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+        return "NaN"
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.6g}"
+    return str(value)
+
+
+# Rozpoznawane formaty dat: (wzorzec, format dla pd.to_datetime)
+DATE_PATTERNS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?"), "ISO8601"),
+    (re.compile(r"\d{2}\.\d{2}\.\d{4}"), "%d.%m.%Y"),
+    (re.compile(r"\d{2}-\d{2}-\d{4}"), "%d-%m-%Y"),
+]
+
+
+def parse_date_column(series, sample_size=1000):
+    """Zwraca kolumnę jako datetime, jeśli wszystkie wartości wyglądają na daty, inaczej None"""
+    values = series.dropna()
+    if values.empty:
+        return None
+    sample = values.head(sample_size).astype(str)
+    for pattern, date_format in DATE_PATTERNS:
+        if sample.map(lambda v: pattern.fullmatch(v) is not None).all():
+            parsed = pd.to_datetime(series, format=date_format, errors='coerce')
+            # Daty tylko wtedy, gdy żadna niepusta wartość nie została utracona
+            if parsed.notna().sum() == len(values):
+                return parsed
+            return None
+    return None
+
+
+def optimize_series(series, category_ratio=0.5):
+    """Wybiera oszczędniejszy typ dla pojedynczej kolumny"""
+    if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        # Liczby całkowite tylko gdy wszystkie są skończone i dokładne w float64 (|x| < 2**53)
+        if (len(values) == len(series) and np.isfinite(values).all() and (values.abs() < 2 ** 53).all()
+                and (values == np.round(values)).all()):
+            return pd.to_numeric(series.astype(np.int64), downcast='integer')
+        as_float32 = series.astype(np.float32)
+        # float32 tylko gdy nie traci precyzji
+        if ((as_float32.astype(np.float64) == series) | series.isna()).all():
+            return as_float32
+        return series
+
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        dates = parse_date_column(series)
+        if dates is not None:
+            return dates
+        non_null = series.count()
+        if non_null and series.nunique() / non_null <= category_ratio:
+            return series.astype('category')
+        if HAS_PYARROW:
+            return series.astype('string[pyarrow]')
+    return series
+
+
+def optimize_dtypes(df, category_ratio=0.5):
+    """Optymalizuje typy kolumn w miejscu i zwraca raport pamięci per kolumna"""
+    report = []
+    for col in df.columns:
+        before = df[col].memory_usage(deep=True, index=False)
+        old_dtype = str(df[col].dtype)
+        df[col] = optimize_series(df[col], category_ratio)
+        after = df[col].memory_usage(deep=True, index=False)
+        report.append((col, old_dtype, str(df[col].dtype), before, after))
+    return pd.DataFrame(report, columns=['kolumna', 'typ przed', 'typ po', 'pamięć przed', 'pamięć po'])
+
+
+def format_memory_report(report):
+    """Formatuje raport optymalizacji typów do postaci tekstowej"""
+    lines = ["OPTYMALIZACJA TYPÓW DANYCH:\n"]
+    for row in report.itertuples(index=False):
+        saved = 1 - row[4] / row[3] if row[3] else 0.0
+        lines.append(f"{row[0]}: {row[1]} → {row[2]} | "
+                     f"{row[3] / 1024 ** 2:.2f} MB → {row[4] / 1024 ** 2:.2f} MB ({saved:.0%} mniej)")
+    total_before = report['pamięć przed'].sum()
+    total_after = report['pamięć po'].sum()
+    lines.append("-" * 50)
+    lines.append(f"Razem: {total_before / 1024 ** 2:.2f} MB → {total_after / 1024 ** 2:.2f} MB")
+    return "\n".join(lines)
+
+
+def current_rss():
+    """Bieżąca pamięć rezydentna procesu w bajtach (None, gdy system jej nie udostępnia)"""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def widen_for_value(series, value):
+    """Zwraca kolumnę o typie zdolnym przechować nową wartość (kategorie, zawężone liczby)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if pd.notna(value) and value not in series.cat.categories:
+            return series.cat.add_categories([value])
+        return series
+    if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        if pd.isna(value) or not float(value).is_integer():
+            return series.astype(np.float64)
+        info = np.iinfo(series.dtype)
+        if not info.min <= int(value) <= info.max:
+            return series.astype(np.int64)
+        return series
+    if series.dtype == np.float32 and pd.notna(value) and np.float32(value) != value:
+        return series.astype(np.float64)
+    return series
+
+
+CACHE_VARIANTS = {False: 'raw', True: 'opt'}  # Wersje pamięci podręcznej bez i z optymalizacją typów
+CACHE_NAME = re.compile(r'([0-9a-f]{16})(?:\.(raw|opt))?\.feather')
+
+
+def cache_stamp(file_path):
+    """Skrót ścieżki, rozmiaru i czasu modyfikacji - zmienia się razem z zawartością pliku"""
+    stat = os.stat(file_path)
+    key = f"{file_path}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def cache_path_for(file_path, optimize=False):
+    """Ścieżka pliku Feather obok CSV, kluczowana ścieżką, rozmiarem, czasem modyfikacji i optymalizacją"""
+    file_path = os.path.abspath(file_path)
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, f".{name}.{cache_stamp(file_path)}.{CACHE_VARIANTS[bool(optimize)]}.feather")
+
+
+def write_cache(df, file_path, cache_path):
+    """Zapisuje pamięć podręczną atomowo, a potem usuwa wersje dla nieaktualnej zawartości pliku.
+
+    Wersja z optymalizacją typów i bez niej dla tej samej zawartości zostają obie.
+    """
+    file_path = os.path.abspath(file_path)
+    tmp_path = cache_path + ".tmp"
+    try:
+        df.to_feather(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    directory, name = os.path.split(file_path)
+    stamp = cache_stamp(file_path)
+    prefix = f".{name}."
+    for path in glob.glob(os.path.join(directory, f"{glob.escape(prefix)}*.feather")):
+        match = CACHE_NAME.fullmatch(os.path.basename(path)[len(prefix):])
+        # Pliki w starym formacie (bez wariantu) też są nieaktualne
+        if match is not None and (match.group(1) != stamp or match.group(2) is None):
+            os.remove(path)
+
+
+INSTRUMENTATION_DIR = os.path.join(os.path.expanduser('~'), '.hurtownia')  # Dziennik i zrzuty profilera
+PROFILERS = ('cprofile', 'tracemalloc')
+
+
+class OperationTrace:
+    """Przebieg jednej operacji: kolejne etapy z czasem i przyrostem pamięci (RSS).
+
+    Etapy mogą zaczynać się w różnych wątkach (obliczenia w tle, wyświetlenie w pętli Tk),
+    ale nie nakładają się - `begin` zamyka poprzedni etap.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.stages = []  # (etap, czas [s], przyrost RSS [B] lub None)
+        self.status = "ok"
+        self.artifacts = []  # Pliki zrzutów profilera
+        self.pending = 0  # Zadania w tle, na które operacja jeszcze czeka
+        self.finished = False
+        self.lock = threading.Lock()
+        self._current = None  # (etap, początek, RSS na początku)
+        self._start = time.perf_counter()
+        self._end = None
+
+    def begin(self, label):
+        with self.lock:
+            self._close()
+            if not self.finished:
+                self._current = (label, time.perf_counter(), current_rss())
+
+    def _close(self):
+        if self._current is None:
+            return
+        label, start, rss = self._current
+        now_rss = current_rss()
+        delta = now_rss - rss if rss is not None and now_rss is not None else None
+        self.stages.append((label, time.perf_counter() - start, delta))
+        self._current = None
+
+    def finish(self, status=None):
+        """Zamyka pomiar; False, gdy był już zamknięty"""
+        with self.lock:
+            if self.finished:
+                return False
+            self._close()
+            self.finished = True
+            self._end = time.perf_counter()
+            if status is not None:
+                self.status = status
+            return True
+
+    @property
+    def total(self):
+        return (self._end if self._end is not None else time.perf_counter()) - self._start
+
+    def stage_totals(self):
+        """Czas i przyrost pamięci zsumowane dla etapów o tej samej nazwie, w kolejności pierwszego wystąpienia"""
+        totals = {}
+        for label, seconds, delta in self.stages:
+            spent, grown = totals.get(label, (0.0, None))
+            if delta is not None:
+                grown = (grown or 0) + delta
+            totals[label] = (spent + seconds, grown)
+        return totals
+
+    @staticmethod
+    def format_stage(label, seconds, delta):
+        memory = f" {delta / 1024 ** 2:+.0f} MB" if delta is not None and abs(delta) >= 1024 ** 2 else ""
+        return f"{label} {seconds:.2f} s{memory}"
+
+    def summary(self, limit=3):
+        """Jedna linia do paska stanu: czas całkowity i najdłuższe etapy"""
+        longest = sorted(self.stage_totals().items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        status = "" if self.status == "ok" else f" ({self.status})"
+        return " | ".join([f"⏱ {self.name}{status} {self.total:.2f} s"]
+                          + [self.format_stage(label, *values) for label, values in longest])
+
+    def report(self):
+        lines = [f"POMIAR OPERACJI: {self.name}",
+                 f"Początek: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started))}",
+                 f"Stan: {self.status}, czas całkowity: {self.total:.3f} s\n"]
+        for label, (seconds, delta) in self.stage_totals().items():
+            share = seconds / self.total if self.total > 0 else 0.0
+            memory = f"{delta / 1024 ** 2:+10.1f} MB" if delta is not None else f"{'-':>13}"
+            lines.append(f"{label:<32}{seconds:10.3f} s{share:8.1%}{memory}")
+        if self.artifacts:
+            lines.append("\nZrzuty profilera:")
+            lines += [f"  {path}" for path in self.artifacts]
+        return "\n".join(lines)
+
+    def to_record(self):
+        return {
+            'operation': self.name,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'status': self.status,
+            'total': round(self.total, 6),
+            'stages': [{'stage': label, 'seconds': round(seconds, 6), 'rss_delta': delta}
+                       for label, seconds, delta in self.stages],
+            'artifacts': list(self.artifacts),
+        }
+
+
+class Instrumentation:
+    """Pomiary operacji: ostatni przebieg, opcjonalny dziennik JSON Lines (rotowany) i zrzuty profilera.
+
+    Profiler działa naraz tylko dla jednej operacji (cProfile obejmuje wątek, w którym ją włączono,
+    tracemalloc - alokacje całego procesu); pozostałe są wtedy mierzone bez profilowania.
+    """
+
+    LOG_NAME = 'operacje.jsonl'
+
+    def __init__(self, directory=INSTRUMENTATION_DIR, max_bytes=1_000_000, backups=3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.profiler = None  # None, 'cprofile' lub 'tracemalloc'
+        self.logger = None  # Dziennik czasów operacji (None = wyłączony)
+        self.last = None  # Ostatnia zakończona operacja
+        self.profile_lock = threading.Lock()
+
+    @property
+    def log_path(self):
+        return os.path.join(self.directory, self.LOG_NAME)
+
+    @property
+    def logging(self):
+        return self.logger is not None
+
+    def set_directory(self, directory):
+        enabled = self.logging
+        self.set_log(False)
+        self.directory = directory
+        self.set_log(enabled)
+
+    def set_log(self, enabled):
+        """Włącza dziennik: jedna linia JSON na operację, pliki rotowane po `max_bytes`"""
+        import logging
+        from logging.handlers import RotatingFileHandler
+
+        if self.logger is not None:
+            for handler in self.logger.handlers:
+                handler.close()
+            self.logger = None
+        if enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            logger = logging.Logger('hurtownia.operacje')  # Poza rejestrem - bez wpływu na inne loggery
+            handler = RotatingFileHandler(self.log_path, maxBytes=self.max_bytes, backupCount=self.backups,
+                                          encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            self.logger = logger
+
+    def set_profiler(self, profiler):
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Nieznany profiler: {profiler}")
+        self.profiler = profiler
+
+    def start(self, name):
+        return OperationTrace(name)
+
+    def dump_path(self, trace, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        name = re.sub(r'\W+', '_', trace.name).strip('_') or 'operacja'
+        stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime())
+        return os.path.join(self.directory, f"{stamp}_{name}_{len(trace.artifacts)}.{extension}")
+
+    @contextmanager
+    def profiling(self, trace, wait=0.0):
+        """Profiluje blok kodu, jeśli profiler jest włączony i wolny (najwyżej `wait` s czekania);
+        zrzut trafia do trace.artifacts"""
+        if self.profiler is None:
+            yield
+            return
+        acquired = self.profile_lock.acquire(timeout=wait) if wait > 0 else self.profile_lock.acquire(blocking=False)
+        if not acquired:
+            yield
+            return
+        try:
+            if self.profiler == 'cprofile':
+                import cProfile
+
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+                    path = self.dump_path(trace, 'prof')
+                    profile.dump_stats(path)
+                    trace.artifacts.append(path)
+            else:
+                import tracemalloc
+
+                tracemalloc.start()
+                try:
+                    yield
+                finally:
+                    snapshot = tracemalloc.take_snapshot()
+                    tracemalloc.stop()
+                    path = self.dump_path(trace, 'tracemalloc')
+                    snapshot.dump(path)
+                    trace.artifacts.append(path)
+        finally:
+            self.profile_lock.release()
+
+    def finish(self, trace, status=None):
+        """Zamyka pomiar i zapisuje go w dzienniku; False, gdy był już zamknięty"""
+        if not trace.finish(status):
+            return False
+        self.last = trace
+        if self.logger is not None:
+            self.logger.info(json.dumps(trace.to_record(), ensure_ascii=False))
+        return True
+
+
+class FrameView:
+    """Widok wierszy nad jedną ramką bazową - filtr to tablica pozycji, a nie kopia danych"""
+
+    def __init__(self, base, rows=None):
+        self.base = base
+        self.rows = rows  # Pozycje wierszy w ramce bazowej (None = wszystkie)
+
+    def __len__(self):
+        return len(self.base) if self.rows is None else len(self.rows)
+
+    @property
+    def columns(self):
+        return self.base.columns
+
+    @property
+    def shape(self):
+        return len(self), len(self.base.columns)
+
+    @property
+    def is_filtered(self):
+        return self.rows is not None
+
+    def column(self, name):
+        """Zwraca kolumnę ograniczoną do wierszy widoku"""
+        series = self.base[name]
+        return series if self.rows is None else series.take(self.rows)
+
+    def frame(self, columns=None):
+        """Materializuje widok (opcjonalnie tylko wybrane kolumny)"""
+        base = self.base if columns is None else self.base[list(columns)]
+        return base if self.rows is None else base.take(self.rows)
+
+    def window(self, start, stop, col_positions):
+        """Zwraca wycinek wierszy [start, stop) i wybranych kolumn - do wyświetlania"""
+        if self.rows is None:
+            return self.base.iloc[start:stop, col_positions]
+        return self.base.iloc[self.rows[start:stop], col_positions]
+
+    def chunks(self, size, columns=None):
+        """Kolejne wycinki widoku po `size` wierszy - do zapisu bez kopii całego wyniku filtra.
+
+        Pusty widok daje jeden pusty wycinek, żeby zapis znał kolumny i ich typy.
+        """
+        col_positions = slice(None) if columns is None else self.base.columns.get_indexer(list(columns))
+        for start in range(0, max(len(self), 1), size):
+            yield self.window(start, start + size, col_positions)
+
+    def labels(self, positions):
+        """Etykiety indeksu dla pozycji wierszy widoku"""
+        positions = np.asarray(positions, dtype=np.int64)
+        return self.base.index[positions if self.rows is None else self.rows[positions]]
+
+    def value(self, row, col_position):
+        position = row if self.rows is None else self.rows[row]
+        return self.base.iat[position, col_position]
+
+    def filter(self, mask):
+        """Zawęża widok maską logiczną liczoną na wierszach widoku"""
+        if isinstance(mask, pd.Series):
+            mask = mask.fillna(False).to_numpy(dtype=bool)
+        positions = np.flatnonzero(mask)
+        if self.rows is not None:
+            positions = self.rows[positions]
+        return FrameView(self.base, positions)
+
+    def base_mask(self, positions):
+        """Maska wierszy widoku odpowiadająca pozycjom w ramce bazowej"""
+        hit = np.zeros(len(self.base), dtype=bool)
+        hit[positions] = True
+        return hit if self.rows is None else hit[self.rows]
+
+    def select(self, positions):
+        """Widok złożony z wybranych pozycji wierszy bieżącego widoku"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if self.rows is not None:
+            positions = self.rows[positions]
+        return FrameView(self.base, positions)
+
+    def base_positions(self, rows):
+        """Pozycje w ramce bazowej dla pozycji wierszy widoku"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows if self.rows is None else self.rows[rows]
+
+
+FILTER_OPERATORS = ["równa się", "zawiera", "większe niż", "mniejsze niż", "nie równa się"]
+OPERATOR_SYMBOLS = {"równa się": "==", "nie równa się": "!=", "większe niż": ">", "mniejsze niż": "<"}
+COMPARISONS = {"==": operator.eq, "!=": operator.ne, ">": operator.gt, "<": operator.lt}
+NUMEXPR_MIN_ROWS = 100_000
+INDEX_MIN_ROWS = 50_000  # Mniejsze widoki taniej przeskanować niż sięgać do indeksu
+
+
+def compare_array(values, symbol, operand):
+    """Porównanie wektorowe - przez numexpr dla dużych tablic liczbowych, jeśli jest dostępny"""
+    if HAS_NUMEXPR and values.dtype.kind in 'iuf' and len(values) >= NUMEXPR_MIN_ROWS:
+        return numexpr.evaluate(f"values {symbol} operand",
+                                local_dict={'values': values, 'operand': operand})
+    return COMPARISONS[symbol](values, operand)
+
+
+def parse_number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+class Predicate:
+    """Pojedynczy warunek filtra, porównywany w typie kolumny zamiast przez astype(str)"""
+
+    def __init__(self, column, op, value):
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def __str__(self):
+        return f"{self.column} {self.op} {self.value}"
+
+    def evaluate(self, series):
+        """Zwraca maskę logiczną (ndarray) dla wartości kolumny"""
+        dtype = series.dtype
+
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Warunek liczony raz na kategorię, wiersze dostają wynik przez kody
+            category_mask = self.evaluate(pd.Series(dtype.categories))
+            missing_result = self.evaluate(pd.Series([np.nan], dtype=object))[0]
+            category_mask = np.append(category_mask, missing_result)
+            return category_mask[series.cat.codes.to_numpy()]
+
+        if self.op == "zawiera":
+            return self.as_text(series).str.contains(self.value, na=False, regex=False).to_numpy(dtype=bool)
+
+        symbol = OPERATOR_SYMBOLS[self.op]
+        ordering = symbol in (">", "<")
+
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            number = self.typed_operand(dtype)
+            if number is None:
+                if ordering:
+                    raise ValueError(f"Wartość '{self.value}' nie jest liczbą")
+                return np.full(len(series), symbol == "!=")
+            if isinstance(dtype, np.dtype):
+                values = series.to_numpy()
+            else:
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            return compare_array(values, symbol, number)
+
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            moment = self.typed_operand(dtype)
+            if moment is None:
+                if ordering:
+                    raise ValueError(f"Wartość '{self.value}' nie jest datą")
+                return np.full(len(series), symbol == "!=")
+            return COMPARISONS[symbol](series, moment).to_numpy(dtype=bool)
+
+        if ordering:
+            return (COMPARISONS[symbol](pd.to_numeric(series, errors='coerce'), float(self.value))
+                    .to_numpy(dtype=bool))
+        return COMPARISONS[symbol](self.as_text(series), self.value).to_numpy(dtype=bool)
+
+    def typed_operand(self, dtype):
+        """Wartość warunku w typie kolumny liczbowej lub daty (None, gdy nie da się jej sparsować)"""
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            try:
+                return pd.Timestamp(self.value)
+            except ValueError:
+                return None
+        number = parse_number(self.value)
+        if number is not None and isinstance(dtype, np.dtype) and dtype.kind in 'iu' and number.is_integer():
+            return int(number)
+        return number
+
+    @staticmethod
+    def as_text(series):
+        """Kolumna jako tekst - konwersja tylko dla kolumn o mieszanych typach"""
+        if pd.api.types.is_string_dtype(series.dtype) and not pd.api.types.is_object_dtype(series.dtype):
+            return series
+        if pd.api.types.is_object_dtype(series.dtype) and pd.api.types.infer_dtype(series, skipna=True) == 'string':
+            return series
+        return series.astype(str)
+
+
+class ColumnIndex:
+    """Indeksy jednej kolumny ramki bazowej: hash (równość), posortowana tablica (zakresy)
+    i n-gramy (zawiera) - każdy budowany leniwie przy pierwszym użyciu"""
+
+    NGRAM = 3
+    NGRAM_MAX_UNIQUES = 1_000_000
+    CODE_LOOP_LIMIT = 1000
+
+    def __init__(self, series):
+        self.series = series
+        self.hash = None
+        self.sorted = None
+        self.ngrams = None
+        self.unique_index = None
+
+    def build_hash(self):
+        codes, uniques = pd.factorize(self.series)
+        codes = codes.astype(np.int32) if len(uniques) < 2 ** 31 - 1 else codes
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        # Wiersze kodu c to order[bounds[c + 1]:bounds[c + 2]], braki (kod -1) na początku
+        self.hash = (uniques, codes, order, bounds)
+
+    def build_sorted(self):
+        series = self.series
+        dtype = series.dtype
+        if isinstance(dtype, pd.DatetimeTZDtype):
+            return False
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            values = series.to_numpy()
+            valid = ~np.isnat(values)
+        else:
+            if pd.api.types.is_numeric_dtype(dtype) and isinstance(dtype, np.dtype) and dtype.kind != 'b':
+                values = series.to_numpy()
+            else:
+                values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            valid = ~np.isnan(values) if values.dtype.kind == 'f' else np.ones(len(values), dtype=bool)
+        positions = np.flatnonzero(valid)
+        values = values[positions]
+        order = np.argsort(values, kind='stable')
+        self.sorted = (values[order], positions[order])
+        return True
+
+    def build_ngrams(self):
+        uniques = self.hash[0]
+        texts = Predicate.as_text(pd.Series(uniques)).tolist()
+        grams = {}
+        if len(texts) <= self.NGRAM_MAX_UNIQUES:
+            for code, text in enumerate(texts):
+                for gram in {text[i:i + self.NGRAM] for i in range(len(text) - self.NGRAM + 1)}:
+                    grams.setdefault(gram, []).append(code)
+        self.ngrams = (texts, {gram: np.array(codes, dtype=np.int64) for gram, codes in grams.items()},
+                       len(texts) <= self.NGRAM_MAX_UNIQUES)
+
+    def missing_result(self, predicate):
+        """Wynik warunku dla braku danych - liczony tą samą ścieżką co skan kolumny"""
+        order, bounds = self.hash[2], self.hash[3]
+        if bounds[1] == 0:
+            return False
+        return bool(predicate.evaluate(self.series.iloc[[order[0]]])[0])
+
+    def rows_for_codes(self, codes, include_missing):
+        uniques, all_codes, order, bounds = self.hash
+        if len(codes) <= self.CODE_LOOP_LIMIT:
+            parts = [order[bounds[c + 1]:bounds[c + 2]] for c in codes]
+            if include_missing:
+                parts.append(order[bounds[0]:bounds[1]])
+            return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        code_mask = np.zeros(len(uniques) + 1, dtype=bool)
+        code_mask[np.asarray(codes) + 1] = True
+        code_mask[0] = include_missing
+        return np.flatnonzero(code_mask[all_codes + 1])
+
+    def equal_codes(self, predicate):
+        """Kody wartości równych warunkowi - wyszukiwanie w tablicy haszującej"""
+        uniques = self.hash[0]
+        dtype = self.series.dtype
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(dtype):
+            return None
+        if pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+            operand = predicate.typed_operand(dtype)
+            if operand is None:
+                return []
+        elif pd.api.types.is_string_dtype(dtype) and not pd.api.types.is_object_dtype(dtype):
+            operand = predicate.value
+        else:
+            return None
+        if self.unique_index is None:
+            self.unique_index = pd.Index(uniques)
+        code = self.unique_index.get_indexer([operand])[0]
+        return [code] if code >= 0 else []
+
+    def contains_codes(self, predicate):
+        """Kody wartości zawierających tekst - kandydaci z n-gramów, potem weryfikacja"""
+        if self.ngrams is None:
+            self.build_ngrams()
+        texts, grams, complete = self.ngrams
+        value = predicate.value
+        if complete and len(value) >= self.NGRAM:
+            postings = [grams.get(value[i:i + self.NGRAM]) for i in range(len(value) - self.NGRAM + 1)]
+            if any(p is None for p in postings):
+                return []
+            postings.sort(key=len)
+            candidates = postings[0]
+            for posting in postings[1:]:
+                candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            return [c for c in candidates if value in texts[c]]
+        return [c for c, text in enumerate(texts) if value in text]
+
+    def lookup(self, predicate):
+        """Pozycje wierszy ramki bazowej spełniające warunek (None = indeks nie obsługuje warunku)"""
+        dtype = self.series.dtype
+        symbol = OPERATOR_SYMBOLS.get(predicate.op)
+
+        if symbol in (">", "<") and not isinstance(dtype, pd.CategoricalDtype):
+            if self.sorted is None and not self.build_sorted():
+                return None
+            values, positions = self.sorted
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                operand = predicate.typed_operand(dtype)
+                if operand is None:
+                    raise ValueError(f"Wartość '{predicate.value}' nie jest datą")
+                operand = operand.to_datetime64().astype(values.dtype)
+            elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                operand = predicate.typed_operand(dtype)
+                if operand is None:
+                    raise ValueError(f"Wartość '{predicate.value}' nie jest liczbą")
+            else:
+                operand = float(predicate.value)
+            if pd.isna(operand):
+                return np.empty(0, dtype=np.int64)
+            if symbol == ">":
+                return np.sort(positions[np.searchsorted(values, operand, side='right'):])
+            return np.sort(positions[:np.searchsorted(values, operand, side='left')])
+
+        if self.hash is None:
+            self.build_hash()
+        uniques = self.hash[0]
+
+        if predicate.op == "zawiera" and not isinstance(dtype, pd.CategoricalDtype):
+            codes = self.contains_codes(predicate)
+        elif symbol in ("==", "!="):
+            codes = self.equal_codes(Predicate(predicate.column, "równa się", predicate.value))
+            if codes is None:
+                codes = np.flatnonzero(predicate.evaluate(pd.Series(uniques)))
+            elif symbol == "!=":
+                keep = np.ones(len(uniques), dtype=bool)
+                keep[codes] = False
+                codes = np.flatnonzero(keep)
+        else:
+            # Kategorie: warunek liczony raz na unikalną wartość
+            codes = np.flatnonzero(predicate.evaluate(pd.Series(uniques)))
+        return self.rows_for_codes(codes, self.missing_result(predicate))
+
+
+class IndexCache:
+    """Indeksy kolumn jednej ramki bazowej - zerowane przy zmianie ramki, unieważniane przy edycji"""
+
+    def __init__(self):
+        self.base = None
+        self.indexes = {}
+
+    def lookup(self, base, predicate):
+        if base is not self.base:
+            self.base = base
+            self.indexes = {}
+        index = self.indexes.get(predicate.column)
+        if index is None:
+            index = self.indexes[predicate.column] = ColumnIndex(base[predicate.column])
+        return index.lookup(predicate)
+
+    def invalidate(self, column=None):
+        if column is None:
+            self.indexes = {}
+        else:
+            self.indexes.pop(column, None)
+
+
+class FilterQuery:
+    """Złożony filtr - warunki łączone przez AND lub OR, liczone tylko na pozostałych wierszach"""
+
+    def __init__(self, predicates, combine="AND"):
+        self.predicates = list(predicates)
+        self.combine = combine
+
+    def __str__(self):
+        return f" {self.combine} ".join(str(p) for p in self.predicates)
+
+    @staticmethod
+    def match(predicate, view, indexes=None):
+        """Maska warunku na wierszach widoku - z indeksu kolumny albo skanem pozostałych wierszy"""
+        if indexes is not None and len(view) >= INDEX_MIN_ROWS:
+            positions = indexes.lookup(view.base, predicate)
+            if positions is not None:
+                return view.base_mask(positions)
+        return predicate.evaluate(view.column(predicate.column))
+
+    def apply(self, view, indexes=None):
+        """Zwraca nowy widok z wierszami spełniającymi filtr"""
+        if self.combine == "AND":
+            for predicate in self.predicates:
+                if len(view) == 0:
+                    break
+                view = view.filter(self.match(predicate, view, indexes))
+            return view
+
+        # OR: każdy kolejny warunek sprawdza tylko wiersze jeszcze niedopasowane
+        remaining = view
+        matched = []
+        for predicate in self.predicates:
+            if len(remaining) == 0:
+                break
+            mask = self.match(predicate, remaining, indexes)
+            hit = remaining.filter(mask)
+            matched.append(hit.rows)
+            remaining = remaining.filter(~mask)
+        positions = np.sort(np.concatenate(matched)) if matched else np.empty(0, dtype=np.int64)
+        return FrameView(view.base, positions)
+
+
+class JobCancelled(Exception):
+    """Zadanie w tle zostało anulowane przez użytkownika"""
+
+
+def check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled()
+
+
+def is_numeric_column(dtype):
+    """Kolumna liczbowa w sensie statystyk (bez wartości logicznych)"""
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def numeric_values(series):
+    """Wartości kolumny liczbowej jako float64 z NaN w miejscu braków"""
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def order_describe_rows(described):
+    """Kolejność wierszy jak w DataFrame.describe(include='all')"""
+    names = []
+    for index in sorted((d.index for d in described), key=len):
+        for name in index:
+            if name not in names:
+                names.append(name)
+    return names
+
+
+class RunningMoments:
+    """Liczność, średnia i M2 dla wielu kolumn naraz, łączone blokami (algorytm Chana)"""
+
+    def __init__(self, n_columns):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    def update(self, block):
+        valid = ~np.isnan(block)
+        block_count = valid.sum(axis=0)
+        with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            block_mean = np.nanmean(block, axis=0)
+            block_m2 = np.nansum((block - block_mean) ** 2, axis=0)
+            total = self.count + block_count
+            delta = block_mean - self.mean
+            mean = self.mean + delta * block_count / total
+            m2 = self.m2 + block_m2 + delta ** 2 * self.count * block_count / total
+        has_data = block_count > 0
+        self.mean = np.where(has_data, mean, self.mean)
+        self.m2 = np.where(has_data, m2, self.m2)
+        self.count = total
+
+    def std(self, ddof=0):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > ddof, np.sqrt(self.m2 / (self.count - ddof)), np.nan)
+
+
+class KLLSketch:
+    """Szkic kwantyli KLL - pamięć rzędu k, błąd rangi rzędu 1/k, wartości dokładane blokami"""
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.compress()
+
+    def compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # Nieparzysty element zostaje na swoim poziomie
+                kept = items[-1:] if len(items) % 2 else items[:0]
+                paired = items[:len(items) - len(kept)]
+                promoted = paired[self.rng.integers(2)::2]
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        if not self.count:
+            return np.nan
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_), 2.0 ** level)
+                                  for level, items_ in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return items[order][min(position, len(items) - 1)]
+
+
+class ColumnStats:
+    """Statystyki kolumny liczbowej: posortowane wartości i momenty aktualizowane przy edycji komórki"""
+
+    def __init__(self, values):
+        self.set_sorted(np.sort(values[~np.isnan(values)]))
+
+    @classmethod
+    def from_sorted(cls, sorted_values):
+        """Statystyki z wartości już posortowanych (np. przez proces roboczy)"""
+        stats = cls.__new__(cls)
+        stats.set_sorted(sorted_values)
+        return stats
+
+    def set_sorted(self, sorted_values):
+        self.sorted = sorted_values
+        self.count = len(self.sorted)
+        self.mean = self.sorted.mean() if self.count else np.nan
+        self.m2 = ((self.sorted - self.mean) ** 2).sum() if self.count else 0.0
+
+    def add(self, value):
+        self.sorted = np.insert(self.sorted, np.searchsorted(self.sorted, value), value)
+        self.count += 1
+        if self.count == 1:
+            self.mean, self.m2 = value, 0.0
+            return
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value):
+        position = np.searchsorted(self.sorted, value)
+        self.sorted = np.delete(self.sorted, position)
+        self.count -= 1
+        if self.count == 0:
+            self.mean, self.m2 = np.nan, 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (value - self.mean)
+
+    def replace(self, old, new):
+        """Aktualizacja po zmianie jednej wartości - bez ponownego przeglądu kolumny"""
+        if pd.notna(old):
+            self.remove(float(old))
+        if pd.notna(new):
+            self.add(float(new))
+
+    def quantile(self, q):
+        if not self.count:
+            return np.nan
+        position = q * (self.count - 1)
+        low = int(np.floor(position))
+        high = min(low + 1, self.count - 1)
+        return self.sorted[low] + (self.sorted[high] - self.sorted[low]) * (position - low)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.m2 / (self.count - ddof)) if self.count > ddof else np.nan
+
+    def count_outside(self, lower, upper):
+        """Liczba wartości < lower lub > upper (wyszukiwanie binarne w posortowanych wartościach)"""
+        below = np.searchsorted(self.sorted, lower, side='left')
+        above = self.count - np.searchsorted(self.sorted, upper, side='right')
+        return int(below + above)
+
+    def describe(self, name):
+        minimum = self.sorted[0] if self.count else np.nan
+        maximum = self.sorted[-1] if self.count else np.nan
+        return pd.Series([float(self.count), self.mean, self.std(), minimum, self.quantile(0.25),
+                          self.quantile(0.5), self.quantile(0.75), maximum],
+                         index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'], name=name)
+
+
+class StatsCache:
+    """Statystyki per kolumna dla bieżącego widoku, kluczowane wersją kolumny"""
+
+    def __init__(self):
+        self.lock = threading.RLock()  # Cache bywa używany równolegle przez zadania w tle
+        self.reset()
+
+    def reset(self, view=None):
+        self.view = view
+        self.versions = {}
+        self.numeric = {}  # kolumna -> (wersja, ColumnStats)
+        self.described = {}  # kolumna -> (wersja, Series z describe)
+        self.correlation = None  # macierz korelacji dla ostatniego zestawu kolumn
+        self.stale_correlation = set()
+        self.outlier_cache = {}  # kolumna -> (wersja, podsumowanie outlierów)
+
+    def use(self, view):
+        """Inny widok (filtr, reset, nowy plik) zeruje cache"""
+        if view is not self.view:
+            self.reset(view)
+
+    def version(self, column):
+        return self.versions.get(column, 0)
+
+    def cell_changed(self, view, column, old, new):
+        """Edycja jednej komórki: momenty i posortowane wartości aktualizowane w miejscu"""
+        with self.lock:
+            self._cell_changed(view, column, old, new)
+
+    def _cell_changed(self, view, column, old, new):
+        self.use(view)  # Statystyki innego widoku nie mogą przetrwać edycji
+        self.versions[column] = self.version(column) + 1
+        self.described.pop(column, None)
+        self.stale_correlation.add(column)
+        entry = self.numeric.get(column)
+        if entry is not None and is_numeric_column(view.base[column].dtype):
+            entry[1].replace(old, new)
+            self.numeric[column] = (self.version(column), entry[1])
+
+    def column_changed(self, view, column):
+        """Zmiana wielu wartości kolumny: unieważnia tylko tę kolumnę"""
+        with self.lock:
+            self.use(view)
+            self.versions[column] = self.version(column) + 1
+            self.described.pop(column, None)
+            self.numeric.pop(column, None)
+            self.stale_correlation.add(column)
+
+    def column_stats(self, view, column):
+        with self.lock:
+            self.use(view)
+            entry = self.numeric.get(column)
+            if entry is None or entry[0] != self.version(column):
+                entry = (self.version(column), ColumnStats(numeric_values(view.column(column))))
+                self.numeric[column] = entry
+            return entry[1]
+
+    def describe(self, view, cancel_event=None, backend=None):
+        """Odpowiednik describe(include='all') liczony tylko dla zmienionych kolumn"""
+        with self.lock:
+            return self._describe(view, cancel_event, backend)
+
+    def _describe(self, view, cancel_event, backend=None):
+        self.use(view)
+        stale = [column for column in view.columns if is_numeric_column(view.base[column].dtype)
+                 and self.numeric.get(column, (None,))[0] != self.version(column)]
+        if backend is not None and backend.worth_it(view, stale):
+            # Sortowanie kolumn (najdroższa część) w procesach roboczych
+            for column, values in zip(stale, backend.sorted_columns(view, stale, cancel_event)):
+                self.numeric[column] = (self.version(column), ColumnStats.from_sorted(values))
+        described = []
+        for column in view.columns:
+            check_cancelled(cancel_event)
+            if is_numeric_column(view.base[column].dtype):
+                described.append(self.column_stats(view, column).describe(column))
+                continue
+            entry = self.described.get(column)
+            if entry is None or entry[0] != self.version(column):
+                entry = (self.version(column), view.column(column).describe())
+                self.described[column] = entry
+            described.append(entry[1])
+        names = order_describe_rows(described)
+        return pd.concat([d.reindex(names) for d in described], axis=1)
+
+    def correlations(self, view, columns, cancel_event=None):
+        """Macierz Pearsona - po edycji przeliczane są tylko wiersze zmienionych kolumn"""
+        with self.lock:
+            return self._correlations(view, columns, cancel_event)
+
+    def _correlations(self, view, columns, cancel_event):
+        self.use(view)
+        columns = list(columns)
+        if self.correlation is None or list(self.correlation.columns) != columns:
+            self.correlation = view.frame(columns).corr(method='pearson')
+            self.stale_correlation = set()
+            return self.correlation
+
+        stale = [c for c in columns if c in self.stale_correlation]
+        if stale:
+            numeric_df = view.frame(columns)
+            for column in stale:
+                check_cancelled(cancel_event)
+                row = numeric_df.corrwith(numeric_df[column])
+                row[column] = numeric_df[column].corr(numeric_df[column])
+                self.correlation.loc[column, :] = row
+                self.correlation.loc[:, column] = row
+            self.stale_correlation = set()
+        return self.correlation
+
+    def outliers(self, view, column):
+        """Granice IQR oraz liczby outlierów (IQR i Z-score > 3) z posortowanych wartości"""
+        summary = self.column_stats(view, column)
+        q1, q3 = summary.quantile(0.25), summary.quantile(0.75)
+        iqr = q3 - q1
+        lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        std = summary.std(ddof=0)
+        z_count = summary.count_outside(summary.mean - 3 * std, summary.mean + 3 * std) if std > 0 else 0
+        return lower, upper, summary.count_outside(lower, upper), z_count
+
+    def outlier_summaries(self, view, columns, approximate=False, cancel_event=None, backend=None):
+        """Podsumowania outlierów: z cache, z posortowanych wartości albo jednym przebiegiem po reszcie"""
+        with self.lock:
+            self.use(view)
+            result = {}
+            pending = []
+            for column in columns:
+                version = self.version(column)
+                cached = self.outlier_cache.get(column)
+                # Wynik dokładny wystarcza też w trybie przybliżonym, odwrotnie nie
+                if cached is not None and cached[0] == version and (approximate or not cached[1]['approximate']):
+                    result[column] = cached[1]
+                elif column in self.numeric and self.numeric[column][0] == version:
+                    # Kolumna po edycji ma aktualne posortowane wartości - granice bez przeglądu
+                    lower, upper, count, z_count = self.outliers(view, column)
+                    values = numeric_values(view.column(column))
+                    sample = values[(values < lower) | (values > upper)][:OUTLIER_SAMPLE_SIZE].tolist()
+                    result[column] = {'column': column, 'lower': lower, 'upper': upper, 'count': count,
+                                      'z_count': z_count, 'sample': sample, 'approximate': False}
+                    self.outlier_cache[column] = (version, result[column])
+                else:
+                    pending.append(column)
+
+            if pending:
+                for summary in outlier_summary(view, pending, approximate, cancel_event, backend=backend):
+                    column = summary['column']
+                    result[column] = summary
+                    self.outlier_cache[column] = (self.version(column), summary)
+            return [result[column] for column in columns]
+
+
+OUTLIER_SAMPLE_SIZE = 10
+BLOCK_ROWS = 1_000_000
+APPROX_QUANTILE_MIN_ROWS = 5_000_000
+
+
+def numeric_blocks(view, columns, block_rows=BLOCK_ROWS):
+    """Kolejne bloki wierszy wybranych kolumn jako macierze float64"""
+    positions = [view.columns.get_loc(c) for c in columns]
+    for start in range(0, len(view), block_rows):
+        yield view.window(start, start + block_rows, positions).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def numeric_matrix(view, columns, out=None, cancel_event=None):
+    """Kolumny liczbowe jako macierz float64 w układzie kolumnowym (F) - każda kolumna ciągła"""
+    if out is None:
+        out = np.empty((len(view), len(columns)), dtype=np.float64, order='F')
+    for j, column in enumerate(columns):
+        check_cancelled(cancel_event)
+        out[:, j] = numeric_values(view.column(column))
+    return out
+
+
+def outlier_summary(view, columns, approximate=False, cancel_event=None, sample_size=OUTLIER_SAMPLE_SIZE,
+                    backend=None):
+    """Outliery wszystkich podanych kolumn jednym wektorowym przebiegiem (IQR i Z-score > 3)"""
+    columns = list(columns)
+    if approximate:
+        return streamed_outlier_summary(lambda: numeric_blocks(view, columns), columns,
+                                        cancel_event, sample_size)
+    if backend is not None and backend.worth_it(view, columns):
+        return backend.outlier_summary(view, columns, sample_size, cancel_event)
+    values = numeric_matrix(view, columns, cancel_event=cancel_event)
+    return exact_outlier_summary(values, columns, sample_size, cancel_event)
+
+
+def exact_outlier_summary(values, columns, sample_size=OUTLIER_SAMPLE_SIZE, cancel_event=None):
+    """Dokładne granice IQR i Z-score dla macierzy F - kolumny liczone niezależnie od siebie"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        q1, q3 = np.nanquantile(values, [0.25, 0.75], axis=0)
+        mean, std = np.nanmean(values, axis=0), np.nanstd(values, axis=0)
+    blocks = (values[start:start + BLOCK_ROWS] for start in range(0, len(values), BLOCK_ROWS))
+    return count_outliers(blocks, columns, q1, q3, mean, std, False, cancel_event, sample_size)
+
+
+def streamed_outlier_summary(make_blocks, columns, cancel_event=None, sample_size=OUTLIER_SAMPLE_SIZE):
+    """Outliery w dwóch przebiegach po blokach: szkice KLL i momenty, potem zliczanie.
+
+    `make_blocks()` zwraca za każdym razem nowy iterator macierzy float64 - pełne dane
+    nigdy nie są w pamięci naraz.
+    """
+    sketches = [KLLSketch() for _ in columns]
+    moments = RunningMoments(len(columns))
+    for block in make_blocks():
+        check_cancelled(cancel_event)
+        moments.update(block)
+        for sketch, values in zip(sketches, block.T):
+            sketch.update(values)
+    q1 = np.array([sketch.quantile(0.25) for sketch in sketches])
+    q3 = np.array([sketch.quantile(0.75) for sketch in sketches])
+    return count_outliers(make_blocks(), columns, q1, q3, moments.mean, moments.std(ddof=0), True,
+                          cancel_event, sample_size)
+
+
+def count_outliers(blocks, columns, q1, q3, mean, std, approximate, cancel_event, sample_size):
+    """Zlicza wartości poza granicami IQR i z |Z| > 3 blok po bloku, z próbką wartości"""
+    iqr = q3 - q1
+    lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    has_spread = std > 0
+
+    counts = np.zeros(len(columns), dtype=np.int64)
+    z_counts = np.zeros(len(columns), dtype=np.int64)
+    samples = [[] for _ in columns]
+    for block in blocks:
+        check_cancelled(cancel_event)
+        mask = (block < lower) | (block > upper)
+        counts += mask.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_counts += ((np.abs((block - mean) / std) > 3) & has_spread).sum(axis=0)
+        for j in np.flatnonzero(mask.any(axis=0)):
+            missing = sample_size - len(samples[j])
+            if missing > 0:
+                samples[j].extend(block[mask[:, j], j][:missing].tolist())
+
+    return [{'column': column, 'lower': lower[j], 'upper': upper[j], 'count': int(counts[j]),
+             'z_count': int(z_counts[j]), 'sample': samples[j], 'approximate': approximate}
+            for j, column in enumerate(columns)]
+
+
+def format_outliers_report(summaries):
+    """Raport outlierów (IQR i Z-score) z podsumowań kolumn"""
+    outliers_info = []
+
+    for summary in summaries:
+        if summary['count']:
+            note = " (kwantyle przybliżone KLL)" if summary['approximate'] else ""
+            sample = ", ".join(format_cell(v) for v in summary['sample'])
+            outliers_info.append(f"\n--- Kolumna: {summary['column']} ---")
+            outliers_info.append(f"Granice: {summary['lower']:.2f} - {summary['upper']:.2f}{note}")
+            outliers_info.append(f"Liczba outlierów: {summary['count']}")
+            more = "..." if summary['count'] > len(summary['sample']) else ""
+            outliers_info.append(f"Przykładowe wartości outlierów: [{sample}{more}]")
+
+            # Z-score method jako dodatkowa informacja
+            outliers_info.append(f"Outliery (Z-score > 3): {summary['z_count']}")
+
+    if outliers_info:
+        return "ANALIZA OUTLIERÓW:\n" + "\n".join(outliers_info)
+    return "ANALIZA OUTLIERÓW:\n\nNie znaleziono outlierów w danych numerycznych."
+
+
+def outliers_report(view, numeric_columns, stats_cache, approximate=False, cancel_event=None):
+    """Raport outlierów (IQR i Z-score) dla kolumn liczbowych widoku"""
+    return format_outliers_report(
+        stats_cache.outlier_summaries(view, numeric_columns, approximate, cancel_event))
+
+
+def null_mask(view, cancel_event=None):
+    """Jedna maska braków (wiersze x kolumny) budowana kolumna po kolumnie, bez kopii ramki"""
+    mask = np.empty((len(view), len(view.columns)), dtype=bool, order='F')
+    for j, column in enumerate(view.columns):
+        check_cancelled(cancel_event)
+        mask[:, j] = view.column(column).isna().to_numpy()
+    return mask
+
+
+def largest_positions(values, count):
+    """Pozycje `count` największych wartości, remisy w kolejności wierszy (jak nlargest)"""
+    if len(values) > count:
+        threshold = np.partition(values, len(values) - count)[len(values) - count]
+        greater = np.flatnonzero(values > threshold)
+        equal = np.flatnonzero(values == threshold)[:count - len(greater)]
+        values_positions = np.concatenate([greater, equal])
+    else:
+        values_positions = np.arange(len(values))
+    order = np.lexsort((values_positions, -values[values_positions]))
+    return values_positions[order]
+
+
+def packed_patterns(mask):
+    """Wiersze maski spakowane do bajtów; do 64 kolumn dopełnione do 8 bajtów (jedna liczba uint64)"""
+    packed = np.packbits(mask, axis=1, bitorder='little')
+    if packed.shape[1] <= 8:
+        padded = np.zeros((len(mask), 8), dtype=np.uint8)
+        padded[:, :packed.shape[1]] = packed
+        return padded
+    return np.ascontiguousarray(packed)
+
+
+def pattern_keys(packed):
+    if packed.shape[1] == 8:
+        return packed.view(np.uint64).ravel()
+    return packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+
+
+def unique_patterns(packed, offset=0):
+    """Różne wzorce z liczbą wystąpień i pierwszym wierszem (przesuniętym o `offset`)"""
+    uniques, first_rows, counts = np.unique(pattern_keys(packed), return_index=True, return_counts=True)
+    return uniques, first_rows + offset, counts
+
+
+def count_patterns(mask, top=5, backend=None):
+    """Najczęstsze wzorce braków - każdy wiersz spakowany do bitów i zliczony przez np.unique"""
+    packed = packed_patterns(mask)
+    if backend is not None and backend.worth_it_rows(len(packed)):
+        uniques, first_rows, counts = backend.unique_patterns(packed)
+    else:
+        uniques, first_rows, counts = unique_patterns(packed)
+    order = np.lexsort((first_rows, -counts))[:top]
+    return [(mask[first_rows[i]], int(counts[i])) for i in order]
+
+
+def missing_data_summary(view, cancel_event=None, sample_size=10, top=5, backend=None):
+    """Braki danych jako słownik: ogółem, per kolumna, najgorsze wiersze i wzorce"""
+    columns = list(view.columns)
+    n_rows = len(view)
+    mask = null_mask(view, cancel_event)
+    missing_per_column = mask.sum(axis=0)
+
+    total_cells = mask.size
+    missing_cells = int(missing_per_column.sum())
+    summary = {
+        'total_cells': total_cells,
+        'missing_cells': missing_cells,
+        'missing_percent': (missing_cells / total_cells) * 100 if total_cells else 0.0,
+        'columns': [],
+        'worst_rows': [],
+        'patterns': [],
+    }
+
+    for j, col in enumerate(columns):
+        check_cancelled(cancel_event)
+        missing_count = int(missing_per_column[j])
+        summary['columns'].append({
+            'column': col,
+            'dtype': str(view.base[col].dtype),
+            'missing': missing_count,
+            'percent': (missing_count / n_rows) * 100 if n_rows else 0.0,
+            # Indeksy wierszy z brakującymi danymi
+            'indices': view.labels(np.flatnonzero(mask[:, j])[:sample_size]).tolist(),
+        })
+
+    check_cancelled(cancel_event)
+
+    # Wiersze z największą liczbą braków
+    missing_per_row = mask.sum(axis=1)
+    worst_rows = largest_positions(missing_per_row, top)
+    for position, label in zip(worst_rows, view.labels(worst_rows)):
+        if missing_per_row[position] > 0:
+            summary['worst_rows'].append((label, int(missing_per_row[position])))
+
+    # Wzorce brakujących danych
+    if missing_cells > 0:
+        check_cancelled(cancel_event)
+        for pattern, count in count_patterns(mask, top, backend):
+            missing_cols = [col for col, is_missing in zip(columns, pattern) if is_missing]
+            if missing_cols:
+                summary['patterns'].append((missing_cols, count))
+
+    return summary
+
+
+def format_missing_report(summary, sample_size=10):
+    """Raport brakujących danych w postaci tekstowej"""
+    missing_analysis = []
+    missing_analysis.append("ANALIZA BRAKUJĄCYCH DANYCH:\n")
+
+    # Ogólne statystyki
+    missing_analysis.append(f"Całkowita liczba komórek: {summary['total_cells']}")
+    missing_analysis.append(f"Brakujące komórki: {summary['missing_cells']}")
+    missing_analysis.append(f"Procent brakujących danych: {summary['missing_percent']:.2f}%\n")
+
+    # Analiza per kolumna
+    missing_analysis.append("BRAKUJĄCE DANE PER KOLUMNA:")
+    missing_analysis.append("-" * 50)
+
+    for info in summary['columns']:
+        missing_analysis.append(f"{info['column']}:")
+        missing_analysis.append(f"  - Typ danych: {info['dtype']}")
+        missing_analysis.append(f"  - Brakujące wartości: {info['missing']}")
+        missing_analysis.append(f"  - Procent brakujących: {info['percent']:.2f}%")
+        if info['missing'] > 0:
+            more = '...' if info['missing'] > sample_size else ''
+            missing_analysis.append(f"  - Indeksy z brakami: {info['indices']}{more}")
+        missing_analysis.append("")
+
+    if summary['worst_rows']:
+        missing_analysis.append("WIERSZE Z NAJWIĘKSZĄ LICZBĄ BRAKÓW:")
+        missing_analysis.append("-" * 40)
+        for label, count in summary['worst_rows']:
+            missing_analysis.append(f"Wiersz {label}: {count} brakujących wartości")
+
+    if summary['missing_cells'] > 0:
+        missing_analysis.append("\nWZORCE BRAKUJĄCYCH DANYCH:")
+        missing_analysis.append("-" * 30)
+        for missing_cols, count in summary['patterns']:
+            missing_analysis.append(f"Braki w kolumnach {missing_cols}: {count} wierszy")
+
+    return "\n".join(missing_analysis)
+
+
+def missing_data_report(view, cancel_event=None):
+    """Raport brakujących danych: ogółem, per kolumna, najgorsze wiersze i wzorce"""
+    return format_missing_report(missing_data_summary(view, cancel_event))
+
+
+PARALLEL_MIN_CELLS = 2_000_000  # Mniejsze zadania liczone szybciej w bieżącym procesie
+
+
+def attach_shared(name, shape, dtype, order='C'):
+    """Dołącza do bloku pamięci współdzielonej jako tablica numpy (bez kopii)"""
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf, order=order)
+
+
+def sort_columns_task(name, shape, start, stop):
+    """Proces roboczy: sortuje kolumny [start, stop) macierzy w miejscu, zwraca liczby wartości"""
+    shm, matrix = attach_shared(name, shape, np.float64, 'F')
+    try:
+        counts = []
+        for j in range(start, stop):
+            # Ta sama procedura co ColumnStats - identyczny wynik
+            values = np.sort(matrix[:, j][~np.isnan(matrix[:, j])])
+            matrix[:len(values), j] = values
+            counts.append(len(values))
+        return counts
+    finally:
+        del matrix
+        shm.close()
+
+
+def outlier_task(name, shape, start, stop, columns, sample_size):
+    """Proces roboczy: dokładne outliery dla kolumn [start, stop) macierzy współdzielonej"""
+    shm, matrix = attach_shared(name, shape, np.float64, 'F')
+    try:
+        return exact_outlier_summary(matrix[:, start:stop], columns, sample_size)
+    finally:
+        del matrix
+        shm.close()
+
+
+def pattern_task(name, shape, start, stop):
+    """Proces roboczy: różne wzorce braków w wierszach [start, stop)"""
+    shm, packed = attach_shared(name, shape, np.uint8)
+    try:
+        uniques, first_rows, counts = unique_patterns(packed[start:stop], start)
+        return uniques.copy(), first_rows, counts
+    finally:
+        del packed
+        shm.close()
+
+
+class ProcessBackend:
+    """Pula procesów dla analiz per kolumna - dane liczbowe trafiają do procesów przez
+    pamięć współdzieloną (bez serializacji kolumn), a wyniki są identyczne z trybem szeregowym"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = None
+
+    def pool(self):
+        if self.executor is None:
+            # spawn: bezpieczny także w procesie z wątkami (GUI, zadania w tle)
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def worth_it(self, view, columns):
+        return len(columns) > 1 and len(view) * len(columns) >= PARALLEL_MIN_CELLS
+
+    def worth_it_rows(self, n_rows):
+        return n_rows >= PARALLEL_MIN_CELLS
+
+    def ranges(self, total):
+        """Podział na ciągłe zakresy - kilka na proces, żeby wyrównać obciążenie"""
+        parts = min(total, self.workers * 4)
+        bounds = np.linspace(0, total, parts + 1).astype(int)
+        return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+    def run(self, func, tasks, cancel_event):
+        """Wykonuje zadania w puli i zwraca wyniki w kolejności zadań"""
+        futures = [self.pool().submit(func, *task) for task in tasks]
+        try:
+            pending = set(futures)
+            while pending:
+                check_cancelled(cancel_event)
+                _, pending = wait(pending, timeout=0.1)
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def shared(self, shape, dtype, order='C'):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+        return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf, order=order)
+
+    def release(self, shm):
+        shm.close()
+        shm.unlink()
+
+    def sorted_columns(self, view, columns, cancel_event=None):
+        shape = (len(view), len(columns))
+        shm, matrix = self.shared(shape, np.float64, 'F')
+        try:
+            numeric_matrix(view, columns, matrix, cancel_event)
+            ranges = self.ranges(len(columns))
+            counts = self.run(sort_columns_task, [(shm.name, shape, a, b) for a, b in ranges], cancel_event)
+            counts = [count for part in counts for count in part]
+            result = [matrix[:count, j].copy() for j, count in enumerate(counts)]
+        finally:
+            del matrix
+            self.release(shm)
+        return result
+
+    def outlier_summary(self, view, columns, sample_size=OUTLIER_SAMPLE_SIZE, cancel_event=None):
+        shape = (len(view), len(columns))
+        shm, matrix = self.shared(shape, np.float64, 'F')
+        try:
+            numeric_matrix(view, columns, matrix, cancel_event)
+            tasks = [(shm.name, shape, a, b, columns[a:b], sample_size) for a, b in self.ranges(len(columns))]
+            parts = self.run(outlier_task, tasks, cancel_event)
+        finally:
+            del matrix
+            self.release(shm)
+        return [summary for part in parts for summary in part]
+
+    def unique_patterns(self, packed, cancel_event=None):
+        """np.unique na zakresach wierszy w procesach, wyniki łączone dokładnie jak jedno np.unique"""
+        shm, shared = self.shared(packed.shape, np.uint8)
+        try:
+            shared[:] = packed
+            tasks = [(shm.name, packed.shape, a, b) for a, b in self.ranges(len(packed))]
+            parts = self.run(pattern_task, tasks, cancel_event)
+        finally:
+            del shared
+            self.release(shm)
+        uniques, inverse = np.unique(np.concatenate([p[0] for p in parts]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([p[2] for p in parts]),
+                             minlength=len(uniques)).astype(np.int64)
+        first_rows = np.full(len(uniques), np.iinfo(np.int64).max)
+        np.minimum.at(first_rows, inverse, np.concatenate([p[1] for p in parts]))
+        return uniques, first_rows, counts
+
+
+CHUNK_ROWS = 100_000
+
+
+def is_text_dtype(dtype):
+    return dtype == object or pd.api.types.is_string_dtype(dtype)
+
+
+def unify_chunk_dtypes(chunks, file_path, emit, cancel_event=None):
+    """Ujednolica typy kolumn, które fragmenty odczytały różnie (np. liczby na początku pliku, tekst dalej).
+
+    Typ każdego fragmentu jest zgadywany osobno; jak przy wczytaniu całego pliku, kolumna z tekstem
+    w którymkolwiek fragmencie staje się tekstowa. Fragmenty z samymi brakami dostają typ tekstowy
+    od razu, a kolumny z liczbami są czytane ponownie jako tekst - wartości zostają dokładnie takie jak w pliku.
+    """
+    reread = []
+    for column in chunks[0].columns:
+        dtypes = [chunk[column].dtype for chunk in chunks]
+        text = next((dtype for dtype in dtypes if is_text_dtype(dtype)), None)
+        if text is None or all(dtype == text for dtype in dtypes):
+            continue
+        if any(not is_text_dtype(chunk[column].dtype) and chunk[column].notna().any() for chunk in chunks):
+            reread.append(column)
+        else:
+            for chunk in chunks:
+                chunk[column] = chunk[column].astype(text)
+    if not reread:
+        return
+    emit('stage', f"Ponowny odczyt kolumn o niejednolitym typie jako tekst: {', '.join(map(str, reread))}...")
+    # Te same granice fragmentów - kolumny tekstowe podmieniane są fragment po fragmencie
+    parts = pd.read_csv(file_path, sep=';', chunksize=CHUNK_ROWS, usecols=reread, dtype=dict.fromkeys(reread, str))
+    for chunk, part in zip(chunks, parts):
+        check_cancelled(cancel_event)
+        chunk[reread] = part
+
+
+def read_source(file_path, optimize=False, use_cache=False, on_event=None, cancel_event=None):
+    """Wczytuje CSV fragmentami (lub z pamięci podręcznej Feather) i zwraca (ramka, raport typów).
+
+    `on_event(rodzaj, dane)` dostaje zdarzenia 'progress', 'preview' i 'stage';
+    anulowanie przez `cancel_event` kończy się wyjątkiem JobCancelled.
+    """
+    def emit(kind, payload):
+        if on_event is not None:
+            on_event(kind, payload)
+
+    use_cache = use_cache and HAS_PYARROW
+    cache_path = cache_path_for(file_path, optimize) if use_cache else None
+    if cache_path is not None and os.path.exists(cache_path):
+        emit('stage', "Wczytywanie z pamięci podręcznej (Feather)...")
+        return pd.read_feather(cache_path), None
+
+    total_bytes = os.path.getsize(file_path)
+    start = time.perf_counter()
+    chunks = []
+    rows = 0
+
+    with open(file_path, 'rb') as handle:
+        for chunk in pd.read_csv(handle, sep=';', chunksize=CHUNK_ROWS):
+            check_cancelled(cancel_event)
+
+            chunks.append(chunk)
+            rows += len(chunk)
+            emit('progress', (rows, handle.tell(), total_bytes, time.perf_counter() - start))
+
+            # Pierwsze wiersze trafiają do widoku przed końcem parsowania
+            if len(chunks) == 1:
+                emit('preview', chunk)
+
+    if len(chunks) > 1:
+        unify_chunk_dtypes(chunks, file_path, emit, cancel_event)
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    del chunks
+
+    report = None
+    if optimize:
+        emit('stage', "Optymalizacja typów danych...")
+        report = optimize_dtypes(df)
+
+    if cache_path is not None:
+        emit('stage', "Zapis pamięci podręcznej (Feather)...")
+        try:
+            write_cache(df, file_path, cache_path)
+        except (OSError, TypeError, ValueError) + ARROW_ERRORS:
+            pass  # Brak zapisu obok pliku lub kolumna nie do zapisania w Arrow nie blokuje wczytania
+    return df, report
+
+
+EXPORT_THREADS = max(1, min(4, os.cpu_count() or 1))  # Wątki kompresujące fragmenty CSV
+COMPRESSION_LEVELS = {'gzip': 6, 'zstd': 3}
+
+
+def export_format(path):
+    """(format, kompresja) z rozszerzenia: .csv, .csv.gz, .csv.zst, .parquet, .feather"""
+    name = path.lower()
+    if name.endswith(('.parquet', '.feather', '.arrow')):
+        if not HAS_PYARROW:
+            raise ValueError("Zapis do Parquet/Feather wymaga pakietu pyarrow")
+        return ('parquet' if name.endswith('.parquet') else 'feather'), None
+    if name.endswith('.gz'):
+        return 'csv', 'gzip'
+    if name.endswith('.zst'):
+        if not HAS_ZSTD:
+            raise ValueError("Kompresja zstd wymaga pakietu zstandard")
+        return 'csv', 'zstd'
+    return 'csv', None
+
+
+def compress_block(data, compression):
+    """Fragment jako samodzielny człon gzip / ramka zstd - sklejone dają poprawny plik"""
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=COMPRESSION_LEVELS['gzip'], mtime=0)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=COMPRESSION_LEVELS['zstd']).compress(data)
+    return data
+
+
+def write_csv_chunks(handle, chunks, columns, compression, threads, on_chunk, cancel_event):
+    """Formatowanie CSV w bieżącym wątku, kompresja fragmentów w puli (zlib i zstd zwalniają GIL).
+
+    W locie jest najwyżej `threads` fragmentów, a zapis zachowuje ich kolejność.
+    """
+    pending = deque()
+
+    def flush(limit):
+        while len(pending) > limit:
+            future, rows = pending.popleft()
+            handle.write(future.result())
+            on_chunk(rows)
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="kompresja") as pool:
+        header = True
+        for chunk in chunks:
+            check_cancelled(cancel_event)
+            data = chunk.to_csv(index=False, sep=';', header=header).encode('utf-8')
+            header = False
+            pending.append((pool.submit(compress_block, data, compression), len(chunk)))
+            flush(threads)
+        if header:
+            data = pd.DataFrame(columns=columns).to_csv(index=False, sep=';').encode('utf-8')
+            pending.append((pool.submit(compress_block, data, compression), 0))
+        flush(0)
+
+
+def arrow_tables(chunks, cancel_event=None):
+    """Fragmenty jako tabele Arrow o schemacie pierwszego fragmentu.
+
+    Fragmenty czytane z CSV mogą mieć inny wywnioskowany typ (np. NaN w kolumnie całkowitej),
+    więc są rzutowane na schemat pierwszego; kolumna bez wartości w pierwszym fragmencie jest tekstowa.
+    """
+    import pyarrow as pa
+
+    schema = None
+    for chunk in chunks:
+        check_cancelled(cancel_event)
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if schema is None:
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                for field in table.schema], metadata=table.schema.metadata)
+        if not table.schema.equals(schema):
+            try:
+                table = table.cast(schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"Typ kolumny zmienia się między fragmentami pliku: {e}") from e
+        yield table, len(chunk)
+
+
+def arrow_writer(path, fmt, schema):
+    """Zapis kolumnowy po grupie wierszy; kolumny kompresuje pyarrow (zstd, jeśli dostępny)"""
+    import pyarrow as pa
+
+    codec = 'zstd' if pa.Codec.is_available('zstd') else None
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(path, schema, compression=codec or 'snappy')
+    return pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression=codec))
+
+
+def write_columnar(path, fmt, chunks, columns, on_chunk, cancel_event):
+    writer = None
+    try:
+        for table, rows in arrow_tables(chunks, cancel_event):
+            if writer is None:
+                writer = arrow_writer(path, fmt, table.schema)
+            writer.write_table(table)
+            on_chunk(rows)
+        if writer is None:
+            table, _ = next(arrow_tables([pd.DataFrame(columns=columns)]))
+            writer = arrow_writer(path, fmt, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_chunks(chunks, path, columns, total_rows=None, on_progress=None, cancel_event=None,
+                  threads=EXPORT_THREADS):
+    """Zapisuje strumień fragmentów w formacie z rozszerzenia, atomowo przez plik tymczasowy.
+
+    `on_progress((wiersze, wszystkie wiersze lub None, bajty w pliku, czas))` po każdym fragmencie;
+    zwraca (liczba wierszy, rozmiar pliku, czas zapisu).
+    """
+    fmt, compression = export_format(path)
+    tmp_path = path + ".tmp"
+    start = time.perf_counter()
+    written = 0
+
+    def on_chunk(rows):
+        nonlocal written
+        written += rows
+        if on_progress is not None:
+            on_progress((written, total_rows, os.path.getsize(tmp_path), time.perf_counter() - start))
+
+    try:
+        if fmt == 'csv':
+            with open(tmp_path, 'wb') as handle:
+                write_csv_chunks(handle, chunks, columns, compression, threads, on_chunk, cancel_event)
+        else:
+            write_columnar(tmp_path, fmt, chunks, columns, on_chunk, cancel_event)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return written, os.path.getsize(path), time.perf_counter() - start
+
+
+def format_export_summary(path, result):
+    rows, size, elapsed = result
+    speed = rows / elapsed if elapsed > 0 else 0.0
+    return (f"Zapisano plik: {path} ({rows} wierszy, {size / 1024 ** 2:.1f} MB, "
+            f"{elapsed:.1f} s, {speed:.0f} wierszy/s)")
+
+
+STREAM_DISTINCT_LIMIT = 1_000_000  # Maks. liczba różnych wartości śledzonych w kolumnie tekstowej
+PREVIEW_ROWS = 10_000
+
+
+class ChunkedSource:
+    """Plik CSV czytany strumieniowo fragmentami - tryb out-of-core dla danych większych niż RAM.
+
+    Filtr to lista zapytań stosowanych do każdego fragmentu; żadna operacja nie trzyma
+    w pamięci więcej niż jeden fragment (plus stałej wielkości akumulatory analiz).
+    """
+
+    def __init__(self, file_path, chunk_rows=CHUNK_ROWS, queries=()):
+        self.file_path = file_path
+        self.chunk_rows = chunk_rows
+        self.queries = tuple(queries)
+        self._header = None
+
+    @property
+    def columns(self):
+        if self._header is None:
+            self._header = pd.read_csv(self.file_path, sep=';', nrows=0).columns
+        return self._header
+
+    @property
+    def is_filtered(self):
+        return bool(self.queries)
+
+    def with_queries(self, queries):
+        source = ChunkedSource(self.file_path, self.chunk_rows, queries)
+        source._header = self._header
+        return source
+
+    def filter(self, query):
+        """Nowe źródło z dodatkowym zapytaniem (zawężenie bieżącego filtra)"""
+        return self.with_queries(self.queries + (query,))
+
+    def unfiltered(self):
+        return self.with_queries(())
+
+    def chunks(self, columns=None, cancel_event=None):
+        """Kolejne fragmenty (po filtrze) z indeksem równym numerowi wiersza w pliku"""
+        needed = None
+        if columns is not None:
+            # Kolumny warunków muszą zostać wczytane, nawet jeśli wynik ich nie potrzebuje
+            needed = list(columns)
+            for query in self.queries:
+                needed += [p.column for p in query.predicates if p.column not in needed]
+        for chunk in self.read_chunks(needed):
+            check_cancelled(cancel_event)
+            if self.queries:
+                view = FrameView(chunk)
+                for query in self.queries:
+                    view = query.apply(view)
+                chunk = view.frame()
+            yield chunk if columns is None else chunk[list(columns)]
+
+    def read_chunks(self, columns):
+        """Surowe fragmenty pliku z kolumnami `columns` (None = wszystkie)"""
+        return pd.read_csv(self.file_path, sep=';', chunksize=self.chunk_rows, usecols=columns)
+
+    def numeric_blocks(self, columns, cancel_event=None):
+        for chunk in self.chunks(columns, cancel_event):
+            yield chunk.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def preview(self, rows=PREVIEW_ROWS, cancel_event=None):
+        """Pierwsze pasujące wiersze do wyświetlenia w tabeli"""
+        parts, total = [], 0
+        for chunk in self.chunks(cancel_event=cancel_event):
+            parts.append(chunk.iloc[:rows - total])
+            total += len(parts[-1])
+            if total >= rows:
+                break
+        if not parts:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(parts)
+
+    def export(self, path, cancel_event=None, columns=None, on_progress=None):
+        """Zapis strumieniowy - wynik filtra nie jest materializowany; liczba wierszy nieznana z góry"""
+        columns = list(self.columns if columns is None else columns)
+        return export_chunks(self.chunks(columns, cancel_event), path, columns, None, on_progress, cancel_event)
+
+
+class DimensionTable:
+    """Tabela wymiaru trzymana w całości w pamięci i rozgłaszana do faktów (broadcast hash join).
+
+    Klucz wymiaru to indeks haszowy; klucze faktów są szukane w nim tylko raz na unikalną
+    wartość (dla kolumny kategorycznej - raz na kategorię), a wiersze dostają pozycję po kodzie.
+    """
+
+    def __init__(self, name, frame, key, fact_key):
+        if not name or '.' in name:
+            raise ValueError(f"Nazwa wymiaru '{name}' musi być niepusta i bez kropek")
+        if key not in frame.columns:
+            raise ValueError(f"Wymiar {name}: brak kolumny klucza '{key}'")
+        if not frame[key].is_unique:
+            raise ValueError(f"Wymiar {name}: klucz '{key}' nie jest unikalny")
+        self.name = name
+        self.frame = frame
+        self.key = key
+        self.fact_key = fact_key
+        self.lookup = pd.Index(frame[key])
+        self.attributes = [column for column in frame.columns if column != key]
+        self.encoded = {}  # atrybut tekstowy -> (kody, kategorie)
+
+    @property
+    def columns(self):
+        return [f"{self.name}.{attribute}" for attribute in self.attributes]
+
+    def positions(self, fact_keys):
+        """Wiersz wymiaru dla każdego wiersza faktów (-1 bez dopasowania)"""
+        if isinstance(fact_keys.dtype, pd.CategoricalDtype):
+            codes, uniques = fact_keys.cat.codes.to_numpy(), fact_keys.cat.categories
+        else:
+            codes, uniques = pd.factorize(fact_keys)
+        found = self.lookup.get_indexer(uniques)
+        positions = np.where(codes >= 0, found[codes] if len(found) else -1, -1)
+        return positions.astype(np.int32 if len(self.frame) < 2 ** 31 else np.int64)
+
+    def attribute(self, attribute, positions, index=None):
+        """Kolumna atrybutu dla wierszy faktów; tekst jako kategoria - kody zamiast kopii napisów"""
+        series = self.frame[attribute]
+        missing = positions < 0
+        if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            if attribute not in self.encoded:
+                self.encoded[attribute] = pd.factorize(series)
+            codes, categories = self.encoded[attribute]
+            values = pd.Categorical.from_codes(np.where(missing, -1, codes[positions]), categories)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            values = pd.Categorical.from_codes(np.where(missing, -1, codes[positions]), dtype=series.dtype)
+        else:
+            values = series.array.take(positions, allow_fill=bool(missing.any()))
+        return pd.Series(values, index=index, name=f"{self.name}.{attribute}")
+
+
+class StarSchema:
+    """Model gwiazdy: fakty i wymiary dołączane leniwie - złączenie liczone tylko dla wymiarów,
+    których kolumn potrzebuje widok lub analiza; pozycje złączenia są zapamiętywane dla ramki faktów"""
+
+    def __init__(self):
+        self.dimensions = OrderedDict()  # nazwa -> DimensionTable
+        self.cached = (None, {})  # (ramka faktów, nazwa wymiaru -> pozycje)
+
+    def add(self, dimension, fact_columns):
+        if dimension.name in self.dimensions:
+            raise ValueError(f"Wymiar '{dimension.name}' jest już dołączony")
+        if dimension.fact_key not in fact_columns:
+            raise ValueError(f"Tabela faktów nie ma kolumny klucza '{dimension.fact_key}'")
+        taken = set(fact_columns) | set(self.columns())
+        clash = [column for column in dimension.columns if column in taken]
+        if clash:
+            raise ValueError(f"Kolumny wymiaru już istnieją: {', '.join(clash)}")
+        self.dimensions[dimension.name] = dimension
+
+    def columns(self):
+        return [column for dimension in self.dimensions.values() for column in dimension.columns]
+
+    def resolve(self, column):
+        """(wymiar, atrybut) dla kolumny wymiaru, None dla kolumny faktów"""
+        name, sep, attribute = column.partition('.')
+        dimension = self.dimensions.get(name) if sep else None
+        if dimension is None or attribute not in dimension.attributes:
+            return None
+        return dimension, attribute
+
+    def fact_columns_for(self, columns, fact_columns):
+        """Kolumny faktów potrzebne do zbudowania `columns` (razem z kluczami złączeń)"""
+        needed = []
+        for column in columns:
+            resolved = self.resolve(column) if column not in fact_columns else None
+            needed.append(resolved[0].fact_key if resolved is not None else column)
+        return list(dict.fromkeys(needed))
+
+    def positions(self, facts, dimension):
+        cached_facts, positions = self.cached
+        if cached_facts is not facts:
+            positions = {}
+            self.cached = (facts, positions)
+        if dimension.name not in positions:
+            positions[dimension.name] = dimension.positions(facts[dimension.fact_key])
+        return positions[dimension.name]
+
+    def join(self, facts, columns=None, remember=True):
+        """Ramka z kolumnami `columns`: kolumny faktów bez zmian, atrybuty wymiarów dołączone"""
+        columns = list(facts.columns) + self.columns() if columns is None else list(columns)
+        joined = {}
+        for column in columns:
+            if column in facts.columns:
+                joined[column] = facts[column]
+                continue
+            resolved = self.resolve(column)
+            if resolved is None:
+                raise ValueError(f"Nieznana kolumna: {column}")
+            dimension, attribute = resolved
+            positions = (self.positions(facts, dimension) if remember
+                         else dimension.positions(facts[dimension.fact_key]))
+            joined[column] = dimension.attribute(attribute, positions, facts.index)
+        return pd.DataFrame(joined, index=facts.index, columns=columns)
+
+    def match_ratio(self, facts, name):
+        """Udział wierszy faktów z pasującym wierszem wymiaru"""
+        positions = self.positions(facts, self.dimensions[name])
+        return float((positions >= 0).mean()) if len(positions) else 1.0
+
+
+class StarSource(ChunkedSource):
+    """Fakty czytane fragmentami, a do każdego fragmentu dołączane tylko potrzebne atrybuty wymiarów"""
+
+    def __init__(self, file_path, schema, chunk_rows=CHUNK_ROWS, queries=()):
+        super().__init__(file_path, chunk_rows, queries)
+        self.schema = schema
+
+    @property
+    def fact_columns(self):
+        return super().columns
+
+    @property
+    def columns(self):
+        return self.fact_columns.append(pd.Index(self.schema.columns()))
+
+    def with_queries(self, queries):
+        source = StarSource(self.file_path, self.schema, self.chunk_rows, queries)
+        source._header = self._header
+        return source
+
+    def read_chunks(self, columns):
+        wanted = list(self.columns) if columns is None else list(columns)
+        needed = self.schema.fact_columns_for(wanted, self.fact_columns)
+        for chunk in super().read_chunks(needed):
+            yield self.schema.join(chunk, wanted, remember=False)
+
+
+def parse_join(text):
+    """Złączenie z wiersza poleceń: 'plik.csv:klucz_faktu=klucz_wymiaru' -> (nazwa, plik, klucze)"""
+    path, sep, keys = text.rpartition(':')
+    fact_key, equals, key = keys.partition('=')
+    if not sep or not path or not fact_key.strip():
+        raise ValueError(f"Złączenie '{text}' nie ma postaci 'plik.csv:klucz_faktu=klucz_wymiaru'")
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name, path, fact_key.strip(), (key.strip() if equals else fact_key.strip())
+
+
+def stream_numeric_columns(source, sample=None):
+    """Kolumny liczbowe źródła ustalone na podstawie pierwszego fragmentu"""
+    sample = source.preview(1000) if sample is None else sample
+    return [col for col in sample.columns if is_numeric_column(sample[col].dtype)]
+
+
+def stream_describe(source, cancel_event=None):
+    """describe(include='all') jednym przebiegiem: momenty i min/max dokładnie, kwartyle przez KLL"""
+    columns = list(source.columns)
+    numeric = stream_numeric_columns(source)
+    positions = [columns.index(col) for col in numeric]
+    moments = RunningMoments(len(numeric))
+    sketches = [KLLSketch() for _ in numeric]
+    minimum = np.full(len(numeric), np.inf)
+    maximum = np.full(len(numeric), -np.inf)
+    counts = {col: pd.Series(dtype=np.int64) for col in columns if col not in numeric}
+    truncated = set()
+    non_null = dict.fromkeys(columns, 0)
+
+    for chunk in source.chunks(cancel_event=cancel_event):
+        for col in columns:
+            non_null[col] += int(chunk[col].count())
+        if numeric:
+            block = chunk.iloc[:, positions].apply(pd.to_numeric, errors='coerce')
+            block = block.to_numpy(dtype=np.float64, na_value=np.nan)
+            moments.update(block)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                minimum = np.fmin(minimum, np.nanmin(block, axis=0, initial=np.inf))
+                maximum = np.fmax(maximum, np.nanmax(block, axis=0, initial=-np.inf))
+            for sketch, values in zip(sketches, block.T):
+                sketch.update(values)
+        for col, merged in counts.items():
+            merged = merged.add(chunk[col].astype(str).where(chunk[col].notna()).value_counts(), fill_value=0)
+            if len(merged) > STREAM_DISTINCT_LIMIT:
+                # Zbyt wiele różnych wartości - zostają tylko najczęstsze, liczba unikalnych nieznana
+                merged = merged.nlargest(STREAM_DISTINCT_LIMIT // 2)
+                truncated.add(col)
+            counts[col] = merged
+
+    described = []
+    std = moments.std(ddof=1)
+    for j, col in enumerate(numeric):
+        has_data = moments.count[j] > 0
+        described.append(pd.Series(
+            [non_null[col], moments.mean[j] if has_data else np.nan, std[j],
+             minimum[j] if has_data else np.nan, sketches[j].quantile(0.25), sketches[j].quantile(0.5),
+             sketches[j].quantile(0.75), maximum[j] if has_data else np.nan],
+            index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'], name=col))
+    for col, merged in counts.items():
+        top = merged.idxmax() if len(merged) else np.nan
+        described.append(pd.Series(
+            [non_null[col], np.nan if col in truncated else len(merged), top,
+             int(merged.max()) if len(merged) else np.nan],
+            index=['count', 'unique', 'top', 'freq'], name=col))
+    described.sort(key=lambda d: columns.index(d.name))
+    rows = order_describe_rows(described)
+    return pd.DataFrame({d.name: d.reindex(rows) for d in described}, index=rows, columns=columns)
+
+
+def stream_correlation(source, columns=None, cancel_event=None):
+    """Korelacja Pearsona parami (jak DataFrame.corr) z sum iloczynów liczonych fragmentami"""
+    columns = stream_numeric_columns(source) if columns is None else list(columns)
+    n = len(columns)
+    pair_count = np.zeros((n, n))
+    sum_x = np.zeros((n, n))  # [i, j]: suma x_i tam, gdzie x_j też jest znane
+    sum_xx = np.zeros((n, n))
+    sum_xy = np.zeros((n, n))
+    shift = None
+    for block in source.numeric_blocks(columns, cancel_event):
+        if shift is None:
+            # Przesunięcie o średnie pierwszego fragmentu ogranicza utratę precyzji sum
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                shift = np.nan_to_num(np.nanmean(block, axis=0))
+        valid = ~np.isnan(block)
+        values = np.where(valid, block - shift, 0.0)
+        weights = valid.astype(np.float64)
+        pair_count += weights.T @ weights
+        sum_x += values.T @ weights
+        sum_xx += (values ** 2).T @ weights
+        sum_xy += values.T @ values
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = pair_count * sum_xy - sum_x * sum_x.T
+        variance = pair_count * sum_xx - sum_x ** 2
+        correlation = covariance / np.sqrt(variance * variance.T)
+    correlation = np.clip(correlation, -1.0, 1.0)
+    correlation[pair_count < 2] = np.nan
+    return pd.DataFrame(correlation, index=columns, columns=columns)
+
+
+def stream_outliers(source, columns=None, cancel_event=None, sample_size=OUTLIER_SAMPLE_SIZE):
+    """Outliery w dwóch przebiegach po pliku (kwantyle KLL)"""
+    columns = stream_numeric_columns(source) if columns is None else list(columns)
+    return streamed_outlier_summary(lambda: source.numeric_blocks(columns, cancel_event), columns,
+                                    cancel_event, sample_size)
+
+
+def stream_missing_summary(source, cancel_event=None, sample_size=10, top=5):
+    """Analiza braków fragmentami - ten sam słownik co missing_data_summary"""
+    columns = list(source.columns)
+    dtypes = source.preview(1000).dtypes  # Typy jak w pierwszym fragmencie pliku
+    missing_per_column = np.zeros(len(columns), dtype=np.int64)
+    indices = [[] for _ in columns]
+    worst = (np.empty(0, dtype=np.int64), np.empty(0, dtype=object))  # (liczby braków, etykiety)
+    patterns = {}  # spakowany wzorzec -> [liczba, pierwszy wiersz, maska]
+    n_rows = 0
+    order = 0
+
+    for chunk in source.chunks(cancel_event=cancel_event):
+        mask = chunk.isna().to_numpy()
+        n_rows += len(mask)
+        missing_per_column += mask.sum(axis=0)
+        for j in np.flatnonzero(mask.any(axis=0)):
+            if len(indices[j]) < sample_size:
+                indices[j].extend(chunk.index[mask[:, j]][:sample_size - len(indices[j])].tolist())
+
+        # Najgorsze wiersze: kandydaci z fragmentu łączeni z dotychczasowymi
+        per_row = mask.sum(axis=1)
+        best = largest_positions(per_row, top)
+        counts = np.concatenate([worst[0], per_row[best]])
+        labels = np.concatenate([worst[1], chunk.index.to_numpy(dtype=object)[best]])
+        keep = largest_positions(counts, top)
+        worst = (counts[keep], labels[keep])
+
+        for key, first, count in zip(*unique_patterns(packed_patterns(mask))):
+            entry = patterns.get(key.tobytes())
+            if entry is None:
+                patterns[key.tobytes()] = [int(count), order + first, mask[first]]
+            else:
+                entry[0] += int(count)
+        order += len(mask)
+
+    total_cells = n_rows * len(columns)
+    missing_cells = int(missing_per_column.sum())
+    summary = {
+        'total_cells': total_cells,
+        'missing_cells': missing_cells,
+        'missing_percent': (missing_cells / total_cells) * 100 if total_cells else 0.0,
+        'columns': [{'column': col,
+                     'dtype': str(dtypes[col]),
+                     'missing': int(missing_per_column[j]),
+                     'percent': (missing_per_column[j] / n_rows) * 100 if n_rows else 0.0,
+                     'indices': indices[j]}
+                    for j, col in enumerate(columns)],
+        'worst_rows': [(label, int(count)) for count, label in zip(*worst) if count > 0],
+        'patterns': [],
+    }
+    if missing_cells > 0:
+        ranked = sorted(patterns.values(), key=lambda entry: (-entry[0], entry[1]))[:top]
+        for count, _, pattern in ranked:
+            missing_cols = [col for col, is_missing in zip(columns, pattern) if is_missing]
+            if missing_cols:
+                summary['patterns'].append((missing_cols, count))
+    return summary
+
+
+SAMPLE_ROWS = 100_000  # Domyślna liczność próby szybkiego podglądu
+CONFIDENCE = 0.95
+
+
+class Sample:
+    """Próba wierszy do szybkiego podglądu: widok próby i liczność populacji, z której ją wylosowano"""
+
+    def __init__(self, view, population, method):
+        self.view = view  # FrameView; w pamięci bez kopii danych - tylko pozycje wylosowanych wierszy
+        self.population = population
+        self.method = method
+
+    def __len__(self):
+        return len(self.view)
+
+    @property
+    def complete(self):
+        """Próba obejmuje całą populację - wyniki są dokładne"""
+        return len(self) >= self.population
+
+    def __str__(self):
+        fraction = len(self) / self.population if self.population else 1.0
+        return f"{self.method}: {len(self)} z {self.population} wierszy ({fraction:.2%})"
+
+
+def draw_sample(view, size, strata=None, rng=None):
+    """Losowanie bez zwracania z widoku; z `strata` - warstwowe z alokacją proporcjonalną.
+
+    Alokacja proporcjonalna daje próbę samoważoną, więc estymatory są takie jak dla losowania prostego.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    population = len(view)
+    if size >= population:
+        return Sample(view, population, "cała tabela")
+    if strata is None:
+        positions = np.sort(rng.choice(population, size, replace=False))
+        return Sample(view.select(positions), population, "losowanie proste")
+
+    codes, _ = pd.factorize(view.column(strata), use_na_sentinel=False)
+    sizes = np.bincount(codes)
+    # Metoda największych reszt: liczności warstw sumują się dokładnie do `size`
+    quotas = sizes * (size / population)
+    allocated = np.floor(quotas).astype(np.int64)
+    remainder = size - int(allocated.sum())
+    allocated[np.argsort(allocated - quotas, kind='stable')[:remainder]] += 1
+    # Losowa kolejność w obrębie warstw, potem pierwsze `allocated` wierszy z każdej
+    order = rng.permutation(population)
+    order = order[np.argsort(codes[order], kind='stable')]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    stratum = codes[order]
+    keep = np.arange(population) - starts[stratum] < allocated[stratum]
+    return Sample(view.select(np.sort(order[keep])), population, f"losowanie warstwowe wg '{strata}'")
+
+
+def reservoir_sample(source, size, rng=None, cancel_event=None):
+    """Próba prosta z pliku czytanego strumieniowo: `size` wierszy o najmniejszych losowych kluczach"""
+    rng = np.random.default_rng() if rng is None else rng
+    kept, keys, population = None, None, 0
+    for chunk in source.chunks(cancel_event=cancel_event):
+        population += len(chunk)
+        chunk_keys = rng.random(len(chunk))
+        if kept is not None:
+            chunk, chunk_keys = pd.concat([kept, chunk]), np.concatenate([keys, chunk_keys])
+        if len(chunk) > size:
+            best = np.sort(np.argpartition(chunk_keys, size - 1)[:size])  # Kolejność jak w pliku
+            chunk, chunk_keys = chunk.iloc[best], chunk_keys[best]
+        kept, keys = chunk, chunk_keys
+    if kept is None:
+        kept = pd.DataFrame(columns=source.columns)
+    method = "cały plik" if population <= size else "losowanie rezerwuarowe"
+    return Sample(FrameView(kept), population, method)
+
+
+def finite_correction(sample):
+    """Poprawka na skończoną populację dla błędów standardowych"""
+    n, population = len(sample), sample.population
+    return np.sqrt((population - n) / (population - 1)) if population > n else 0.0
+
+
+def sample_describe(sample, confidence=CONFIDENCE, cancel_event=None):
+    """describe(include='all') z próby i przedziały ufności dla liczności, średniej, odchylenia i kwartyli.
+
+    Liczności (count, freq) są przeskalowane do populacji; min i max z próby ograniczają prawdziwe
+    wartości tylko z jednej strony, a unique dotyczy samej próby.
+    """
+    view, n, population = sample.view, len(sample), sample.population
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    fpc = finite_correction(sample)
+    scale = population / n if n else 0.0
+    described, bounds = [], []
+    for column in view.columns:
+        check_cancelled(cancel_event)
+        series = view.column(column)
+        if not is_numeric_column(series.dtype):
+            desc = series.describe()
+            desc['count'] = desc['count'] * scale
+            if 'freq' in desc.index and pd.notna(desc['freq']):
+                desc['freq'] = desc['freq'] * scale
+            described.append(desc)
+            continue
+        stats = ColumnStats(numeric_values(series))
+        desc = stats.describe(column)
+        share = stats.count / n if n else np.nan
+        margin = z * np.sqrt(share * (1 - share) / n) * fpc if n else np.nan
+        desc['count'] = share * population
+        described.append(desc)
+
+        k = stats.count
+        rows = {'count': (desc['count'], max(share - margin, 0.0) * population,
+                          min(share + margin, 1.0) * population)}
+        if k > 1:
+            std = stats.std()
+            mean_margin = z * std / np.sqrt(k) * fpc
+            std_margin = z * std / np.sqrt(2 * (k - 1)) * (fpc > 0)
+            rows['mean'] = (stats.mean, stats.mean - mean_margin, stats.mean + mean_margin)
+            rows['std'] = (std, max(std - std_margin, 0.0), std + std_margin)
+        if k:
+            # Przedziały kwantyli bez założeń o rozkładzie - przez statystyki pozycyjne
+            minimum, maximum = stats.sorted[0], stats.sorted[-1]
+            exact = fpc == 0
+            rows['min'] = (minimum, minimum if exact else np.nan, minimum)
+            for q, name in ((0.25, '25%'), (0.5, '50%'), (0.75, '75%')):
+                spread = z * np.sqrt(k * q * (1 - q)) * fpc
+                low = int(np.clip(np.floor(q * (k - 1) - spread), 0, k - 1))
+                high = int(np.clip(np.ceil(q * (k - 1) + spread), 0, k - 1))
+                rows[name] = ((desc[name],) * 3 if exact else
+                              (desc[name], stats.sorted[low], stats.sorted[high]))
+            rows['max'] = (maximum, maximum, maximum if exact else np.nan)
+        for name, (estimate, low, high) in rows.items():
+            bounds.append((column, name, estimate, low, high))
+
+    names = order_describe_rows(described)
+    return {
+        'sample': sample,
+        'confidence': confidence,
+        'describe': pd.concat([d.reindex(names) for d in described], axis=1),
+        'bounds': pd.DataFrame(bounds, columns=['kolumna', 'statystyka', 'oszacowanie',
+                                                'dolna granica', 'górna granica']),
+    }
+
+
+def sample_correlation(sample, columns, confidence=CONFIDENCE, cancel_event=None):
+    """Macierz Pearsona z próby i przedziały ufności z transformacji Fishera"""
+    frame = sample.view.frame(columns).apply(pd.to_numeric, errors='coerce')
+    check_cancelled(cancel_event)
+    correlation = frame.corr(method='pearson')
+    present = frame.notna().to_numpy(dtype=np.float64)
+    pairs = present.T @ present  # Liczba wierszy z obiema wartościami dla każdej pary kolumn
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = z * finite_correction(sample) / np.sqrt(pairs - 3)
+        fisher = np.arctanh(np.clip(correlation.to_numpy(), -1 + 1e-12, 1 - 1e-12))
+        lower = np.tanh(fisher - spread)
+        upper = np.tanh(fisher + spread)
+    too_few = pairs <= 3
+    lower[too_few], upper[too_few] = -1.0, 1.0
+    lower[np.isnan(fisher)] = upper[np.isnan(fisher)] = np.nan
+    return {
+        'sample': sample,
+        'confidence': confidence,
+        'correlation': correlation,
+        'lower': pd.DataFrame(lower, index=correlation.index, columns=correlation.columns),
+        'upper': pd.DataFrame(upper, index=correlation.index, columns=correlation.columns),
+    }
+
+
+def sample_header(result):
+    return (f"PRZYBLIŻENIE Z PRÓBY - {result['sample']}\n"
+            f"Przedziały ufności na poziomie {result['confidence']:.0%}\n")
+
+
+def format_sample_describe(result):
+    bounds = result['bounds'].set_index(['kolumna', 'statystyka'])
+    lines = [sample_header(result),
+             f"Statystyki tabeli (oszacowanie):\n{result['describe'].to_string()}\n",
+             f"Przedziały ufności:\n{bounds.to_string() if len(bounds) else 'brak kolumn liczbowych'}\n",
+             "count i freq przeskalowane do całej tabeli; unique dotyczy próby.",
+             "min i max z próby ograniczają prawdziwe wartości tylko z jednej strony."]
+    return "\n".join(lines)
+
+
+def format_sample_correlation(result):
+    return "\n".join([sample_header(result),
+                      f"Macierz korelacji (oszacowanie):\n{result['correlation'].to_string()}\n",
+                      f"Dolne granice:\n{result['lower'].to_string()}\n",
+                      f"Górne granice:\n{result['upper'].to_string()}\n"])
+
+
+PLOT_TOP_N = 30  # Słupki najczęstszych wartości; pozostałe w jednym słupku "inne"
+HISTOGRAM_BINS = 50
+HEATMAP_MAX_COLUMNS = 80  # Więcej kolumn - po pogrupowaniu uśrednione w bloki
+HEATMAP_ANNOTATE_MAX = 20  # Wartości w komórkach tylko dla małych macierzy
+
+
+def category_distribution(counts, top=PLOT_TOP_N):
+    """Top-N liczności i zbiorczy słupek 'inne' dla pozostałych wartości"""
+    counts = counts.sort_values(ascending=False)
+    distinct = len(counts)
+    if distinct > top:
+        rest = counts.iloc[top:].sum()
+        counts = counts.iloc[:top]
+        counts.index = counts.index.astype(str)
+        counts = pd.concat([counts, pd.Series({f"inne ({distinct - top} wartości)": rest})])
+    return {'kind': 'bar', 'counts': counts, 'distinct': distinct, 'other': distinct > top}
+
+
+def numeric_distribution(make_blocks, bins=HISTOGRAM_BINS, top=PLOT_TOP_N, cancel_event=None):
+    """Histogram liczony blokami w dwóch przebiegach: zakres, potem liczności w przedziałach.
+
+    Liczby całkowite z zakresu węższego niż `top` dają słupki dokładnych wartości.
+    """
+    low, high, integral = np.inf, -np.inf, True
+    for block in make_blocks():
+        check_cancelled(cancel_event)
+        finite = block[np.isfinite(block)]
+        if len(finite):
+            low, high = min(low, finite.min()), max(high, finite.max())
+            integral = integral and bool(np.all(finite == np.floor(finite)))
+    if low > high:
+        return {'kind': 'bar', 'counts': pd.Series(dtype=np.int64), 'distinct': 0, 'other': False}
+
+    if integral and high - low < top:
+        counts = np.zeros(int(high - low) + 1, dtype=np.int64)
+        for block in make_blocks():
+            check_cancelled(cancel_event)
+            finite = block[np.isfinite(block)]
+            counts += np.bincount((finite - low).astype(np.int64), minlength=len(counts))
+        values = np.arange(int(low), int(high) + 1)
+        return {'kind': 'bar', 'counts': pd.Series(counts, index=values), 'distinct': int((counts > 0).sum()),
+                'other': False}
+
+    edges = np.linspace(low, high, bins + 1) if high > low else np.array([low - 0.5, low + 0.5])
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    for block in make_blocks():
+        check_cancelled(cancel_event)
+        counts += np.histogram(block[np.isfinite(block)], edges)[0]
+    return {'kind': 'hist', 'counts': counts, 'edges': edges, 'distinct': None}
+
+
+def scale_distribution(distribution, factor):
+    """Liczności z próby przeskalowane do całej tabeli"""
+    return dict(distribution, counts=distribution['counts'] * factor)
+
+
+def cluster_order(correlation):
+    """Kolejność kolumn grupująca silnie skorelowane (odległość 1 - |r|)"""
+    similarity = np.nan_to_num(np.abs(correlation.to_numpy(dtype=np.float64)), nan=0.0)
+    similarity = (similarity + similarity.T) / 2
+    if len(similarity) < 3:
+        return np.arange(len(similarity))
+    if HAS_SCIPY:
+        from scipy.cluster.hierarchy import leaves_list, linkage
+        from scipy.spatial.distance import squareform
+
+        distance = 1 - similarity
+        np.fill_diagonal(distance, 0.0)
+        return leaves_list(linkage(squareform(distance, checks=False), method='average'))
+    # Bez scipy: porządek spektralny (wektor Fiedlera laplasjanu macierzy |r|)
+    laplacian = np.diag(similarity.sum(axis=1)) - similarity
+    return np.argsort(np.linalg.eigh(laplacian)[1][:, 1], kind='stable')
+
+
+def heatmap_layout(correlation, max_columns=HEATMAP_MAX_COLUMNS, annotate_max=HEATMAP_ANNOTATE_MAX):
+    """Macierz do narysowania: małe bez zmian z wartościami w komórkach, większe pogrupowane,
+    a powyżej `max_columns` uśrednione w bloki sąsiednich (po grupowaniu) kolumn.
+
+    Zwraca (macierz, czy opisywać komórki, opis przekształcenia lub None).
+    """
+    n = len(correlation)
+    if n <= annotate_max:
+        return correlation, True, None
+    order = cluster_order(correlation)
+    ordered = correlation.iloc[order, order]
+    if n <= max_columns:
+        return ordered, False, f"{n} kolumn pogrupowanych według podobieństwa"
+
+    starts = np.array([group[0] for group in np.array_split(np.arange(n), max_columns)])
+    sizes = np.diff(np.append(starts, n))
+    values = ordered.to_numpy(dtype=np.float64)
+    present = ~np.isnan(values)
+    sums = np.add.reduceat(np.add.reduceat(np.where(present, values, 0.0), starts, axis=0), starts, axis=1)
+    counts = np.add.reduceat(np.add.reduceat(present.astype(np.int64), starts, axis=0), starts, axis=1)
+    with np.errstate(invalid='ignore'):
+        means = sums / counts
+    labels = [str(ordered.index[start]) if size == 1 else f"{ordered.index[start]} (+{size - 1})"
+              for start, size in zip(starts, sizes)]
+    matrix = pd.DataFrame(means, index=labels, columns=labels)
+    return matrix, False, f"{n} kolumn pogrupowanych i uśrednionych w {len(starts)} bloków"
+
+
+AGGREGATES = ('liczba', 'suma', 'średnia', 'min', 'max', 'unikalne', 'mediana')  # oraz percentyle pNN
+NUMERIC_AGGREGATES = ('suma', 'średnia', 'min', 'max', 'mediana')
+AGG_CHUNK_ROWS = 1_000_000  # Fragment przy agregacji częściowej - ogranicza tymczasowe kopie kolumn
+AGGREGATE_CACHE_SIZE = 16
+GROUP_CACHE_SIZE = 4  # Zakodowane klucze trzymają numer grupy dla każdego wiersza
+PIVOT_MAX_COLUMNS = 1000
+AGGREGATE_DISPLAY_ROWS = 1000
+
+
+class Measure:
+    """Miara zestawienia: funkcja i kolumna, np. suma(Kwota), p90(Czas), unikalne(Klient), liczba(*)"""
+
+    PATTERN = re.compile(r'^\s*(\w+)\s*\(\s*(.*?)\s*\)\s*$')
+    PERCENTILE = re.compile(r'^p(\d{1,2}(?:\.\d+)?)$')
+
+    def __init__(self, func, column=None):
+        func = func.lower()
+        percentile = self.PERCENTILE.match(func)
+        if func not in AGGREGATES and not (percentile and 0 < float(percentile.group(1)) < 100):
+            raise ValueError(f"Nieznana funkcja agregacji '{func}' (dostępne: {', '.join(AGGREGATES)}, pNN)")
+        if column is None and func != 'liczba':
+            raise ValueError(f"Funkcja '{func}' wymaga kolumny")
+        self.func = func
+        self.column = column
+        self.quantile = 0.5 if func == 'mediana' else float(percentile.group(1)) / 100 if percentile else None
+
+    def __str__(self):
+        return f"{self.func}({'*' if self.column is None else self.column})"
+
+    def __eq__(self, other):
+        return isinstance(other, Measure) and (self.func, self.column) == (other.func, other.column)
+
+    def __hash__(self):
+        return hash((self.func, self.column))
+
+    @property
+    def numeric(self):
+        return self.func in NUMERIC_AGGREGATES or self.quantile is not None
+
+    @classmethod
+    def parse(cls, text):
+        """Miara zapisana jako 'funkcja(kolumna)'; '*' oznacza liczbę wierszy"""
+        match = cls.PATTERN.match(text)
+        if match is None:
+            raise ValueError(f"Miara '{text}' nie ma postaci funkcja(kolumna)")
+        func, column = match.groups()
+        return cls(func, None if column in ("", "*") else column)
+
+
+def parse_measures(text):
+    """Miary rozdzielone przecinkami lub w osobnych wierszach"""
+    return [Measure.parse(part) for part in re.split(r'[,\n]', text) if part.strip()]
+
+
+class ValueDictionary:
+    """Słownik wartość -> kolejny kod, uzupełniany fragmentami.
+
+    Fragment jest kodowany przez pd.factorize (kody kategorii dla kolumn kategorycznych), a tylko
+    jego unikalne wartości są szukane w słowniku - bez pętli po wierszach w Pythonie.
+    """
+
+    def __init__(self):
+        self.values = None  # pd.Index wartości w kolejności pierwszego wystąpienia
+
+    def __len__(self):
+        return 0 if self.values is None else len(self.values)
+
+    def encode(self, values):
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        uniques = pd.Index(uniques)
+        if self.values is None:
+            self.values = uniques
+            return codes.astype(np.int64)
+        positions = self.values.get_indexer(uniques)
+        new = positions < 0
+        if new.any():
+            positions[new] = np.arange(len(self.values), len(self.values) + new.sum())
+            self.values = self.values.append(uniques[new])
+        return positions[codes]
+
+
+class GroupKeys:
+    """Numery grup dla kombinacji wartości kluczy (agregacja haszowa, bez sortowania wierszy).
+
+    Każdy klucz ma słownik kodów; kolejne klucze są składane parami (grupa << 32 | kod)
+    w słownikach par, więc numery grup są stałe między fragmentami pliku.
+    """
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.dictionaries = [ValueDictionary() for _ in self.keys]
+        self.pairs = [ValueDictionary() for _ in self.keys[1:]]
+
+    def __len__(self):
+        return len(self.pairs[-1] if self.pairs else self.dictionaries[0])
+
+    def encode(self, chunk):
+        """Numery grup dla wierszy fragmentu"""
+        groups = self.dictionaries[0].encode(chunk[self.keys[0]])
+        for key, dictionary, pairs in zip(self.keys[1:], self.dictionaries[1:], self.pairs):
+            groups = pairs.encode((groups << 32) | dictionary.encode(chunk[key]))
+        return groups
+
+    def frame(self):
+        """Wartości kluczy dla kolejnych numerów grup"""
+        if not len(self):
+            return pd.DataFrame({key: pd.Series(dtype=object) for key in self.keys})
+        groups = np.arange(len(self), dtype=np.int64)
+        columns = {}
+        for key, dictionary, pairs in reversed(list(zip(self.keys[1:], self.dictionaries[1:], self.pairs))):
+            packed = pairs.values.to_numpy()[groups]
+            columns[key] = dictionary.values.take(packed & 0xFFFFFFFF)
+            groups = packed >> 32
+        columns[self.keys[0]] = self.dictionaries[0].values.take(groups)
+        return pd.DataFrame({key: columns[key].array for key in self.keys})
+
+
+def grown(values, size, fill):
+    return values if len(values) >= size else np.concatenate([values, np.full(size - len(values), fill)])
+
+
+class GroupAggregator:
+    """Stany częściowe miar per grupa (liczności, sumy, min/max, pary grupa-wartość), łączone fragmentami.
+
+    Percentyle są dokładne, gdy `exact_quantiles` (wartości zbierane do jednego sortowania), a dla
+    strumienia pliku przybliżone szkicem KLL per grupa - jak kwartyle w stream_describe.
+    """
+
+    def __init__(self, measures, exact_quantiles=True):
+        self.measures = list(measures)
+        self.exact_quantiles = exact_quantiles
+        self.groups = 0
+        self.rows = np.zeros(0, dtype=np.int64)
+        counted = {m.column for m in self.measures if m.column is not None}
+        numeric = {m.column for m in self.measures if m.numeric}
+        self.count = {column: np.zeros(0, dtype=np.int64) for column in counted}
+        self.sum = {column: np.zeros(0) for column in numeric}
+        self.min = {column: np.zeros(0) for column in numeric}
+        self.max = {column: np.zeros(0) for column in numeric}
+        self.distinct = {m.column: (ValueDictionary(), np.zeros(0, dtype=np.int64))
+                         for m in self.measures if m.func == 'unikalne'}
+        self.quantile_parts = {m.column: [] for m in self.measures if m.quantile is not None}  # (grupy, wartości)
+        self.sketches = {m.column: {} for m in self.measures if m.quantile is not None}  # grupa -> KLLSketch
+
+    def resize(self, groups):
+        self.groups = max(self.groups, groups)
+        self.rows = grown(self.rows, self.groups, 0)
+        for column in self.count:
+            self.count[column] = grown(self.count[column], self.groups, 0)
+        for column in self.sum:
+            self.sum[column] = grown(self.sum[column], self.groups, 0.0)
+            self.min[column] = grown(self.min[column], self.groups, np.inf)
+            self.max[column] = grown(self.max[column], self.groups, -np.inf)
+
+    def update(self, groups, n_groups, chunk):
+        """Dokłada fragment: `groups` to numery grup jego wierszy (z GroupKeys)"""
+        self.resize(n_groups)
+        self.rows += np.bincount(groups, minlength=self.groups)
+        for column in self.count:
+            present = chunk[column].notna().to_numpy()
+            self.count[column] += np.bincount(groups[present], minlength=self.groups)
+            if column in self.distinct:
+                dictionary, pairs = self.distinct[column]
+                codes = dictionary.encode(chunk[column][present])
+                pairs = pd.unique(np.concatenate([pairs, (groups[present] << 32) | codes]))
+                self.distinct[column] = (dictionary, pairs)
+        for column in self.sum:
+            values = numeric_values(pd.to_numeric(chunk[column], errors='coerce'))
+            valid = ~np.isnan(values)
+            where, values = groups[valid], values[valid]
+            self.sum[column] += np.bincount(where, weights=values, minlength=self.groups)
+            np.minimum.at(self.min[column], where, values)
+            np.maximum.at(self.max[column], where, values)
+            if column in self.quantile_parts:
+                self.add_quantile_values(column, where, values)
+
+    def add_quantile_values(self, column, groups, values):
+        if self.exact_quantiles:
+            self.quantile_parts[column].append((groups, values))
+            return
+        order = np.argsort(groups, kind='stable')
+        present, starts = np.unique(groups[order], return_index=True)
+        sketches = self.sketches[column]
+        for group, part in zip(present, np.split(values[order], starts[1:])):
+            sketch = sketches.get(group)
+            if sketch is None:
+                sketch = sketches[group] = KLLSketch(seed=int(group))
+            sketch.update(part)
+
+    def quantiles(self, column, q):
+        result = np.full(self.groups, np.nan)
+        if not self.exact_quantiles:
+            for group, sketch in self.sketches[column].items():
+                result[group] = sketch.quantile(q)
+            return result
+        parts = self.quantile_parts[column]
+        if not parts:
+            return result
+        groups = np.concatenate([part[0] for part in parts])
+        values = np.concatenate([part[1] for part in parts])
+        # Sortowanie wartości, potem stabilne (pozycyjne) po numerze grupy - szybsze niż lexsort
+        order = np.argsort(values)
+        order = order[np.argsort(groups[order], kind='stable')]
+        values = values[order]
+        counts = np.bincount(groups, minlength=self.groups)
+        starts = np.cumsum(counts) - counts
+        present = counts > 0
+        # Interpolacja liniowa między sąsiednimi wartościami (jak ColumnStats.quantile i pandas)
+        position = q * (counts[present] - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, counts[present] - 1)
+        lower = values[starts[present] + low]
+        upper = values[starts[present] + high]
+        result[present] = lower + (upper - lower) * (position - low)
+        return result
+
+    def measure_values(self, measure):
+        column = measure.column
+        if measure.func == 'liczba':
+            return self.rows if column is None else self.count[column]
+        if measure.func == 'unikalne':
+            return np.bincount(self.distinct[column][1] >> 32, minlength=self.groups)
+        if measure.quantile is not None:
+            return self.quantiles(column, measure.quantile)
+        count = self.count[column]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = {'suma': self.sum[column], 'średnia': self.sum[column] / count,
+                      'min': self.min[column], 'max': self.max[column]}[measure.func]
+        # Grupa bez wartości liczbowych: suma 0 (jak pandas), pozostałe miary nieokreślone
+        return values if measure.func == 'suma' else np.where(count > 0, values, np.nan)
+
+    def result(self, keys_frame):
+        """Tabela wynikowa: kolumny kluczy, potem miary; wiersze posortowane według kluczy"""
+        self.resize(len(keys_frame))
+        result = keys_frame.copy()
+        for measure in self.measures:
+            result[str(measure)] = self.measure_values(measure)
+        try:
+            result = result.sort_values(list(keys_frame.columns), na_position='last', kind='stable')
+        except TypeError:
+            pass  # Klucz o wartościach różnych typów (np. liczby i tekst w kolejnych fragmentach pliku)
+        return result.reset_index(drop=True)
+
+
+def aggregate_chunks(chunks, keys, measures, exact_quantiles=True, cancel_event=None, encoded=None):
+    """Zestawienie z kolejnych fragmentów danych; `encoded` to gotowe (GroupKeys, numery grup)
+    dla wszystkich wierszy, dzielone na fragmenty w tej samej kolejności"""
+    encoder = encoded[0] if encoded is not None else GroupKeys(keys)
+    aggregator = GroupAggregator(measures, exact_quantiles)
+    offset = 0
+    for chunk in chunks:
+        check_cancelled(cancel_event)
+        if encoded is None:
+            groups = encoder.encode(chunk)
+        else:
+            groups = encoded[1][offset:offset + len(chunk)].astype(np.int64)
+            offset += len(chunk)
+        aggregator.update(groups, len(encoder), chunk)
+    return aggregator.result(encoder.frame())
+
+
+def encode_groups(view, keys, cancel_event=None, chunk_rows=AGG_CHUNK_ROWS):
+    """Numery grup dla wszystkich wierszy widoku (do ponownego użycia z innymi miarami)"""
+    encoder = GroupKeys(keys)
+    parts = []
+    for chunk in view.chunks(chunk_rows, keys):
+        check_cancelled(cancel_event)
+        parts.append(encoder.encode(chunk))
+    groups = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+    return encoder, groups.astype(np.int32 if len(encoder) < 2 ** 31 else np.int64)
+
+
+class AggregateCache:
+    """Zakodowane klucze grup i wyniki zestawień dla jednego celu (widoku lub źródła strumieniowego).
+
+    Kolejne zestawienia po tych samych kluczach (inne miary, tabela przestawna) pomijają kodowanie
+    kluczy, a powtórzone - liczenie w ogóle. Edycja kolumny unieważnia tylko wpisy, które jej używają.
+    """
+
+    def __init__(self, limit=AGGREGATE_CACHE_SIZE, group_limit=GROUP_CACHE_SIZE):
+        self.lock = threading.RLock()
+        self.limit = limit
+        self.group_limit = group_limit
+        self.reset()
+
+    def reset(self, target=None):
+        self.target = target
+        self.groups = OrderedDict()  # klucze -> (GroupKeys, numery grup wierszy)
+        self.results = OrderedDict()  # (klucze, miary) -> DataFrame
+        self.hits = 0
+
+    def use(self, target):
+        if target is not self.target:
+            self.reset(target)
+
+    def column_changed(self, column):
+        with self.lock:
+            for keys in [keys for keys in self.groups if column in keys]:
+                del self.groups[keys]
+            for entry in [entry for entry in self.results
+                          if column in entry[0] or any(m.column == column for m in entry[1])]:
+                del self.results[entry]
+
+    @staticmethod
+    def remember(store, key, value, limit):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > limit:
+            store.popitem(last=False)
+
+    def aggregate(self, target, keys, measures, cancel_event=None):
+        with self.lock:
+            self.use(target)
+            entry = (tuple(keys), tuple(measures))
+            if entry in self.results:
+                self.hits += 1
+                self.results.move_to_end(entry)
+                return self.results[entry]
+            if isinstance(target, ChunkedSource):
+                columns = list(dict.fromkeys(list(keys) + [m.column for m in measures if m.column is not None]))
+                result = aggregate_chunks(target.chunks(columns, cancel_event), keys, measures,
+                                          exact_quantiles=False, cancel_event=cancel_event)
+            else:
+                encoded = self.groups.get(entry[0])
+                if encoded is None:
+                    encoded = encode_groups(target, keys, cancel_event)
+                    self.remember(self.groups, entry[0], encoded, self.group_limit)
+                else:
+                    self.hits += 1
+                    self.groups.move_to_end(entry[0])
+                columns = list(dict.fromkeys(m.column for m in measures if m.column is not None))
+                result = aggregate_chunks(target.chunks(AGG_CHUNK_ROWS, columns), keys, measures,
+                                          cancel_event=cancel_event, encoded=encoded)
+            self.remember(self.results, entry, result, self.limit)
+            return result
+
+
+def pivot_table(result, rows, columns, measures):
+    """Tabela przestawna z wyniku zestawienia po kluczach rows + columns"""
+    names = [str(measure) for measure in measures]
+    if not columns:
+        return result
+    if not rows:
+        raise ValueError("Tabela przestawna wymaga co najmniej jednej kolumny wierszy")
+    pivot = result.set_index(list(rows) + list(columns))[names].unstack(list(columns))
+    pivot = pivot.sort_index(na_position='last')
+    if len(names) == 1:
+        pivot.columns = pivot.columns.droplevel(0)
+    if pivot.shape[1] > PIVOT_MAX_COLUMNS:
+        raise ValueError(f"Tabela przestawna miałaby {pivot.shape[1]} kolumn (limit {PIVOT_MAX_COLUMNS})")
+    pivot.columns = [" | ".join(map(str, label)) if isinstance(label, tuple) else str(label)
+                     for label in pivot.columns]
+    return pivot.reset_index()
+
+
+def format_aggregate(table, keys, measures, approximate=False, limit=AGGREGATE_DISPLAY_ROWS):
+    lines = [f"ZESTAWIENIE: {', '.join(map(str, keys))} | miary: {', '.join(map(str, measures))}",
+             f"Wierszy wyniku: {len(table)}"]
+    if approximate and any(m.quantile is not None for m in measures):
+        lines.append("Percentyle przybliżone (szkic KLL) - dane czytane fragmentami z pliku")
+    if len(table) > limit:
+        lines.append(f"Pokazano pierwsze {limit} wierszy")
+    lines.append("")
+    lines.append(table.head(limit).to_string(index=False))
+    return "\n".join(lines)
+
+
+CUBE_FUNCTIONS = ('liczba', 'suma', 'średnia', 'min', 'max')  # Miary addytywne - zwijane bez surowych faktów
+ROLLUP = {'liczba': 'sum', 'suma': 'sum', 'min': 'min', 'max': 'max'}
+CUBE_DERIVED_SIZE = 32  # Zwinięcia policzone przy zapytaniach, trzymane w pamięci
+
+
+def parse_slices(texts):
+    """Wycinki 'wymiar=w1,w2' -> {wymiar: [wartości]}; pusta wartość oznacza brak danych"""
+    slices = {}
+    for text in texts:
+        dimension, sep, values = text.partition('=')
+        if not sep or not dimension.strip():
+            raise ValueError(f"Wycinek '{text}' nie ma postaci 'wymiar=wartość1,wartość2'")
+        slices.setdefault(dimension.strip(), []).extend(value.strip() for value in values.split(','))
+    return slices
+
+
+def cube_signature(file_path):
+    stat = os.stat(file_path)
+    return {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def cube_path_for(file_path, dimensions, measures):
+    """Katalog kostki obok CSV, kluczowany plikiem (rozmiar, czas modyfikacji) i definicją kostki"""
+    signature = cube_signature(file_path)
+    key = "|".join([signature['path'], str(signature['size']), str(signature['mtime_ns'])]
+                   + list(dimensions) + [str(measure) for measure in measures])
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    directory, name = os.path.split(signature['path'])
+    return os.path.join(directory, f".{name}.kostka.{digest}")
+
+
+def saved_cubes(file_path):
+    """Zapisane kostki aktualne dla pliku: lista (katalog, wymiary, miary)"""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    signature = cube_signature(file_path)
+    cubes = []
+    for path in sorted(glob.glob(os.path.join(directory, f".{glob.escape(name)}.kostka.*"))):
+        try:
+            with open(os.path.join(path, Cube.MANIFEST), encoding='utf-8') as handle:
+                manifest = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        if manifest.get('source') == signature:
+            cubes.append((path, manifest['dimensions'], manifest['measures']))
+    return cubes
+
+
+class Cube:
+    """Kostka OLAP: miary addytywne zagregowane po wybranych kombinacjach wymiarów (kuboidach).
+
+    Najdrobniejszy kuboid (wszystkie wymiary) liczony jest z faktów jednym przebiegiem zestawienia.
+    Każde zapytanie - zwinięcie, rozwinięcie, wycinek - liczone jest z najmniejszego kuboidu, który
+    zawiera potrzebne wymiary; średnie składane są z sum i liczności, więc wynik jest dokładny.
+    """
+
+    MANIFEST = 'kostka.json'
+
+    def __init__(self, dimensions, measures, cuboids, facts):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.states = self.state_measures(self.measures)
+        self.cuboids = cuboids  # krotka wymiarów (w kolejności kostki) -> DataFrame stanów
+        self.facts = facts
+        self.derived = OrderedDict()  # Zwinięcia z zapytań - kolejne zapytania mogą z nich korzystać
+        self.path = None  # Katalog zapisanej kostki
+        self.loaded = False  # Wczytana z dysku zamiast liczenia z faktów
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def check_measures(measures):
+        for measure in measures:
+            if measure.func not in CUBE_FUNCTIONS:
+                raise ValueError(f"Miara {measure} nie jest addytywna - kostka obsługuje: {', '.join(CUBE_FUNCTIONS)}")
+
+    @staticmethod
+    def state_measures(measures):
+        """Stany zapisywane w kuboidach: liczności, sumy i skrajne wartości, z których składa się miary"""
+        states = [Measure('liczba')]
+        for measure in measures:
+            if measure.column is None:
+                continue
+            needed = {'liczba': ['liczba'], 'suma': ['suma'], 'średnia': ['suma', 'liczba'],
+                      'min': ['min'], 'max': ['max']}[measure.func]
+            states += [Measure(func, measure.column) for func in needed]
+        return list(dict.fromkeys(states))
+
+    def canonical(self, dimensions):
+        return tuple(dimension for dimension in self.dimensions if dimension in dimensions)
+
+    @classmethod
+    def build(cls, chunks, dimensions, measures, combinations=(), cancel_event=None):
+        """Kostka z fragmentów faktów; `combinations` to dodatkowe kuboidy (podzbiory wymiarów)"""
+        cls.check_measures(measures)
+        states = cls.state_measures(measures)
+        base = aggregate_chunks(chunks, dimensions, states, cancel_event=cancel_event)
+        cube = cls(dimensions, measures, {tuple(dimensions): base}, int(base['liczba(*)'].sum()))
+        cube.materialize(combinations, cancel_event)
+        return cube
+
+    def materialize(self, combinations, cancel_event=None):
+        """Dodaje kuboidy dla podzbiorów wymiarów; zwraca liczbę nowych"""
+        for combination in combinations:
+            unknown = [dimension for dimension in combination if dimension not in self.dimensions]
+            if unknown:
+                raise ValueError(f"Kuboid ({', '.join(combination)}): spoza wymiarów kostki - {', '.join(unknown)}")
+        added = 0
+        # Od najdrobniejszych - kolejne kuboidy zwijane z najmniejszego już policzonego
+        for combination in sorted({self.canonical(c) for c in combinations}, key=len, reverse=True):
+            check_cancelled(cancel_event)
+            if combination not in self.cuboids:
+                self.cuboids[combination] = self.rollup(self.smallest(combination)[1], combination)
+                added += 1
+        return added
+
+    def smallest(self, needed):
+        """Najmniejszy kuboid (zapisany lub z zapytań) zawierający wymiary `needed`"""
+        candidates = list(self.cuboids.items()) + list(self.derived.items())
+        return min(((dims, table) for dims, table in candidates if set(needed) <= set(dims)),
+                   key=lambda item: len(item[1]))
+
+    def rollup(self, table, dimensions):
+        """Zwinięcie stanów do podzbioru wymiarów (sumy liczności i sum, minimum minimów...)"""
+        how = {str(state): ROLLUP[state.func] for state in self.states}
+        if not dimensions:
+            return pd.DataFrame([{name: getattr(table[name], func)() for name, func in how.items()}])
+        grouped = table.groupby(list(dimensions), dropna=False, sort=True, observed=True)
+        return grouped.agg(how).reset_index()
+
+    def query(self, dimensions=(), slices=None):
+        """Miary po wymiarach `dimensions` dla faktów z wycinka `slices` ({wymiar: wartości}).
+
+        Zwraca (tabela, wymiary kuboidu, z którego policzono wynik).
+        """
+        dimensions = list(dimensions)
+        slices = slices or {}
+        for dimension in dimensions + list(slices):
+            if dimension not in self.dimensions:
+                raise ValueError(f"'{dimension}' nie jest wymiarem kostki ({', '.join(self.dimensions)})")
+        if len(set(dimensions)) != len(dimensions):
+            raise ValueError("Wymiary zapytania powtarzają się")
+
+        with self.lock:
+            source, table = self.smallest(set(dimensions) | set(slices))
+            if slices:
+                mask = np.ones(len(table), dtype=bool)
+                for dimension, values in slices.items():
+                    mask &= self.slice_mask(table[dimension], values)
+                states = self.rollup(table[mask], self.canonical(dimensions))
+            else:
+                target = self.canonical(dimensions)
+                states = self.derived.get(target)
+                if states is None:
+                    states = table if source == target else self.rollup(table, target)
+                    if target not in self.cuboids:
+                        self.derived[target] = states
+                        while len(self.derived) > CUBE_DERIVED_SIZE:
+                            self.derived.popitem(last=False)
+                else:
+                    self.derived.move_to_end(target)
+                    source = target
+        return self.finalize(states, dimensions), source
+
+    @staticmethod
+    def slice_mask(column, values):
+        """Dopasowanie wartości wymiaru - także wpisanych tekstem (np. '2020' dla liczby)"""
+        texts = [str(value) for value in values]
+        mask = column.isin(values).to_numpy() | column.astype(str).isin(texts).to_numpy()
+        if "" in texts or any(value is None for value in values):
+            mask |= column.isna().to_numpy()
+        return mask
+
+    def finalize(self, states, dimensions):
+        result = states[dimensions].copy() if dimensions else pd.DataFrame(index=states.index)
+        for measure in self.measures:
+            if measure.func == 'średnia':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result[str(measure)] = (states[f"suma({measure.column})"]
+                                            / states[f"liczba({measure.column})"].replace(0, np.nan))
+            else:
+                result[str(measure)] = states[str(measure)]
+        if dimensions:
+            result = result.sort_values(dimensions, na_position='last', kind='stable')
+        return result.reset_index(drop=True)
+
+    @property
+    def nbytes(self):
+        return sum(int(table.memory_usage(deep=True).sum()) for table in self.cuboids.values())
+
+    def describe(self):
+        lines = [f"KOSTKA: wymiary {', '.join(self.dimensions)} | miary: {', '.join(map(str, self.measures))}",
+                 f"Faktów: {self.facts}, pamięć kuboidów: {self.nbytes / 1024 ** 2:.1f} MB", "Kuboidy:"]
+        for dims, table in sorted(self.cuboids.items(), key=lambda item: -len(item[0])):
+            lines.append(f"  ({', '.join(dims) or 'suma całkowita'}): {len(table)} wierszy")
+        return "\n".join(lines)
+
+    def save(self, path, file_path):
+        """Zapis kuboidów (Feather) i manifestu; nieaktualne kostki tego pliku są usuwane"""
+        import shutil
+
+        directory, name = os.path.split(os.path.abspath(file_path))
+        current = {cube[0] for cube in saved_cubes(file_path)}
+        for stale in glob.glob(os.path.join(directory, f".{glob.escape(name)}.kostka.*")):
+            if stale != path and stale not in current:
+                shutil.rmtree(stale, ignore_errors=True)
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        cuboids = []
+        for number, (dims, table) in enumerate(self.cuboids.items()):
+            file_name = f"kuboid_{number}.feather"
+            table.reset_index(drop=True).to_feather(os.path.join(tmp_path, file_name))
+            cuboids.append({'dimensions': list(dims), 'file': file_name})
+        manifest = {'source': cube_signature(file_path), 'dimensions': self.dimensions,
+                    'measures': [str(measure) for measure in self.measures],
+                    'facts': self.facts, 'cuboids': cuboids}
+        with open(os.path.join(tmp_path, self.MANIFEST), 'w', encoding='utf-8') as handle:
+            json.dump(manifest, handle, ensure_ascii=False, indent=1)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, cls.MANIFEST), encoding='utf-8') as handle:
+            manifest = json.load(handle)
+        cuboids = {tuple(item['dimensions']): pd.read_feather(os.path.join(path, item['file']))
+                   for item in manifest['cuboids']}
+        measures = [Measure.parse(text) for text in manifest['measures']]
+        cube = cls(manifest['dimensions'], measures, cuboids, manifest['facts'])
+        cube.path, cube.loaded = path, True
+        return cube
+
+
+def format_cube_query(table, dimensions, source, cube, limit=AGGREGATE_DISPLAY_ROWS):
+    lines = [f"KOSTKA: {', '.join(dimensions) or 'suma całkowita'} | policzono z kuboidu "
+             f"({', '.join(source) or 'suma całkowita'}), {cube.facts} faktów",
+             f"Wierszy wyniku: {len(table)}"]
+    if len(table) > limit:
+        lines.append(f"Pokazano pierwsze {limit} wierszy")
+    lines.append("")
+    lines.append(table.head(limit).to_string(index=False))
+    return "\n".join(lines)
+
+
+def convert_for_column(dtype, text):
+    """Zamienia tekst wpisany przez użytkownika na wartość zgodną z typem kolumny"""
+    if pd.api.types.is_numeric_dtype(dtype):
+        return np.nan if text.strip() == "" else pd.to_numeric(text)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.NaT if text.strip() == "" else pd.to_datetime(text)
+    return text if text.strip() != "" else np.nan
+
+
+MISSING_TOKENS = ("", "NaN", "nan")  # Wartość reguły oznaczająca brak danych
+RULE_PREFIXES = {"re:": "regex", "zakres:": "zakres"}
+
+
+class ReplaceRule:
+    """Reguła zamiany: dokładna wartość, wyrażenie regularne ("re:...") albo zakres ("zakres:od..do")"""
+
+    def __init__(self, kind, old, new):
+        self.kind = kind
+        self.old = old
+        self.new = new
+        if kind == "regex":
+            try:
+                self.pattern = re.compile(old)
+            except re.error as e:
+                raise ValueError(f"Niepoprawne wyrażenie regularne '{old}': {e}")
+        elif kind == "zakres":
+            low, separator, high = old.partition("..")
+            if not separator:
+                raise ValueError(f"Zakres '{old}' nie ma postaci 'od..do'")
+            self.low, self.high = low.strip(), high.strip()
+
+    def __str__(self):
+        prefix = {"regex": "re:", "zakres": "zakres:"}.get(self.kind, "")
+        return f"{prefix}{self.old} → {self.new}"
+
+    @classmethod
+    def parse(cls, line):
+        """Reguła z wiersza 'stara;nowa' (prefiksy re: i zakres: w starej wartości)"""
+        old, separator, new = line.rpartition(";")
+        if not separator:
+            raise ValueError(f"Reguła '{line}' nie ma postaci 'stara;nowa'")
+        for prefix, kind in RULE_PREFIXES.items():
+            if old.startswith(prefix):
+                return cls(kind, old[len(prefix):], new)
+        return cls("wartość", old, new)
+
+    def bounds(self, dtype):
+        """Granice zakresu w typie kolumny (None = bez ograniczenia); None, gdy typ nie pasuje"""
+        if not (is_numeric_column(dtype) or pd.api.types.is_datetime64_any_dtype(dtype)):
+            return None
+        bounds = []
+        for text in (self.low, self.high):
+            bound = None if text == "" else exact_key(dtype, text)
+            if text != "" and bound is None:
+                return None  # Np. zakres dat dla kolumny liczbowej - reguła jej nie dotyczy
+            bounds.append(bound)
+        return tuple(bounds)
+
+
+def parse_mapping(text):
+    """Tabela zamian: jedna reguła 'stara;nowa' na wiersz, puste wiersze i '#' pomijane"""
+    rules = []
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if not rules and line.strip().lower() == "stara;nowa":
+            continue  # Nagłówek pliku CSV
+        rules.append(ReplaceRule.parse(line))
+    return rules
+
+
+def load_mapping(path):
+    with open(path, encoding="utf-8-sig") as handle:
+        return parse_mapping(handle.read())
+
+
+def exact_key(dtype, text):
+    """Wartość reguły dokładnej w typie kolumny; None, gdy nie pasuje do typu"""
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        try:
+            return pd.Timestamp(text)
+        except ValueError:
+            return None
+    if is_numeric_column(dtype):
+        return parse_number(text)
+    if pd.api.types.is_bool_dtype(dtype):
+        return {"true": True, "false": False}.get(text.strip().lower())
+    return text
+
+
+def typed_new(dtype, text):
+    """Nowa wartość w typie kolumny - błąd zamiast cichej zamiany na NaN"""
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    try:
+        return convert_for_column(dtype, text)
+    except (TypeError, ValueError):
+        raise ValueError(f"Nowa wartość '{text}' nie pasuje do typu kolumny ({dtype})")
+
+
+def compact_values(values):
+    """Tablica z jedną powtarzaną wartością zapisywana jako skalar (dziennik zmian)"""
+    if len(values) and pd.Series(values).nunique(dropna=False) == 1:
+        return values[0]
+    return values
+
+
+def plan_replacements(series, rules):
+    """Wiersze do zmiany i nowe wartości wg reguł - pierwsza pasująca reguła wygrywa.
+
+    Kolejne reguły dokładne są łączone w jedną mapę (isin + map), regex i zakresy to po
+    jednej operacji wektorowej; kolumny kategoryczne liczone są tylko na kategoriach.
+    Zwraca (pozycje wierszy, stare wartości, nowe wartości) tylko dla faktycznych zmian.
+    """
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Reguły na kategoriach i braku danych, wiersze dostają wynik przez kody
+        categories = dtype.categories
+        lookup = pd.Series(categories).reindex(range(len(categories) + 1))  # + brak danych na końcu
+        positions, _, new = plan_replacements(lookup, rules)
+        changed = np.zeros(len(lookup), dtype=bool)
+        changed[positions] = True
+        new_by_code = np.empty(len(lookup), dtype=object)
+        new_by_code[positions] = new
+        codes = series.cat.codes.to_numpy()  # -1 (brak) trafia na ostatni element
+        rows = np.flatnonzero(changed[codes])
+        return rows, series.iloc[rows].to_numpy(dtype=object), new_by_code[codes[rows]]
+
+    n = len(series)
+    assigned = np.zeros(n, dtype=bool)
+    new_values = np.empty(n, dtype=object)
+    text = None
+    pending = []  # Kolejne reguły dokładne do połączenia w jedną mapę
+
+    def flush():
+        if not pending:
+            return
+        mapping, missing_new = {}, None
+        for rule in pending:
+            if rule.old in MISSING_TOKENS:
+                missing_new = rule.new if missing_new is None else missing_new
+                continue
+            key = exact_key(dtype, rule.old)
+            if key is not None:
+                mapping.setdefault(key, rule.new)
+        keys = Predicate.as_text(series) if pd.api.types.is_object_dtype(dtype) else series
+        if mapping:
+            mask = keys.isin(list(mapping)).to_numpy(dtype=bool) & ~assigned
+            # Konwersja tylko nowych wartości kluczy, które faktycznie wystąpiły
+            present = {key: typed_new(dtype, mapping[key]) for key in pd.unique(keys[mask])}
+            new_values[mask] = keys[mask].map(present).to_numpy(dtype=object)
+            assigned[mask] = True
+        if missing_new is not None:
+            mask = series.isna().to_numpy() & ~assigned
+            if mask.any():
+                new_values[mask] = typed_new(dtype, missing_new)
+                assigned[mask] = True
+        pending.clear()
+
+    for rule in rules:
+        if rule.kind == "wartość":
+            pending.append(rule)
+            continue
+        flush()
+        if rule.kind == "regex":
+            if is_numeric_column(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+                continue  # Wyrażenia regularne tylko dla kolumn tekstowych
+            if text is None:
+                text = Predicate.as_text(series)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)  # Grupy we wzorcu służą do podstawień
+                mask = text.str.contains(rule.pattern, na=False).to_numpy(dtype=bool) & ~assigned
+            new_values[mask] = text[mask].str.replace(rule.pattern, rule.new, regex=True).to_numpy(dtype=object)
+        else:
+            bounds = rule.bounds(dtype)
+            if bounds is None:
+                continue
+            low, high = bounds
+            mask = series.notna().to_numpy(copy=True)
+            if low is not None:
+                mask &= (series >= low).to_numpy(dtype=bool)
+            if high is not None:
+                mask &= (series <= high).to_numpy(dtype=bool)
+            mask &= ~assigned
+            if mask.any():
+                new_values[mask] = typed_new(dtype, rule.new)
+        assigned[mask] = True
+    flush()
+
+    rows = np.flatnonzero(assigned)
+    old = series.iloc[rows].to_numpy(dtype=object)
+    new = new_values[rows]
+    # Zmiana tylko tam, gdzie wartość faktycznie jest inna
+    old_series, new_series = pd.Series(old, dtype=object), pd.Series(new, dtype=object)
+    same = ((old_series == new_series) | (old_series.isna() & new_series.isna())).to_numpy(dtype=bool)
+    return rows[~same], old[~same], new[~same]
+
+
+class RowSet:
+    """Zbiór pozycji wierszy w najmniejszej postaci: lista pozycji albo spakowana maska bitowa"""
+
+    def __init__(self, positions, total):
+        positions = np.asarray(positions, dtype=np.int64)
+        self.total = total
+        dtype = np.uint32 if total <= np.iinfo(np.uint32).max else np.int64
+        if len(positions) * np.dtype(dtype).itemsize <= (total + 7) // 8:
+            self.packed = None
+            self.rows = positions.astype(dtype)
+        else:
+            mask = np.zeros(total, dtype=bool)
+            mask[positions] = True
+            self.packed = np.packbits(mask)
+            self.rows = None
+
+    def __len__(self):
+        if self.rows is not None:
+            return len(self.rows)
+        return int(np.unpackbits(self.packed, count=self.total).sum())
+
+    @property
+    def nbytes(self):
+        return (self.rows if self.rows is not None else self.packed).nbytes
+
+    def positions(self):
+        if self.rows is not None:
+            return self.rows.astype(np.int64)
+        return np.flatnonzero(np.unpackbits(self.packed, count=self.total))
+
+
+class Change:
+    """Zmiana w jednej kolumnie: wiersze ramki bazowej, stare i nowe wartości (skalar albo tablica)"""
+
+    def __init__(self, column, rows, old, new, dtype, description):
+        self.column = column
+        self.rows = rows  # RowSet z pozycjami w ramce bazowej
+        self.old = old
+        self.new = new
+        self.dtype = dtype  # Typ kolumny przed zmianą - przywracany przy cofnięciu
+        self.description = description
+
+    @property
+    def changes(self):
+        return [self]
+
+    @property
+    def nbytes(self):
+        values = sum(v.nbytes if isinstance(v, np.ndarray) else 8 for v in (self.old, self.new))
+        return self.rows.nbytes + values
+
+    @staticmethod
+    def write(df, column, positions, values):
+        """Zapisuje wartości w kolumnie, poszerzając jej typ, jeśli trzeba"""
+        series = df[column]
+        for value in (pd.unique(np.asarray(values, dtype=object)) if isinstance(values, np.ndarray)
+                      else [values]):
+            series = widen_for_value(series, value)
+        if series is not df[column]:
+            df[column] = series
+        if isinstance(values, np.ndarray):
+            # Wartości z dziennika/planu jako obiekty - rzutowanie na (poszerzony) typ kolumny
+            values = pd.Series(values, dtype=object).astype(series.dtype).array
+        df.iloc[positions, df.columns.get_loc(column)] = values
+
+    def apply(self, df):
+        self.write(df, self.column, self.rows.positions(), self.new)
+
+    def revert(self, df):
+        self.write(df, self.column, self.rows.positions(), self.old)
+        if df[self.column].dtype != self.dtype:
+            # Stan sprzed zmiany mieścił się w dawnym typie - powrót jest dokładny
+            df[self.column] = df[self.column].astype(self.dtype)
+
+
+class ChangeSet:
+    """Kilka zmian (np. zamiana w wielu kolumnach) cofanych i ponawianych jako jedna"""
+
+    def __init__(self, changes, description):
+        self.changes = changes
+        self.description = description
+
+    @property
+    def nbytes(self):
+        return sum(change.nbytes for change in self.changes)
+
+    def apply(self, df):
+        for change in self.changes:
+            change.apply(df)
+
+    def revert(self, df):
+        for change in reversed(self.changes):
+            change.revert(df)
+
+
+class EditJournal:
+    """Dziennik edycji z cofaniem i ponawianiem - pamięć rośnie z liczbą zmian, nie z rozmiarem tabeli"""
+
+    def __init__(self):
+        self.changes = []
+        self.position = 0  # Liczba zastosowanych zmian; dalsze czekają na ponowienie
+
+    def __len__(self):
+        return self.position
+
+    @property
+    def can_undo(self):
+        return self.position > 0
+
+    @property
+    def can_redo(self):
+        return self.position < len(self.changes)
+
+    @property
+    def nbytes(self):
+        return sum(change.nbytes for change in self.changes)
+
+    def active(self):
+        return self.changes[:self.position]
+
+    def record(self, change):
+        # Nowa zmiana po cofnięciu porzuca gałąź do ponowienia
+        del self.changes[self.position:]
+        self.changes.append(change)
+        self.position += 1
+
+    def undo(self, df):
+        self.position -= 1
+        change = self.changes[self.position]
+        change.revert(df)
+        return change
+
+    def redo(self, df):
+        change = self.changes[self.position]
+        change.apply(df)
+        self.position += 1
+        return change
+
+
+def replay_changes(source_path, target_path, changes, labels, cancel_event=None):
+    """Zapisuje plik źródłowy z naniesionymi zmianami, czytając go fragmentami.
+
+    `labels` zamienia pozycje w ramce bazowej na numery wierszy pliku (etykiety indeksu).
+    """
+    prepared = []
+    for change in (change for entry in changes for change in entry.changes):
+        rows = np.asarray(labels[change.rows.positions()], dtype=np.int64)
+        order = np.argsort(rows, kind='stable')
+        values = change.new[order] if isinstance(change.new, np.ndarray) else change.new
+        prepared.append((change.column, rows[order], values))
+
+    tmp_path = target_path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as handle:
+            header = True
+            for chunk in pd.read_csv(source_path, sep=';', chunksize=CHUNK_ROWS):
+                check_cancelled(cancel_event)
+                start, stop = chunk.index[0], chunk.index[-1] + 1
+                for column, rows, values in prepared:
+                    low, high = np.searchsorted(rows, [start, stop])
+                    if high > low:
+                        part = values[low:high] if isinstance(values, np.ndarray) else values
+                        Change.write(chunk, column, rows[low:high] - start, part)
+                chunk.to_csv(handle, index=False, sep=';', header=header)
+                header = False
+            if header:
+                pd.read_csv(source_path, sep=';', nrows=0).to_csv(handle, index=False, sep=';')
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, target_path)
+
+
+class Session:
+    """Stan pracy na jednym zbiorze: dane bazowe, bieżący widok, indeksy i statystyki.
+
+    Wspólny dla GUI i wiersza poleceń - metody analiz przyjmują opcjonalny cel (widok
+    lub źródło strumieniowe), aby zadania w tle liczyły na migawce z chwili uruchomienia.
+    W trybie out-of-core `source` czyta plik fragmentami, a `view` to tylko podgląd.
+    """
+
+    def __init__(self):
+        self.original_df = None  # Ramka bazowa - edycje zapisywane w miejscu, historia w journal
+        self.view = None  # Bieżący widok danych (FrameView nad original_df)
+        self.journal = EditJournal()  # Delty edycji do cofania, ponawiania i zapisu do źródła
+        self.source = None  # ChunkedSource w trybie out-of-core (None = dane w pamięci)
+        self.memory_report = None  # Raport ostatniej optymalizacji typów
+        self.source_path = None
+        self.indexes = IndexCache()  # Leniwe indeksy kolumn do filtrowania
+        self.stats = StatsCache()  # Statystyki per kolumna dla bieżącego widoku
+        self.backend = None  # ProcessBackend dla analiz per kolumna (None = jeden proces)
+        self.sample_seed = 0  # Ta sama próba przy ponownym podglądzie tego samego widoku
+        self.sampled = None  # (cel, liczność, warstwy, Sample) ostatniej próby
+        self.aggregates = AggregateCache()  # Kody grup i wyniki zestawień dla bieżącego celu
+        self.cube = None  # Kostka OLAP zbudowana na wszystkich faktach (wycinki robi sama kostka)
+        self.star = None  # StarSchema - wymiary dołączone do faktów (widok tylko do odczytu)
+        self.facts = None  # Ramka faktów bez złączeń (w pamięci, gdy aktywny jest model gwiazdy)
+
+    @property
+    def workers(self):
+        return 1 if self.backend is None else self.backend.workers
+
+    def set_workers(self, workers):
+        """Liczba procesów analiz per kolumna; 1 wyłącza pulę procesów"""
+        if workers == self.workers:
+            return
+        if self.backend is not None:
+            self.backend.shutdown()
+        self.backend = ProcessBackend(workers) if workers > 1 else None
+
+    @property
+    def loaded(self):
+        return self.view is not None
+
+    @property
+    def out_of_core(self):
+        return self.source is not None
+
+    def current(self):
+        """Cel analiz: strumień pliku w trybie out-of-core, inaczej bieżący widok"""
+        return self.source if self.source is not None else self.view
+
+    def set_data(self, df, memory_report=None, source_path=None):
+        # Bez kopii - edycje trafiają do ramki w miejscu, a dziennik pozwala je cofnąć
+        self.original_df = df
+        self.view = FrameView(df)
+        self.journal = EditJournal()
+        self.source = None
+        self.memory_report = memory_report
+        self.source_path = source_path
+        self.indexes = IndexCache()
+        self.stats = StatsCache()
+        self.sampled = None
+        self.aggregates = AggregateCache()
+        self.cube = None
+        self.star = None
+        self.facts = None
+
+    def load(self, file_path, optimize=False, use_cache=False, on_event=None, cancel_event=None):
+        df, report = read_source(file_path, optimize, use_cache, on_event, cancel_event)
+        self.set_data(df, report, file_path)
+        return self.view
+
+    def open_out_of_core(self, file_path, chunk_rows=CHUNK_ROWS):
+        """Otwiera plik bez wczytywania - w pamięci jest tylko podgląd pierwszych wierszy"""
+        self.set_source(ChunkedSource(file_path, chunk_rows))
+        return self.view
+
+    def set_source(self, source, preview=None):
+        preview = source.preview() if preview is None else preview
+        if source.file_path != self.source_path:
+            self.cube = None  # Filtr tego samego pliku zostawia kostkę - jest liczona na wszystkich faktach
+        if not isinstance(source, StarSource):
+            self.star = None
+        self.facts = None
+        self.original_df = None
+        self.view = FrameView(preview)
+        self.journal = EditJournal()
+        self.source = source
+        self.memory_report = None
+        self.source_path = source.file_path
+        self.indexes = IndexCache()
+        self.stats = StatsCache()
+        self.sampled = None
+        self.aggregates = AggregateCache()
+
+    def numeric_columns(self, view=None):
+        view = self.view if view is None else view
+        return view.base.select_dtypes(include=[np.number]).columns
+
+    def filtered_source(self, query, narrow=False):
+        """Źródło strumieniowe z filtrem (podgląd można policzyć w tle przed set_source)"""
+        start = self.source if narrow else self.source.unfiltered()
+        return start.filter(query)
+
+    def apply_filter(self, query, narrow=False, use_indexes=True):
+        if self.source is not None:
+            self.set_source(self.filtered_source(query, narrow))
+            return self.view
+        start = self.view if narrow else FrameView(self.original_df)
+        self.view = query.apply(start, self.indexes if use_indexes else None)
+        return self.view
+
+    def reset_filter(self):
+        if self.source is not None:
+            self.set_source(self.source.unfiltered())
+            return self.view
+        self.view = FrameView(self.original_df)
+        return self.view
+
+    def describe(self, target=None, cancel_event=None):
+        target = self.current() if target is None else target
+        if isinstance(target, ChunkedSource):
+            return stream_describe(target, cancel_event)
+        return self.stats.describe(target, cancel_event, self.backend)
+
+    def correlation(self, target=None, cancel_event=None):
+        target = self.current() if target is None else target
+        if isinstance(target, ChunkedSource):
+            return stream_correlation(target, self.numeric_columns(), cancel_event)
+        return self.stats.correlations(target, self.numeric_columns(target), cancel_event).copy()
+
+    def outliers(self, approximate=False, target=None, cancel_event=None):
+        """Podsumowania outlierów; tryb przybliżony tylko dla dużych widoków, strumień zawsze KLL"""
+        target = self.current() if target is None else target
+        if isinstance(target, ChunkedSource):
+            return stream_outliers(target, self.numeric_columns(), cancel_event)
+        approximate = approximate and len(target) >= APPROX_QUANTILE_MIN_ROWS
+        return self.stats.outlier_summaries(target, self.numeric_columns(target), approximate, cancel_event,
+                                            self.backend)
+
+    def missing(self, target=None, cancel_event=None):
+        target = self.current() if target is None else target
+        if isinstance(target, ChunkedSource):
+            return stream_missing_summary(target, cancel_event)
+        return missing_data_summary(target, cancel_event, backend=self.backend)
+
+    def value_counts(self, column, target=None, cancel_event=None):
+        """Liczności wartości kolumny - w trybie out-of-core sumowane po fragmentach"""
+        target = self.current() if target is None else target
+        if isinstance(target, ChunkedSource):
+            counts = pd.Series(dtype=np.int64)
+            for chunk in target.chunks([column], cancel_event):
+                counts = counts.add(chunk[column].value_counts(), fill_value=0)
+            return counts.astype(np.int64).sort_values(ascending=False)
+        return target.column(column).value_counts()
+
+    def sample(self, target=None, size=SAMPLE_ROWS, strata=None, cancel_event=None):
+        """Próba celu analiz; w pamięci to widok pozycji, więc późniejsze edycje są w niej widoczne"""
+        target = self.current() if target is None else target
+        cached = self.sampled
+        if cached is not None and cached[0] is target and cached[1:3] == (size, strata):
+            return cached[3]
+        rng = np.random.default_rng(self.sample_seed)
+        if isinstance(target, ChunkedSource):
+            if strata is not None:
+                raise ValueError("Losowanie warstwowe jest niedostępne w trybie out-of-core")
+            sample = reservoir_sample(target, size, rng, cancel_event)
+        else:
+            if strata is not None and strata not in target.columns:
+                raise ValueError(f"Kolumna warstw '{strata}' nie istnieje")
+            sample = draw_sample(target, size, strata, rng)
+        self.sampled = (target, size, strata, sample)
+        return sample
+
+    def quick_describe(self, target=None, cancel_event=None, size=SAMPLE_ROWS, strata=None,
+                       confidence=CONFIDENCE):
+        return sample_describe(self.sample(target, size, strata, cancel_event), confidence, cancel_event)
+
+    def quick_correlation(self, target=None, cancel_event=None, size=SAMPLE_ROWS, strata=None,
+                          confidence=CONFIDENCE):
+        sample = self.sample(target, size, strata, cancel_event)
+        return sample_correlation(sample, self.numeric_columns(sample.view), confidence, cancel_event)
+
+    def column_distribution(self, column, target=None, cancel_event=None):
+        """Dane wykresu kolumny: histogram dla liczb, najczęstsze wartości z 'inne' dla pozostałych"""
+        target = self.current() if target is None else target
+        if isinstance(target, ChunkedSource):
+            # Typ kolumny jak w numeric_columns - według podglądu
+            if is_numeric_column(self.view.base[column].dtype):
+                return numeric_distribution(
+                    lambda: (block[:, 0] for block in target.numeric_blocks([column], cancel_event)),
+                    cancel_event=cancel_event)
+            return category_distribution(self.value_counts(column, target, cancel_event))
+        series = target.column(column)
+        if is_numeric_column(series.dtype):
+            return numeric_distribution(lambda: [numeric_values(series)], cancel_event=cancel_event)
+        return category_distribution(series.value_counts())
+
+    def quick_column_distribution(self, column, target=None, cancel_event=None, size=SAMPLE_ROWS, strata=None):
+        """Dane wykresu z próby, liczności przeskalowane do całej tabeli; zwraca (dane, próba)"""
+        sample = self.sample(target, size, strata, cancel_event)
+        distribution = self.column_distribution(column, sample.view, cancel_event)
+        if len(sample):
+            distribution = scale_distribution(distribution, sample.population / len(sample))
+        return distribution, sample
+
+    def check_aggregate(self, keys, measures):
+        if not keys:
+            raise ValueError("Podaj co najmniej jedną kolumnę grupującą")
+        if not measures:
+            raise ValueError("Podaj co najmniej jedną miarę")
+        if len(set(keys)) != len(keys):
+            raise ValueError("Kolumny grupujące powtarzają się")
+        for column in list(keys) + [m.column for m in measures if m.column is not None]:
+            if column not in self.view.columns:
+                raise ValueError(f"Kolumna '{column}' nie istnieje")
+        for measure in measures:
+            # Typ kolumny jak w numeric_columns - w trybie out-of-core według podglądu
+            if measure.numeric and not is_numeric_column(self.view.base[measure.column].dtype):
+                raise ValueError(f"Miara {measure} wymaga kolumny liczbowej")
+
+    def group_by(self, keys, measures, target=None, cancel_event=None):
+        """Zestawienie: miary per kombinacja wartości kluczy; kody grup i wyniki trafiają do pamięci podręcznej"""
+        target = self.current() if target is None else target
+        self.check_aggregate(keys, measures)
+        return self.aggregates.aggregate(target, list(keys), list(measures), cancel_event).copy()
+
+    def pivot(self, rows, columns, measures, target=None, cancel_event=None):
+        """Tabela przestawna - zestawienie po kluczach rows + columns rozłożone w kolumny"""
+        result = self.group_by(list(rows) + list(columns), measures, target, cancel_event)
+        return pivot_table(result, rows, columns, measures)
+
+    def build_cube(self, dimensions, measures, combinations=(), use_saved=True, cancel_event=None):
+        """Kostka OLAP na wszystkich faktach (bez filtra widoku) z dodatkowymi kuboidami `combinations`.
+
+        Kostka o tej samej definicji zapisana obok niezmienionego pliku jest wczytywana zamiast liczenia;
+        nowa jest tam zapisywana (Feather, wymaga pyarrow), o ile dane nie mają niezapisanych edycji.
+        """
+        self.check_aggregate(dimensions, measures)
+        Cube.check_measures(measures)
+        # Kostka na złączeniu zależy też od plików wymiarów - nie jest zapisywana obok faktów
+        persist = (use_saved and HAS_PYARROW and self.source_path is not None and not self.journal.active()
+                   and self.star is None and os.path.exists(self.source_path))
+        path = cube_path_for(self.source_path, dimensions, measures) if persist else None
+        if path is not None and os.path.isdir(path):
+            cube = Cube.load(path)
+            if cube.materialize(combinations, cancel_event):
+                self.save_cube(cube, path)
+        else:
+            columns = list(dict.fromkeys(list(dimensions) + [m.column for m in measures if m.column is not None]))
+            if self.source is not None:
+                chunks = self.source.unfiltered().chunks(columns, cancel_event)
+            else:
+                chunks = FrameView(self.original_df).chunks(AGG_CHUNK_ROWS, columns)
+            cube = Cube.build(chunks, dimensions, measures, combinations, cancel_event)
+            if path is not None:
+                self.save_cube(cube, path)
+        self.cube = cube
+        return cube
+
+    def save_cube(self, cube, path):
+        try:
+            cube.save(path, self.source_path)
+        except OSError:
+            pass  # Brak zapisu obok pliku nie blokuje pracy z kostką w pamięci
+
+    def cube_query(self, dimensions=(), slices=None):
+        """Zwinięcie, rozwinięcie lub wycinek kostki; zwraca (tabela, kuboid źródłowy)"""
+        if self.cube is None:
+            raise ValueError("Najpierw zbuduj kostkę")
+        return self.cube.query(dimensions, slices)
+
+    def invalidate_cube(self, column):
+        """Edycja wymiaru lub kolumny miary unieważnia kostkę (zapis na dysku dotyczy pliku źródłowego)"""
+        cube = self.cube
+        if cube is not None and (column in cube.dimensions or any(m.column == column for m in cube.measures)):
+            self.cube = None
+
+    def add_dimension(self, name, file_path, fact_key, key=None, optimize=False, cancel_event=None):
+        """Wczytuje tabelę wymiaru i dołącza ją do modelu gwiazdy (widok odświeża open_star)"""
+        if not self.loaded:
+            raise ValueError("Najpierw wczytaj tabelę faktów")
+        if self.journal.active():
+            raise ValueError("Zapisz lub cofnij edycje faktów przed dołączeniem wymiaru")
+        frame, _ = read_source(file_path, optimize, cancel_event=cancel_event)
+        dimension = DimensionTable(name, frame, key or fact_key, fact_key)
+        if self.source is not None:
+            source = self.source
+            fact_columns = source.fact_columns if isinstance(source, StarSource) else source.columns
+        else:
+            fact_columns = (self.facts if self.facts is not None else self.original_df).columns
+        star = self.star if self.star is not None else StarSchema()
+        star.add(dimension, list(fact_columns))
+        self.star = star
+        return dimension
+
+    def open_star(self, columns=None):
+        """Widok faktów ze złączonymi wymiarami.
+
+        W pamięci złączenie liczone jest tylko dla `columns` (None = wszystkie kolumny modelu);
+        w trybie out-of-core każdy fragment dostaje tylko kolumny, których potrzebuje analiza.
+        """
+        if self.star is None:
+            raise ValueError("Brak dołączonych wymiarów")
+        if self.source is not None:
+            source = self.source
+            self.set_source(StarSource(source.file_path, self.star, source.chunk_rows,
+                                       source.queries if isinstance(source, StarSource) else ()))
+        else:
+            facts = self.facts if self.facts is not None else self.original_df
+            joined = self.star.join(facts, columns)
+            self.original_df = joined
+            self.view = FrameView(joined)
+            self.journal = EditJournal()
+            self.indexes = IndexCache()
+            self.stats = StatsCache()
+            self.sampled = None
+            self.aggregates = AggregateCache()
+            self.facts = facts
+        self.cube = None
+        return self.view
+
+    def drop_star(self):
+        """Wraca do samych faktów (filtr na kolumnach wymiarów przestaje mieć sens, więc jest zdejmowany)"""
+        if self.star is None:
+            return self.view
+        if self.source is not None:
+            self.set_source(ChunkedSource(self.source.file_path, self.source.chunk_rows))
+        else:
+            self.set_data(self.facts, self.memory_report, self.source_path)
+        self.star = None
+        self.facts = None
+        self.cube = None
+        return self.view
+
+    def star_summary(self):
+        """Opis dołączonych wymiarów z udziałem dopasowanych wierszy faktów (w pamięci)"""
+        lines = []
+        for dimension in self.star.dimensions.values():
+            line = (f"{dimension.name}: {dimension.fact_key} = {dimension.key}, "
+                    f"{len(dimension.frame):,} wierszy, {len(dimension.attributes)} atrybutów")
+            if self.facts is not None:
+                line += f", dopasowano {self.star.match_ratio(self.facts, dimension.name):.1%} faktów"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def check_editable(self):
+        if self.source is not None:
+            raise ValueError("Edycja danych jest niedostępna w trybie out-of-core")
+        if self.star is not None:
+            raise ValueError("Widok modelu gwiazdy jest tylko do odczytu - edytuj tabelę faktów bez złączeń")
+
+    def set_cell(self, row, col_position, value):
+        """Zapisuje wartość komórki bieżącego widoku i zwraca poprzednią"""
+        self.check_editable()
+        df = self.original_df
+        column = self.view.columns[col_position]
+        old_value = self.view.value(row, col_position)
+        position = self.view.base_positions([row])
+        change = Change(column, RowSet(position, len(df)), old_value, value, df[column].dtype,
+                        f"Komórka [{self.view.labels([row])[0]}, {column}]: '{old_value}' → '{value}'")
+        change.apply(df)
+        self.journal.record(change)
+        self.indexes.invalidate(column)
+        self.stats.cell_changed(self.view, column, old_value, value)
+        self.aggregates.column_changed(column)
+        self.invalidate_cube(column)
+        return old_value
+
+    def replace(self, column, old_value, new_value):
+        """Zamienia wartość w kolumnie bieżącego widoku; zwraca liczbę zmienionych wierszy"""
+        dtype = self.original_df[column].dtype
+        if old_value not in MISSING_TOKENS and exact_key(dtype, old_value) is None:
+            raise ValueError(f"Wartość '{old_value}' nie pasuje do typu kolumny {column} ({dtype})")
+        return self.bulk_replace([column], [ReplaceRule("wartość", old_value, new_value)])[column]
+
+    def bulk_replace(self, columns, rules, cancel_event=None):
+        """Zamiana wg tabeli reguł w wielu kolumnach jednym przebiegiem na kolumnę.
+
+        Zwraca liczbę zmienionych komórek per kolumna; całość trafia do dziennika jako jedna zmiana.
+        """
+        self.check_editable()
+        df = self.original_df
+        planned, counts = [], {}
+        for column in columns:
+            check_cancelled(cancel_event)
+            try:
+                rows, old, new = plan_replacements(self.view.column(column), rules)
+            except ValueError as e:
+                raise ValueError(f"Kolumna {column}: {e}")
+            counts[column] = len(rows)
+            if len(rows):
+                planned.append(Change(column, RowSet(self.view.base_positions(rows), len(df)),
+                                      compact_values(old), compact_values(new), df[column].dtype,
+                                      f"{column}: {len(rows)} komórek"))
+
+        # Najpierw plan dla wszystkich kolumn - błąd w jednej nie zostawia połowy zmian
+        if planned:
+            summary = ", ".join(f"{column} ({count})" for column, count in counts.items() if count)
+            change = ChangeSet(planned, f"Zamiana wartości ({len(rules)} reguł): {summary}")
+            change.apply(df)
+            self.journal.record(change)
+            for item in planned:
+                self.indexes.invalidate(item.column)
+                self.stats.column_changed(self.view, item.column)
+                self.aggregates.column_changed(item.column)
+                self.invalidate_cube(item.column)
+        return counts
+
+    def undo(self):
+        """Cofa ostatnią zmianę; zwraca ją (albo None, gdy nie ma czego cofać)"""
+        if not self.journal.can_undo:
+            return None
+        return self.after_history(self.journal.undo(self.original_df))
+
+    def redo(self):
+        if not self.journal.can_redo:
+            return None
+        return self.after_history(self.journal.redo(self.original_df))
+
+    def after_history(self, entry):
+        for change in entry.changes:
+            self.indexes.invalidate(change.column)
+            self.stats.column_changed(self.view, change.column)
+            self.aggregates.column_changed(change.column)
+            self.invalidate_cube(change.column)
+        return entry
+
+    def replay_to_source(self, target_path=None, cancel_event=None):
+        """Nanosi zastosowane zmiany na plik źródłowy (lub jego kopię pod `target_path`)"""
+        self.check_editable()
+        replay_changes(self.source_path, target_path or self.source_path, self.journal.active(),
+                       self.original_df.index, cancel_event)
+
+    def export(self, path, cancel_event=None, columns=None, on_progress=None):
+        """Zapis bieżącego widoku (po filtrze) fragmentami; format i kompresja wynikają z rozszerzenia"""
+        target = self.current()
+        if columns is not None:
+            missing = [column for column in columns if column not in target.columns]
+            if missing:
+                raise ValueError(f"Nieznane kolumny: {', '.join(missing)}")
+        if self.source is not None:
+            return self.source.export(path, cancel_event, columns, on_progress)
+        return export_chunks(self.view.chunks(CHUNK_ROWS, columns), path,
+                             list(self.view.columns if columns is None else columns),
+                             len(self.view), on_progress, cancel_event)
+
+
+def parse_where(text):
+    """Warunek z wiersza poleceń w postaci 'kolumna;operator;wartość'"""
+    parts = text.split(';', 2)
+    if len(parts) != 3:
+        raise ValueError(f"Warunek '{text}' nie ma postaci 'kolumna;operator;wartość'")
+    column, op, value = parts
+    # Zamiast nazwy operatora można podać symbol (==, !=, >, <, ~ dla "zawiera")
+    aliases = {symbol: name for name, symbol in OPERATOR_SYMBOLS.items()}
+    aliases["~"] = "zawiera"
+    op = aliases.get(op.strip(), op.strip())
+    if op not in FILTER_OPERATORS:
+        raise ValueError(f"Nieznany operator '{op}'")
+    return Predicate(column, op, value)
+
+
+def to_jsonable(value):
+    """Wynik analizy jako struktura zgodna z JSON (NaN -> null, typy numpy i pandas)"""
+    if isinstance(value, pd.DataFrame):
+        return {str(col): to_jsonable(value[col].to_dict()) for col in value.columns}
+    if isinstance(value, pd.Series):
+        return to_jsonable(value.to_dict())
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_jsonable(item) for item in value]
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    return value if isinstance(value, str) else str(value)
+
+
+def outliers_frame(summaries):
+    """Podsumowania outlierów jako tabela (format CSV)"""
+    rows = [{key: summary[key] for key in ('column', 'lower', 'upper', 'count', 'z_count', 'approximate')}
+            for summary in summaries]
+    return pd.DataFrame(rows, columns=['column', 'lower', 'upper', 'count', 'z_count', 'approximate'])
+
+
+def run_command(session, args):
+    """Wykonuje polecenie CLI i zwraca wynik jako (tekst, tabela, struktura JSON)"""
+    if args.command == 'stats' and args.sample:
+        result = session.quick_describe(size=args.sample, strata=args.strata)
+        return format_sample_describe(result), result['bounds'], result
+    if args.command == 'stats':
+        desc = session.describe()
+        return f"Statystyki tabeli:\n{desc.to_string()}\n", desc, desc
+    if args.command == 'correlation':
+        if len(session.numeric_columns()) == 0 or len(session.view) == 0:
+            raise ValueError("Brak danych numerycznych w zbiorze.")
+        if args.sample:
+            result = session.quick_correlation(size=args.sample, strata=args.strata)
+            return format_sample_correlation(result), result['correlation'], result
+        correlation = session.correlation()
+        return f"Macierz korelacji:\n{correlation.to_string()}\n", correlation, correlation
+    if args.command == 'outliers':
+        summaries = session.outliers(args.approximate)
+        return format_outliers_report(summaries), outliers_frame(summaries), summaries
+    if args.command == 'missing':
+        summary = session.missing()
+        return format_missing_report(summary), pd.DataFrame(summary['columns']), summary
+    if args.command == 'profile':
+        missing = session.missing()
+        columns = [str(col) for col in session.view.columns]
+        profile = {
+            'rows': missing['total_cells'] // len(columns) if columns else 0,
+            'columns': columns,
+            'stats': session.describe(),
+            'correlation': session.correlation() if len(session.numeric_columns()) else {},
+            'outliers': session.outliers(args.approximate),
+            'missing': missing,
+        }
+        if session.memory_report is not None:
+            profile['memory'] = session.memory_report.to_dict(orient='records')
+        text = "\n\n".join([f"Statystyki tabeli:\n{profile['stats'].to_string()}",
+                            format_outliers_report(profile['outliers']),
+                            format_missing_report(profile['missing'])])
+        return text, None, profile
+    if args.command == 'replace':
+        for column in args.column:
+            if column not in session.view.columns:
+                raise ValueError(f"Kolumna '{column}' nie istnieje.")
+        rules = [ReplaceRule.parse(rule) for rule in args.rule]
+        if args.mapping:
+            rules += load_mapping(args.mapping)
+        if not rules:
+            raise ValueError("Podaj reguły zamiany (--rule lub --mapping).")
+        counts = session.bulk_replace(args.column, rules)
+        session.export(args.target)
+        text = "\n".join([f"{column}: {count} zmienionych komórek" for column, count in counts.items()]
+                         + [f"Zapisano: {args.target}"])
+        return text, pd.Series(counts, name='zmienione').rename_axis('kolumna').reset_index(), counts
+    if args.command == 'group':
+        measures = [Measure.parse(text) for text in args.measure] or [Measure('liczba')]
+        if args.pivot:
+            table = session.pivot(args.by, args.pivot, measures)
+        else:
+            table = session.group_by(args.by, measures)
+        text = format_aggregate(table, args.by + args.pivot, measures, session.out_of_core)
+        return text, table, table.to_dict(orient='records')
+    if args.command == 'cube':
+        measures = [Measure.parse(text) for text in args.measure] or [Measure('liczba')]
+        combinations = [[part.strip() for part in text.split(',') if part.strip()] for text in args.cuboid]
+        cube = session.build_cube(args.dimension, measures, combinations, use_saved=not args.rebuild)
+        table, source = session.cube_query(args.by, parse_slices(args.slice))
+        return format_cube_query(table, args.by, source, cube), table, table.to_dict(orient='records')
+    if args.command == 'export':
+        result = session.export(args.target, columns=args.column)
+        return format_export_summary(args.target, result), None, None
+    raise ValueError(f"Nieznane polecenie: {args.command}")
+
+
+def build_parser():
+    import argparse
+
+    # Opcje wspólne podawane po nazwie polecenia
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--where', action='append', default=[], metavar="KOLUMNA;OPERATOR;WARTOŚĆ",
+                        help=f"warunek filtra, można powtarzać; operatory: {', '.join(FILTER_OPERATORS)} "
+                             f"lub symbole ==, !=, >, <, ~")
+    common.add_argument('--any', action='store_true', help="łącz warunki przez OR (domyślnie AND)")
+    common.add_argument('--join', action='append', default=[], metavar="PLIK:KLUCZ_FAKTU=KLUCZ_WYMIARU",
+                        help="dołącz tabelę wymiaru (model gwiazdy); kolumny jako nazwa_pliku.atrybut, "
+                             "można powtarzać")
+    common.add_argument('--optimize', action='store_true', help="optymalizuj typy danych po wczytaniu")
+    common.add_argument('--cache', action='store_true', help="używaj pamięci podręcznej Feather")
+    common.add_argument('--no-indexes', action='store_true', help="filtruj bez indeksów kolumn")
+    common.add_argument('--out-of-core', action='store_true',
+                        help="czytaj plik fragmentami zamiast wczytywać go do pamięci")
+    common.add_argument('--workers', type=int, default=1,
+                        help="liczba procesów dla analiz per kolumna (domyślnie 1)")
+    common.add_argument('--format', choices=['text', 'json', 'csv'], default='text', help="format wyniku")
+    common.add_argument('--output', help="zapisz wynik do pliku zamiast na standardowe wyjście")
+    common.add_argument('--timings', action='store_true', help="czasy i pamięć etapów na standardowe wyjście błędów")
+    common.add_argument('--profile', choices=PROFILERS,
+                        help=f"zrzut profilera do katalogu {INSTRUMENTATION_DIR}")
+    common.add_argument('--log', action='store_true',
+                        help=f"dopisz czasy do dziennika {os.path.join(INSTRUMENTATION_DIR, Instrumentation.LOG_NAME)}")
+
+    parser = argparse.ArgumentParser(
+        description="Analiza pliku CSV hurtowni danych bez interfejsu graficznego.")
+    parser.add_argument('file', help="plik CSV (separator ';')")
+    commands = parser.add_subparsers(dest='command', required=True)
+    # Szybki podgląd z próby dla statystyk i korelacji
+    sampling = argparse.ArgumentParser(add_help=False)
+    sampling.add_argument('--sample', type=int, metavar="N",
+                          help="licz z losowej próby N wierszy (z przedziałami ufności)")
+    sampling.add_argument('--strata', metavar="KOLUMNA", help="losowanie warstwowe według kolumny")
+
+    commands.add_parser('stats', parents=[common, sampling], help="statystyki opisowe")
+    commands.add_parser('correlation', parents=[common, sampling], help="macierz korelacji kolumn liczbowych")
+    for name, help_text in (('outliers', "outliery (IQR i Z-score)"), ('profile', "wszystkie analizy naraz")):
+        command = commands.add_parser(name, parents=[common], help=help_text)
+        command.add_argument('--approximate', action='store_true',
+                             help="przybliżone kwantyle KLL dla bardzo dużych zbiorów")
+    commands.add_parser('missing', parents=[common], help="analiza brakujących danych")
+    export = commands.add_parser('export', parents=[common],
+                                 help="zapis (przefiltrowanych) danych do CSV (.csv.gz, .csv.zst), "
+                                      "Parquet lub Feather")
+    export.add_argument('--column', action='append', help="zapisz tylko wybrane kolumny (można powtarzać)")
+    export.add_argument('target')
+    group = commands.add_parser('group', parents=[common], help="zestawienie (group-by) lub tabela przestawna")
+    group.add_argument('--by', action='append', required=True, metavar="KOLUMNA",
+                       help="kolumna grupująca (można powtarzać)")
+    group.add_argument('--measure', action='append', default=[], metavar="FUNKCJA(KOLUMNA)",
+                       help=f"miara, można powtarzać: {', '.join(AGGREGATES)} lub percentyl pNN; "
+                            f"domyślnie liczba(*)")
+    group.add_argument('--pivot', action='append', default=[], metavar="KOLUMNA",
+                       help="kolumna, której wartości tworzą kolumny tabeli przestawnej (można powtarzać)")
+    cube = commands.add_parser('cube', parents=[common],
+                               help="kostka OLAP zapisywana obok pliku: zwinięcia, rozwinięcia i wycinki "
+                                    "(z --out-of-core zapisana kostka nie wymaga wczytania faktów)")
+    cube.add_argument('--dimension', action='append', required=True, metavar="KOLUMNA",
+                      help="wymiar kostki (można powtarzać)")
+    cube.add_argument('--measure', action='append', default=[], metavar="FUNKCJA(KOLUMNA)",
+                      help=f"miara addytywna, można powtarzać: {', '.join(CUBE_FUNCTIONS)}; domyślnie liczba(*)")
+    cube.add_argument('--cuboid', action='append', default=[], metavar="W1,W2",
+                      help="dodatkowy kuboid - podzbiór wymiarów liczony z góry (można powtarzać)")
+    cube.add_argument('--by', action='append', default=[], metavar="WYMIAR",
+                      help="wymiary wyniku (brak = suma całkowita)")
+    cube.add_argument('--slice', action='append', default=[], metavar="WYMIAR=W1,W2",
+                      help="wycinek: tylko fakty o podanych wartościach wymiaru (można powtarzać)")
+    cube.add_argument('--rebuild', action='store_true', help="policz kostkę od nowa zamiast wczytać zapisaną")
+    replace = commands.add_parser('replace', parents=[common], help="zamiana wartości w kolumnach i zapis wyniku")
+    replace.add_argument('--column', action='append', required=True, help="kolumna (można powtarzać)")
+    replace.add_argument('--rule', action='append', default=[], metavar="STARA;NOWA",
+                         help="reguła zamiany; prefiksy re: (wyrażenie regularne) i zakres: (od..do)")
+    replace.add_argument('--mapping', help="plik z regułami 'stara;nowa', jedna na wiersz")
+    replace.add_argument('target')
+    return parser
+
+
+def main(argv=None):
+    import sys
+
+    args = build_parser().parse_args(argv)
+    session = Session()
+    session.set_workers(max(1, args.workers))
+    instruments = Instrumentation()
+    instruments.set_profiler(args.profile)
+    instruments.set_log(args.log)
+    trace = instruments.start(args.command)
+    try:
+        with instruments.profiling(trace):
+            trace.begin("wczytywanie")
+            if args.out_of_core:
+                session.open_out_of_core(args.file)
+            else:
+                session.load(args.file, optimize=args.optimize, use_cache=args.cache)
+            if args.join:
+                trace.begin("złączenia")
+                for text in args.join:
+                    name, path, fact_key, key = parse_join(text)
+                    session.add_dimension(name, path, fact_key, key, optimize=args.optimize)
+                session.open_star()
+            if args.where:
+                trace.begin("filtr")
+                query = FilterQuery([parse_where(text) for text in args.where], 'OR' if args.any else 'AND')
+                session.apply_filter(query, use_indexes=not args.no_indexes)
+            trace.begin("polecenie")
+            text, table, data = run_command(session, args)
+    except (OSError, ValueError, KeyError) as e:
+        instruments.finish(trace, "błąd")
+        print(f"Błąd: {e}", file=sys.stderr)
+        return 1
+    finally:
+        session.set_workers(1)
+
+    trace.begin("formatowanie wyniku")
+    if args.format == 'json' and data is not None:
+        result = json.dumps(to_jsonable(data), ensure_ascii=False, indent=2)
+    elif args.format == 'csv' and table is not None:
+        result = table.to_csv(sep=';', index=args.command in ('stats', 'correlation'))
+    else:
+        result = text
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(result + "\n")
+    else:
+        print(result)
+    instruments.finish(trace)
+    if args.timings:
+        print(trace.report(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,19 +1,435 @@
+import functools
+import os
+import queue
+import threading
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from tkinter import filedialog, simpledialog, messagebox, Scrollbar, ttk
+from tkinter import font as tkfont
 import pandas as pd
-import numpy as np
-from scipy import stats
-import matplotlib.pyplot as plt
 import seaborn as sns
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.figure import Figure
+
+from engine import (FILTER_OPERATORS, HAS_PYARROW, HAS_ZSTD, PROFILERS, SAMPLE_ROWS, ChunkedSource, FrameView,
+                    FilterQuery, Instrumentation, JobCancelled, Predicate, Session, convert_for_column, format_cell,
+                    format_export_summary, format_memory_report, format_missing_report, format_outliers_report,
+                    format_sample_correlation, format_sample_describe, heatmap_layout, load_mapping, parse_mapping,
+                    parse_measures, parse_slices, read_source)
+
+
+class JobRunner:
+    """Wykonuje ciężkie analizy w puli wątków i przekazuje wyniki do pętli zdarzeń Tk"""
+
+    POLL_MS = 100
+
+    def __init__(self, root, on_change, workers=2):
+        self.root = root
+        self.on_change = on_change  # Wywoływane po zmianie listy aktywnych zadań
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analiza")
+        self.jobs = {}  # nazwa -> (future, cancel_event, on_done)
+        self.finished = queue.Queue()
+        self.polling = False
+
+    def running(self):
+        return list(self.jobs)
+
+    def submit(self, name, func, on_done):
+        """Uruchamia func(cancel_event) w tle; zwraca False, jeśli zadanie o tej nazwie już trwa"""
+        if name in self.jobs:
+            return False
+        cancel_event = threading.Event()
+        future = self.executor.submit(func, cancel_event)
+        self.jobs[name] = (future, cancel_event, on_done)
+        # Wątek roboczy tylko zgłasza koniec - widgety obsługuje pętla Tk
+        future.add_done_callback(lambda f: self.finished.put(name))
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.POLL_MS, self.poll)
+        self.on_change()
+        return True
+
+    def cancel_all(self):
+        for future, cancel_event, _ in self.jobs.values():
+            cancel_event.set()
+            future.cancel()
+
+    def poll(self):
+        finished = []
+        try:
+            while True:
+                finished.append(self.finished.get_nowait())
+        except queue.Empty:
+            pass
+
+        for name in finished:
+            future, cancel_event, on_done = self.jobs.pop(name)
+            if future.cancelled():
+                on_done(None, JobCancelled())
+                continue
+            error = future.exception()
+            on_done(None if error else future.result(), error)
+
+        if finished:
+            self.on_change()
+        if self.jobs:
+            self.root.after(self.POLL_MS, self.poll)
+        else:
+            self.polling = False
+
+
+class VirtualTable(tk.Frame):
+    """Wirtualna tabela - formatuje tylko widoczne okno wierszy i kolumn"""
+
+    MAX_COLUMN_CHARS = 40
+    WIDTH_SAMPLE_ROWS = 100
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.view = None
+        self.first_row = 0
+        self.first_col = 0
+        self.visible_rows = 0
+        self.visible_cols = []
+        self.column_widths = []
+        self.column_dtypes = []
+        self.geometry_cache = {}  # układ kolumn (nazwy i typy) -> szerokości kolumn
+        self.items = []
+
+        self.font = tkfont.Font(family="Consolas", size=10)
+        self.char_width = self.font.measure("0")
+        self.row_height = self.font.metrics("linespace") + 4
+        style = ttk.Style(self)
+        style.configure("Virtual.Treeview", font=self.font, rowheight=self.row_height)
+
+        # Suwaki sterują pozycją okna, a nie przewijaniem widgetu
+        self.scroll_y = Scrollbar(self, orient="vertical", command=self.yview)
+        self.scroll_y.pack(side="right", fill="y")
+        self.scroll_x = Scrollbar(self, orient="horizontal", command=self.xview)
+        self.scroll_x.pack(side="bottom", fill="x")
+
+        self.tree = ttk.Treeview(self, show="tree headings", selectmode="browse",
+                                 style="Virtual.Treeview")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.tree.heading("#0", text="#")
+
+        self.tree.bind("<Configure>", lambda e: self.refresh())
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(3))
+        self.tree.bind("<Shift-MouseWheel>", lambda e: self.scroll_cols(-1 if e.delta > 0 else 1))
+        self.tree.bind("<Up>", lambda e: self.scroll_rows(-1))
+        self.tree.bind("<Down>", lambda e: self.scroll_rows(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll_rows(-self.visible_rows))
+        self.tree.bind("<Next>", lambda e: self.scroll_rows(self.visible_rows))
+        self.tree.bind("<Home>", lambda e: self.scroll_rows(-self.row_count()))
+        self.tree.bind("<End>", lambda e: self.scroll_rows(self.row_count()))
+        self.tree.bind("<Left>", lambda e: self.scroll_cols(-1))
+        self.tree.bind("<Right>", lambda e: self.scroll_cols(1))
+
+    def bind_cell(self, sequence, callback):
+        """Wiąże zdarzenie z obszarem komórek tabeli"""
+        self.tree.bind(sequence, callback)
+
+    def row_count(self):
+        return 0 if self.view is None else len(self.view)
+
+    def set_view(self, view):
+        """Ustawia widok danych do wyświetlenia i przelicza szerokości kolumn"""
+        self.view = view
+        self.first_row = 0
+        self.first_col = 0
+        self.visible_cols = []
+        self.column_dtypes = [str(dtype) for dtype in view.base.dtypes]
+        schema = (tuple(view.columns), tuple(self.column_dtypes))
+        if schema not in self.geometry_cache:
+            self.geometry_cache[schema] = self.measure_columns(view)
+        # Kopia - poszerzenia po edycji nie zmieniają zapamiętanego układu
+        self.column_widths = list(self.geometry_cache[schema])
+        self.tree.configure(columns=())
+        self.refresh()
+
+    def update_view(self, view):
+        """Podmienia widok o tym samym układzie bez zmiany pozycji przewijania"""
+        self.view = view
+        self.refresh()
+
+    def update_cell(self, row, col_idx):
+        """Po edycji jednej komórki przerysowuje tylko ją (lub widoczną część jej kolumny,
+        gdy zmienił się typ kolumny) - bez odświeżania całego okna"""
+        dtype = str(self.view.base.dtypes.iloc[col_idx])
+        if dtype != self.column_dtypes[col_idx]:
+            self.column_dtypes[col_idx] = dtype
+            rows = range(self.first_row, self.first_row + len(self.items))
+        else:
+            rows = [row]
+
+        col_id = f"c{col_idx}"
+        visible = col_idx in self.visible_cols
+        for data_row in rows:
+            item = data_row - self.first_row
+            if not 0 <= item < len(self.items):
+                continue
+            text = format_cell(self.view.value(data_row, col_idx))
+            width = (min(len(text), self.MAX_COLUMN_CHARS) + 2) * self.char_width
+            if width > self.column_widths[col_idx]:
+                self.column_widths[col_idx] = width
+                if visible:
+                    self.tree.column(col_id, width=width)
+            if visible:
+                self.tree.set(self.items[item], col_id, text)
+
+    def measure_columns(self, view):
+        """Szacuje szerokości kolumn na podstawie nagłówków i próbki wierszy"""
+        sample = view.window(0, self.WIDTH_SAMPLE_ROWS, slice(None))
+        widths = []
+        for col_idx, col_name in enumerate(view.columns):
+            chars = len(str(col_name))
+            for value in sample.iloc[:, col_idx]:
+                chars = max(chars, len(format_cell(value)))
+            chars = min(chars, self.MAX_COLUMN_CHARS)
+            widths.append((chars + 2) * self.char_width)
+        return widths
+
+    def refresh(self):
+        """Odświeża widoczne okno - koszt zależy od rozmiaru okna, nie liczby wierszy"""
+        if self.view is None:
+            return
+
+        total_rows = self.row_count()
+        height = self.tree.winfo_height()
+        self.visible_rows = max(1, height // self.row_height - 1)
+        self.first_row = max(0, min(self.first_row, total_rows - self.visible_rows))
+        last_row = min(total_rows, self.first_row + self.visible_rows)
+
+        # Kolumny mieszczące się w szerokości widoku
+        total_cols = len(self.column_widths)
+        self.first_col = max(0, min(self.first_col, total_cols - 1))
+        available = max(self.tree.winfo_width(), 1) - self.char_width * 8
+        visible_cols = []
+        used = 0
+        for col_idx in range(self.first_col, total_cols):
+            if visible_cols and used + self.column_widths[col_idx] > available:
+                break
+            visible_cols.append(col_idx)
+            used += self.column_widths[col_idx]
+
+        if visible_cols != self.visible_cols:
+            self.visible_cols = visible_cols
+            col_ids = [f"c{col_idx}" for col_idx in visible_cols]
+            self.tree.configure(columns=col_ids)
+            self.tree.column("#0", width=self.char_width * 8, stretch=False)
+            for col_id, col_idx in zip(col_ids, visible_cols):
+                self.tree.heading(col_id, text=str(self.view.columns[col_idx]))
+                self.tree.column(col_id, width=self.column_widths[col_idx], stretch=False)
+
+        # Formatowanie tylko widocznego wycinka
+        window = self.view.window(self.first_row, last_row, visible_cols)
+        labels = window.index
+        rows = window.itertuples(index=False, name=None)
+
+        needed = last_row - self.first_row
+        while len(self.items) < needed:
+            self.items.append(self.tree.insert("", tk.END))
+        while len(self.items) > needed:
+            self.tree.delete(self.items.pop())
+
+        for iid, label, row in zip(self.items, labels, rows):
+            self.tree.item(iid, text=str(label), values=[format_cell(v) for v in row])
+
+        if total_rows:
+            self.scroll_y.set(self.first_row / total_rows, last_row / total_rows)
+        else:
+            self.scroll_y.set(0, 1)
+        if total_cols and visible_cols:
+            self.scroll_x.set(self.first_col / total_cols, (visible_cols[-1] + 1) / total_cols)
+        else:
+            self.scroll_x.set(0, 1)
+
+    def scroll_rows(self, delta):
+        self.first_row += delta
+        self.refresh()
+        return "break"
+
+    def scroll_cols(self, delta):
+        self.first_col += delta
+        self.refresh()
+        return "break"
+
+    def on_mouse_wheel(self, event):
+        return self.scroll_rows(-3 if event.delta > 0 else 3)
+
+    @staticmethod
+    def scroll_target(args, current, page, total):
+        """Przelicza polecenie suwaka (moveto/scroll) na nową pozycję okna"""
+        if args[0] == "moveto":
+            return int(float(args[1]) * total)
+        step = int(args[1])
+        if len(args) > 2 and args[2] == "pages":
+            step *= max(page, 1)
+        return current + step
+
+    def yview(self, *args):
+        self.first_row = self.scroll_target(args, self.first_row, self.visible_rows, self.row_count())
+        self.refresh()
+
+    def xview(self, *args):
+        self.first_col = self.scroll_target(args, self.first_col, len(self.visible_cols),
+                                            len(self.column_widths))
+        self.refresh()
+
+    def cell_at(self, x, y):
+        """Zwraca (pozycja wiersza, indeks kolumny) komórki pod kursorem lub None"""
+        iid = self.tree.identify_row(y)
+        column = self.tree.identify_column(x)
+        if not iid or iid not in self.items or not column or column == "#0":
+            return None
+        display_idx = int(column[1:]) - 1
+        if display_idx < 0 or display_idx >= len(self.visible_cols):
+            return None
+        return self.first_row + self.items.index(iid), self.visible_cols[display_idx]
+
+
+class PlotPanel(tk.Frame):
+    """Wykres osadzony w Tk - jedna figura czyszczona i rysowana ponownie przy każdym wykresie"""
+
+    SAMPLE_NOTE = "Wartości przybliżone - liczności z próby przeskalowane do całej tabeli"
+    MAX_LABEL_CHARS = 25
+    LOG_SCALE_RATIO = 50  # Słupek 'inne' tyle razy wyższy od pozostałych - oś logarytmiczna
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.figure = Figure(figsize=(10, 7), layout="constrained")
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self)
+        toolbar = NavigationToolbar2Tk(self.canvas, self, pack_toolbar=False)
+        toolbar.update()
+        toolbar.pack(side="bottom", fill="x")
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+
+    def redraw(self, paint):
+        self.figure.clear()
+        paint(self.figure)
+        self.canvas.draw_idle()
+
+    def mark_sampled(self, note):
+        self.figure.supxlabel(note, fontsize=8, color='darkred')
+
+    def show_distribution(self, column, distribution, sample=None):
+        """Słupki (najczęstsze wartości z 'inne') albo histogram z przedziałów policzonych w silniku"""
+        def paint(figure):
+            ax = figure.add_subplot()
+            color = 'orange' if sample is not None else 'skyblue'
+            counts = distribution['counts']
+            if distribution['kind'] == 'hist':
+                ax.stairs(counts, distribution['edges'], fill=True, color=color)
+                kind = "Histogram"
+            else:
+                labels = [str(label)[:self.MAX_LABEL_CHARS] for label in counts.index]
+                bars = ax.bar(range(len(counts)), counts.to_numpy(), color=color)
+                ax.set_xticks(range(len(counts)), labels, rotation=45, ha='right')
+                if distribution['other']:
+                    bars[-1].set_color('gray')
+                    if counts.iloc[-1] > self.LOG_SCALE_RATIO * counts.iloc[:-1].max():
+                        ax.set_yscale('log')
+                kind = "Wykres słupkowy"
+            title = f"{kind} dla kolumny: {column}"
+            if distribution['distinct'] is not None:
+                title += f" ({distribution['distinct']} różnych wartości{' w próbie' if sample is not None else ''})"
+            ax.set_title(title + (" - PRÓBA" if sample is not None else ""))
+            ax.set_xlabel(column)
+            ax.set_ylabel("Szacowana liczba wystąpień" if sample is not None else "Liczba wystąpień")
+            if sample is not None:
+                self.mark_sampled(f"{self.SAMPLE_NOTE} ({sample})")
+
+        self.redraw(paint)
+
+    def show_heatmap(self, layout, title, sample=None):
+        """Mapa korelacji; `layout` z heatmap_layout (grupowanie, bloki, opisy komórek)"""
+        matrix, annotate, note = layout
+
+        def paint(figure):
+            ax = figure.add_subplot()
+            sns.heatmap(matrix, ax=ax, annot=annotate, fmt='.2f', cmap='coolwarm', vmin=-1, vmax=1,
+                        xticklabels='auto', yticklabels='auto')
+            ax.set_title(title + (f"\n{note}" if note else "") + (" - PRÓBA" if sample is not None else ""))
+            if sample is not None:
+                self.mark_sampled(f"Korelacje z próby ({sample})")
+
+        self.redraw(paint)
+
+
+PROFILE_WAIT = 0.25  # Zadanie w tle czeka na zwolnienie profilera przez wątek Tk, który je uruchomił
+
+
+class CsvLoader(threading.Thread):
+    """Wczytuje plik CSV fragmentami w wątku roboczym i raportuje postęp przez kolejkę"""
+
+    def __init__(self, file_path, trace, instruments, optimize=False, use_cache=False):
+        super().__init__(daemon=True)
+        self.file_path = file_path
+        self.trace = trace  # Pomiar operacji - etapy wczytywania zaczynają się w tym wątku
+        self.instruments = instruments
+        self.optimize = optimize
+        self.use_cache = use_cache and HAS_PYARROW
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def report(self, kind, payload):
+        if kind == 'stage':
+            self.trace.begin(payload.rstrip('.'))
+        self.events.put((kind, payload))
+
+    def run(self):
+        try:
+            with self.instruments.profiling(self.trace, wait=PROFILE_WAIT):
+                self.trace.begin("wczytywanie CSV")
+                result = read_source(self.file_path, self.optimize, self.use_cache, self.report, self.cancel_event)
+            self.trace.begin("przekazanie wyniku")
+            self.events.put(('done', result))
+        except JobCancelled:
+            self.events.put(('cancelled', None))
+        except Exception as e:
+            self.events.put(('error', e))
+
+
+def instrumented(name, background=False):
+    """Mierzy metodę aplikacji jako operację o danej nazwie (czasy etapów na pasku stanu).
+
+    Dla `background=True` profiler obejmuje obliczenia w zadaniu w tle, a nie wątek Tk.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.measure(name, profile=not background):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
 
 
 class DataWarehouseApp:
+    LOADER_POLL_MS = 100
+
     def __init__(self, root):
         self.root = root
         self.root.title("Projekt Hurtownie Danych - Mateusz Florian")
         self.root.geometry("1400x900")
-        self.df = None
-        self.original_df = None  # Kopia oryginalnych danych
+        self.session = Session()  # Dane, widok, indeksy i statystyki (silnik wspólny z CLI)
+        self.loader = None  # Aktywny wątek wczytujący CSV
+        self.export_progress = None  # Ostatni postęp zapisu z wątku roboczego
+        self.sample_size = SAMPLE_ROWS  # Liczność próby szybkiego podglądu
+        self.sample_strata = None  # Kolumna warstw (None = losowanie proste)
+        self.last_measures = "liczba(*)"  # Miary ostatniego zestawienia (podpowiedź w oknie)
+        self.cube_window = None  # Okno kostki OLAP - definicja i zapytania
+        self.exact_action = None  # Dokładna wersja ostatniej analizy z próby
+        self.plot_window = None  # Okno wykresów - tworzone raz i używane ponownie
+        self.plot_panel = None
+        self.instruments = Instrumentation()  # Czasy etapów operacji, dziennik JSON i profiler
+        self.active_trace = None  # Pomiar operacji obsługiwanej właśnie w pętli Tk
+        self.data_info = ""  # Opis danych na pasku stanu (obok czasu ostatniej operacji)
         self.dark_mode = False
 
         # Kolory dla motywów
@@ -38,6 +454,9 @@ class DataWarehouseApp:
             }
         }
 
+        # Analizy w tle - wyniki wracają do pętli Tk przez root.after
+        self.jobs = JobRunner(self.root, self.update_jobs_indicator)
+
         self.create_widgets()
         self.apply_theme()
 
@@ -51,6 +470,66 @@ class DataWarehouseApp:
         menubar.add_cascade(label="Widok", menu=view_menu)
         view_menu.add_command(label="Przełącz motyw", command=self.toggle_theme)
 
+        # Menu Edycja
+        edit_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Edycja", menu=edit_menu)
+        edit_menu.add_command(label="Cofnij", accelerator="Ctrl+Z", command=self.undo)
+        edit_menu.add_command(label="Ponów", accelerator="Ctrl+Y", command=self.redo)
+        edit_menu.add_command(label="Historia zmian", command=self.show_history)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Zapisz zmiany w pliku źródłowym...", command=self.replay_to_source)
+        self.root.bind('<Control-z>', lambda e: self.undo())
+        self.root.bind('<Control-y>', lambda e: self.redo())
+
+        # Menu Dane
+        data_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Dane", menu=data_menu)
+        self.optimize_dtypes_var = tk.BooleanVar(value=False)
+        data_menu.add_checkbutton(label="Optymalizuj typy przy wczytywaniu",
+                                  variable=self.optimize_dtypes_var)
+        data_menu.add_command(label="Raport optymalizacji typów", command=self.show_memory_report)
+        self.use_cache_var = tk.BooleanVar(value=HAS_PYARROW)
+        data_menu.add_checkbutton(label="Pamięć podręczna Feather obok CSV", variable=self.use_cache_var,
+                                  state="normal" if HAS_PYARROW else "disabled")
+        self.use_indexes_var = tk.BooleanVar(value=True)
+        data_menu.add_checkbutton(label="Indeksy kolumn przy filtrowaniu", variable=self.use_indexes_var)
+        self.out_of_core_var = tk.BooleanVar(value=False)
+        data_menu.add_checkbutton(label="Tryb out-of-core (pliki większe niż RAM)", variable=self.out_of_core_var)
+        data_menu.add_separator()
+        data_menu.add_command(label="Dołącz tabelę wymiaru...", command=self.join_dimension)
+        data_menu.add_command(label="Kolumny modelu gwiazdy...", command=self.star_columns)
+        data_menu.add_command(label="Usuń złączenia", command=self.drop_star)
+
+        # Menu Analiza
+        analysis_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Analiza", menu=analysis_menu)
+        self.approx_quantiles_var = tk.BooleanVar(value=False)
+        analysis_menu.add_checkbutton(label="Przybliżone kwantyle (KLL) dla bardzo dużych kolumn",
+                                      variable=self.approx_quantiles_var)
+        analysis_menu.add_command(label="Liczba procesów analiz...", command=self.set_workers)
+        analysis_menu.add_separator()
+        self.quick_look_var = tk.BooleanVar(value=False)
+        analysis_menu.add_checkbutton(label="Szybki podgląd z próby (statystyki, korelacja, wykres)",
+                                      variable=self.quick_look_var)
+        analysis_menu.add_command(label="Parametry próby...", command=self.set_sample_options)
+        analysis_menu.add_command(label="Przelicz dokładnie ostatnią analizę", command=self.upgrade_to_exact)
+
+        # Menu Diagnostyka
+        diagnostics_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Diagnostyka", menu=diagnostics_menu)
+        diagnostics_menu.add_command(label="Szczegóły ostatniej operacji", command=self.show_last_trace)
+        self.timing_log_var = tk.BooleanVar(value=False)
+        diagnostics_menu.add_checkbutton(label="Dziennik czasów operacji (JSON)", variable=self.timing_log_var,
+                                         command=self.toggle_timing_log)
+        diagnostics_menu.add_separator()
+        self.profiler_var = tk.StringVar(value="")
+        diagnostics_menu.add_radiobutton(label="Bez profilera", variable=self.profiler_var, value="",
+                                         command=self.set_profiler)
+        for profiler, label in zip(PROFILERS, ("Profiler cProfile (czas funkcji)", "Profiler tracemalloc (alokacje)")):
+            diagnostics_menu.add_radiobutton(label=label, variable=self.profiler_var, value=profiler,
+                                             command=self.set_profiler)
+        diagnostics_menu.add_command(label="Katalog pomiarów...", command=self.choose_instrumentation_dir)
+
         # Główny frame
         main_frame = tk.Frame(self.root)
         main_frame.pack(fill="both", expand=True)
@@ -70,6 +549,10 @@ class DataWarehouseApp:
                                                                                                               pady=3)
         tk.Button(button_frame, text="📈 Wykres kolumny", width=20, command=self.plot_column).grid(row=0, column=3,
                                                                                                   padx=3, pady=3)
+        tk.Button(button_frame, text="🧮 Zestawienie / pivot", width=20, command=self.group_data).grid(row=0, column=4,
+                                                                                                      padx=3, pady=3)
+        tk.Button(button_frame, text="🧊 Kostka OLAP", width=20, command=self.cube_dialog).grid(row=1, column=4,
+                                                                                               padx=3, pady=3)
 
         # Druga linia przycisków
         tk.Button(button_frame, text="🗂️ Wyodrębnij podtabelę", width=20, command=self.extract_subtable).grid(row=1,
@@ -95,9 +578,21 @@ class DataWarehouseApp:
         tk.Button(button_frame, text="🔄 Resetuj filtr", width=20, command=self.reset_filter).grid(row=2, column=3,
                                                                                                   padx=3, pady=3)
 
-        # Frame na dane z suwakami
-        text_frame = tk.Frame(main_frame)
-        text_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        # Obszar danych: wirtualna tabela i tekst raportów w tym samym miejscu
+        content_frame = tk.Frame(main_frame)
+        content_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        content_frame.grid_rowconfigure(0, weight=1)
+        content_frame.grid_columnconfigure(0, weight=1)
+
+        self.table = VirtualTable(content_frame)
+        self.table.grid(row=0, column=0, sticky="nsew")
+
+        # Wiązanie dwukliku dla edycji komórek
+        self.table.bind_cell("<Double-Button-1>", self.on_double_click)
+
+        text_frame = tk.Frame(content_frame)
+        text_frame.grid(row=0, column=0, sticky="nsew")
+        self.text_frame = text_frame
 
         # Suwak pionowy
         self.scroll_y = Scrollbar(text_frame, orient="vertical")
@@ -118,14 +613,6 @@ class DataWarehouseApp:
         self.scroll_y.configure(command=self.text.yview)
         self.scroll_x.configure(command=self.text.xview)
 
-        # Wiązanie dwukliku dla edycji komórek
-        self.text.bind("<Double-Button-1>", self.on_double_click)
-
-        # Zmienne do śledzenia struktury tabeli
-        self.table_start_line = None
-        self.column_positions = []
-        self.row_positions = []
-
         # Status bar
         self.status_frame = tk.Frame(main_frame)
         self.status_frame.pack(side="bottom", fill="x", pady=(5, 0))
@@ -134,14 +621,24 @@ class DataWarehouseApp:
                                      relief="sunken", anchor="w")
         self.status_label.pack(side="left", fill="x", expand=True)
 
-        self.info_label = tk.Label(self.status_frame, text="",
-                                   relief="sunken", anchor="e", width=30)
+        self.info_label = tk.Label(self.status_frame, text="", relief="sunken", anchor="e")
         self.info_label.pack(side="right")
 
+        # Przycisk anulowania widoczny tylko podczas wczytywania
+        self.cancel_button = tk.Button(self.status_frame, text="⏹ Anuluj", command=self.cancel_loading)
+
+        # Wskaźnik zadań w tle i ich anulowanie
+        self.jobs_label = tk.Label(self.status_frame, text="", relief="sunken", anchor="w")
+        self.cancel_jobs_button = tk.Button(self.status_frame, text="⏹ Anuluj analizy", command=self.cancel_jobs)
+
+        # Ponowne uruchomienie ostatniej analizy z próby na wszystkich wierszach
+        self.exact_button = tk.Button(self.status_frame, text="🎯 Przelicz dokładnie", command=self.upgrade_to_exact)
+
         # Przechowywanie referencji do elementów interfejsu
         self.ui_elements = [
-            button_frame, text_frame, self.text, self.scroll_y, self.scroll_x,
-            self.status_frame, self.status_label, self.info_label
+            button_frame, content_frame, self.table, text_frame, self.text, self.scroll_y, self.scroll_x,
+            self.status_frame, self.status_label, self.info_label, self.cancel_button,
+            self.jobs_label, self.cancel_jobs_button, self.exact_button
         ]
 
     def apply_theme(self):
@@ -155,6 +652,15 @@ class DataWarehouseApp:
         for widget in self.root.winfo_children():
             self.configure_widget_theme(widget, theme)
 
+        # Tabela danych korzysta ze stylów ttk
+        style = ttk.Style(self.root)
+        style.configure("Virtual.Treeview", background=theme['text_bg'],
+                        fieldbackground=theme['text_bg'], foreground=theme['fg'])
+        style.configure("Virtual.Treeview.Heading", background=theme['button_bg'],
+                        foreground=theme['fg'])
+        style.map("Virtual.Treeview", background=[('selected', theme['select_bg'])],
+                  foreground=[('selected', theme['select_fg'])])
+
     def configure_widget_theme(self, widget, theme):
         """Rekurencyjnie konfiguruje motyw dla widget'a i jego dzieci"""
         try:
@@ -194,128 +700,559 @@ class DataWarehouseApp:
         """Aktualizuje status bar"""
         self.status_label.config(text=message)
         if info:
-            self.info_label.config(text=info)
+            self.data_info = info
+            self.refresh_info()
 
     def update_data_info(self):
         """Aktualizuje informacje o danych w status bar"""
-        if self.df is not None:
-            rows, cols = self.df.shape
+        if self.session.out_of_core:
+            rows, cols = self.session.view.shape
+            info = f"Out-of-core | Podgląd: {rows} wierszy | Kolumny: {cols}"
+            if self.session.source.is_filtered:
+                info += " | Filtrowane"
+        elif self.session.view is not None:
+            rows, cols = self.session.view.shape
             info = f"Wiersze: {rows} | Kolumny: {cols}"
-            if self.original_df is not None and len(self.df) != len(self.original_df):
-                info += f" | Filtrowane z {len(self.original_df)}"
-            self.info_label.config(text=info)
+            if self.session.original_df is not None and len(self.session.view) != len(self.session.original_df):
+                info += f" | Filtrowane z {len(self.session.original_df)}"
+        else:
+            return
+        if self.session.star is not None:
+            info += f" | Model gwiazdy: {len(self.session.star.dimensions)} wymiarów"
+        self.data_info = info
+        self.refresh_info()
+
+    def refresh_info(self):
+        """Opis danych i czas ostatniej operacji (z najdłuższymi etapami) po prawej stronie paska stanu"""
+        parts = [self.data_info] if self.data_info else []
+        if self.instruments.last is not None:
+            parts.append(self.instruments.last.summary())
+        self.info_label.config(text=" | ".join(parts))
+
+    @contextmanager
+    def measure(self, name, profile=True):
+        """Mierzy operację wywołaną z interfejsu; wywołania zagnieżdżone dołączają do trwającego pomiaru"""
+        if self.active_trace is not None:
+            yield self.active_trace
+            return
+        trace = self.instruments.start(name)
+        trace.begin("interfejs")
+        with self.tracing(trace):
+            if profile:
+                with self.instruments.profiling(trace):
+                    yield trace
+            else:
+                yield trace
+
+    def measured(self, name, profile=True):
+        """Dekorator dla funkcji zagnieżdżonych (przyciski okien dialogowych) - jak `measure`"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.measure(name, profile):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    @contextmanager
+    def tracing(self, trace):
+        """Ustawia pomiar jako bieżący; zamyka go, gdy operacja nie czeka już na zadania w tle"""
+        previous, self.active_trace = self.active_trace, trace
+        try:
+            yield trace
+        except Exception:
+            self.finish_trace(trace, "błąd")
+            raise
+        finally:
+            self.active_trace = previous
+        if trace.pending == 0:
+            self.finish_trace(trace)
+
+    def finish_trace(self, trace, status=None):
+        if self.instruments.finish(trace, status):
+            self.refresh_info()
+
+    def finish_active(self, status=None):
+        if self.active_trace is not None:
+            self.finish_trace(self.active_trace, status)
+
+    def show_info(self, title, message):
+        """Okno informacyjne - pomiar operacji kończy się przed czekaniem na użytkownika"""
+        self.finish_active()
+        messagebox.showinfo(title, message)
+
+    def show_error(self, title, message):
+        self.finish_active("błąd")
+        messagebox.showerror(title, message)
+
+    def run_job(self, name, func, on_success):
+        """Uruchamia analizę w tle; drugie kliknięcie nie uruchamia duplikatu.
+
+        Zadanie uruchomione w trakcie pomiaru dokłada do niego etapy: oczekiwanie w kolejce,
+        obliczenia (z profilerem), przekazanie wyniku do pętli Tk i formatowanie wyniku.
+        """
+        trace = self.active_trace
+        instruments = self.instruments
+
+        def traced(cancel):
+            with instruments.profiling(trace, wait=PROFILE_WAIT):
+                trace.begin("obliczenia")
+                result = func(cancel)
+            trace.begin("przekazanie wyniku")
+            return result
+
+        def report(result, error):
+            if isinstance(error, JobCancelled):
+                self.update_status(f"Anulowano: {name}")
+            elif error is not None:
+                self.update_status(f"Błąd: {name}")
+                self.show_error("Błąd", f"Analiza '{name}' nie powiodła się: {error}")
+            else:
+                on_success(result)
+
+        def finished(result, error):
+            if trace is None:
+                report(result, error)
+                return
+            trace.pending -= 1
+            trace.begin("formatowanie wyniku")
+            if isinstance(error, JobCancelled):
+                trace.status = "anulowano"
+            elif error is not None:
+                trace.status = "błąd"
+            with self.tracing(trace), instruments.profiling(trace):
+                report(result, error)
+
+        if trace is not None:
+            trace.pending += 1
+            trace.begin("w kolejce")
+        if not self.jobs.submit(name, func if trace is None else traced, finished):
+            if trace is not None:
+                trace.pending -= 1
+                trace.begin("interfejs")
+            self.update_status(f"Analiza '{name}' już trwa")
+            return
+        self.update_status(f"Uruchomiono w tle: {name}")
+
+    def set_workers(self):
+        """Liczba procesów dla statystyk, outlierów i analizy braków (1 = bez puli procesów)"""
+        workers = simpledialog.askinteger("Procesy analiz",
+                                          f"Liczba procesów (1-{os.cpu_count()}, 1 = jeden proces):",
+                                          initialvalue=self.session.workers, minvalue=1,
+                                          maxvalue=os.cpu_count() or 1)
+        if workers is None:
+            return
+        if self.jobs.running():
+            self.show_info("Info", "Trwają analizy w tle. Zmień liczbę procesów po ich zakończeniu.")
+            return
+        self.session.set_workers(workers)
+        self.update_status(f"Analizy per kolumna: {workers} proces(y)")
+
+    def set_sample_options(self):
+        """Liczność próby i opcjonalna kolumna warstw dla szybkiego podglądu"""
+        size = simpledialog.askinteger("Parametry próby", "Liczba wierszy w próbie:",
+                                       initialvalue=self.sample_size, minvalue=100)
+        if size is None:
+            return
+        strata = simpledialog.askstring("Parametry próby",
+                                        "Kolumna warstw (puste = losowanie proste):",
+                                        initialvalue=self.sample_strata or "")
+        if strata is None:
+            return
+        strata = strata.strip() or None
+        if strata is not None and self.session.view is not None and strata not in self.session.view.columns:
+            self.show_error("Błąd", "Podano nieprawidłową kolumnę.")
+            return
+        self.sample_size, self.sample_strata = size, strata
+        method = f"warstwy wg '{strata}'" if strata else "losowanie proste"
+        self.update_status(f"Próba szybkiego podglądu: {size} wierszy, {method}")
+
+    def quick_look(self, exact):
+        return self.quick_look_var.get() and not exact
+
+    def offer_exact(self, sample, action):
+        """Po wyniku z próby pokazuje przycisk dokładnego przeliczenia (chyba że próbą była cała tabela)"""
+        if sample.complete:
+            self.withdraw_exact()
+            return
+        self.exact_action = action
+        self.exact_button.pack(side="right", padx=(5, 0))
+
+    def withdraw_exact(self):
+        self.exact_action = None
+        self.exact_button.pack_forget()
+
+    def upgrade_to_exact(self):
+        """Uruchamia w tle dokładną wersję ostatniej analizy z próby"""
+        action = self.exact_action
+        if action is None:
+            self.update_status("Brak analizy z próby do przeliczenia")
+            return
+        self.withdraw_exact()
+        action()
+
+    def update_jobs_indicator(self):
+        """Pokazuje aktywne zadania w status bar"""
+        running = self.jobs.running()
+        if running:
+            self.jobs_label.config(text=f"⏳ Zadania ({len(running)}): {', '.join(running)}")
+            self.jobs_label.pack(side="right", padx=(5, 0))
+            self.cancel_jobs_button.pack(side="right", padx=(5, 0))
+        else:
+            self.jobs_label.pack_forget()
+            self.cancel_jobs_button.pack_forget()
+
+    def cancel_jobs(self):
+        self.jobs.cancel_all()
+        self.update_status("Anulowanie analiz w tle...")
+
+    def edits_blocked(self):
+        """Edycja danych czeka na analizy, które właśnie je czytają"""
+        if self.session.out_of_core:
+            self.show_info("Info", "W trybie out-of-core dane są tylko do odczytu.")
+            return True
+        if self.session.star is not None:
+            self.show_info("Info", "Widok modelu gwiazdy jest tylko do odczytu. "
+                                   "Usuń złączenia (Dane → Usuń złączenia), aby edytować fakty.")
+            return True
+        if self.jobs.running():
+            self.show_info("Info", "Trwają analizy w tle. Poczekaj na ich zakończenie lub je anuluj.")
+            return True
+        return False
+
+    def show_report(self, content):
+        """Wyświetla raport tekstowy w miejscu tabeli danych"""
+        trace = self.active_trace
+        if trace is not None:
+            trace.begin("wstawianie do tk.Text")
+        self.text.delete('1.0', tk.END)
+        self.text.insert(tk.END, content)
+        self.text_frame.tkraise()
+        if trace is not None:
+            trace.begin("interfejs")
+
+    def show_last_trace(self):
+        """Etapy ostatniej zmierzonej operacji: czas, udział i przyrost pamięci"""
+        if self.instruments.last is None:
+            self.show_info("Info", "Brak zmierzonych operacji.")
+            return
+        self.show_report(self.instruments.last.report())
+        self.update_status(f"Szczegóły operacji: {self.instruments.last.name}")
+
+    def toggle_timing_log(self):
+        try:
+            self.instruments.set_log(self.timing_log_var.get())
+        except OSError as e:
+            self.timing_log_var.set(False)
+            self.show_error("Błąd", f"Nie udało się otworzyć dziennika: {e}")
+            return
+        if self.instruments.logging:
+            self.update_status(f"Dziennik czasów operacji: {self.instruments.log_path}")
+        else:
+            self.update_status("Wyłączono dziennik czasów operacji")
+
+    def set_profiler(self):
+        profiler = self.profiler_var.get() or None
+        self.instruments.set_profiler(profiler)
+        if profiler is None:
+            self.update_status("Wyłączono profiler")
+        else:
+            self.update_status(f"Profiler {profiler}: zrzuty w katalogu {self.instruments.directory}")
+
+    def choose_instrumentation_dir(self):
+        directory = filedialog.askdirectory(title="Katalog pomiarów", initialdir=self.instruments.directory)
+        if not directory:
+            return
+        try:
+            self.instruments.set_directory(directory)
+        except OSError as e:
+            self.timing_log_var.set(False)
+            self.show_error("Błąd", f"Nie udało się użyć katalogu: {e}")
+            return
+        self.update_status(f"Katalog pomiarów: {directory}")
 
     def load_csv(self):
+        if self.loader is not None:
+            self.show_info("Info", "Trwa wczytywanie pliku. Anuluj je lub poczekaj na zakończenie.")
+            return
+
         file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
-        if file_path:
-            try:
-                self.df = pd.read_csv(file_path, sep=';')
-                self.original_df = self.df.copy()  # Kopia oryginału
-                self.show_data()
-                self.update_status("Plik CSV został pomyślnie wczytany")
-                self.update_data_info()
-                messagebox.showinfo("Sukces", "Plik CSV został pomyślnie wczytany.")
-            except Exception as e:
-                self.update_status("Błąd wczytywania pliku")
-                messagebox.showerror("Błąd", f"Nie udało się wczytać pliku CSV: {e}")
+        if not file_path:
+            return
+        with self.measure("Wczytywanie pliku", profile=False) as trace:
+            if self.out_of_core_var.get():
+                self.open_out_of_core(file_path)
+                return
+            trace.pending += 1  # Pomiar zamyka finish_loading albo przerwanie wczytywania
+            self.loader = CsvLoader(file_path, trace, self.instruments, optimize=self.optimize_dtypes_var.get(),
+                                    use_cache=self.use_cache_var.get())
+            self.loader.start()
+            self.cancel_button.pack(side="right", padx=(5, 0))
+            self.update_status(f"Wczytywanie pliku: {file_path}")
+            self.root.after(self.LOADER_POLL_MS, self.poll_loader)
+
+    def open_out_of_core(self, file_path):
+        """Otwiera plik bez wczytywania - w tle czytany jest tylko podgląd pierwszych wierszy"""
+        source = ChunkedSource(file_path)
+
+        def opened(preview):
+            self.session.set_source(source, preview)
+            self.close_cube_window()
+            self.show_data()
+            self.update_data_info()
+            self.update_status(f"Otwarto plik w trybie out-of-core: {file_path}")
 
-    def show_data(self):
-        if self.df is None:
-            messagebox.showerror("Błąd", "Brak wczytanego pliku CSV.")
+        self.run_job("Otwieranie pliku", lambda cancel: source.preview(cancel_event=cancel), opened)
+
+    def poll_loader(self):
+        """Odbiera zdarzenia z wątku wczytującego w pętli zdarzeń Tk"""
+        loader = self.loader
+        if loader is None:
             return
 
-        self.text.delete('1.0', tk.END)
-        table_content = f"Podgląd danych:\n{self.df.to_string(index=False)}\n"
-        self.text.insert(tk.END, table_content)
+        progress = None
+        try:
+            while True:
+                kind, payload = loader.events.get_nowait()
+                if kind == 'progress':
+                    progress = payload
+                elif kind == 'stage':
+                    self.update_status(payload)
+                    progress = None
+                elif kind == 'preview':
+                    self.table.set_view(FrameView(payload))
+                    self.table.tkraise()
+                elif kind == 'done':
+                    loader.trace.pending -= 1
+                    loader.trace.begin("wyświetlenie danych")
+                    with self.tracing(loader.trace):
+                        self.finish_loading(*payload)
+                    return
+                elif kind == 'cancelled':
+                    self.finish_trace(loader.trace, "anulowano")
+                    self.stop_loading()
+                    self.update_status("Anulowano wczytywanie pliku")
+                    if self.session.view is not None:
+                        self.show_data()
+                    return
+                elif kind == 'error':
+                    self.finish_trace(loader.trace, "błąd")
+                    self.stop_loading()
+                    self.update_status("Błąd wczytywania pliku")
+                    self.show_error("Błąd", f"Nie udało się wczytać pliku CSV: {payload}")
+                    return
+        except queue.Empty:
+            pass
+
+        if progress is not None:
+            rows, read_bytes, total_bytes, elapsed = progress
+            mb_read = read_bytes / 1024 ** 2
+            speed = mb_read / elapsed if elapsed > 0 else 0.0
+            self.update_status(f"Wczytywanie... {rows} wierszy | "
+                               f"{mb_read:.1f} / {total_bytes / 1024 ** 2:.1f} MB | {speed:.1f} MB/s")
+
+        self.root.after(self.LOADER_POLL_MS, self.poll_loader)
+
+    def stop_loading(self):
+        self.loader = None
+        self.cancel_button.pack_forget()
+
+    def cancel_loading(self):
+        """Przerywa wczytywanie po bieżącym fragmencie"""
+        if self.loader is not None:
+            self.loader.cancel()
+            self.update_status("Anulowanie wczytywania...")
+
+    def finish_loading(self, df, memory_report=None):
+        source_path = self.loader.file_path
+        self.stop_loading()
+        self.session.set_data(df, memory_report, source_path)
+        self.close_cube_window()
+        self.show_data()
+        self.update_status("Plik CSV został pomyślnie wczytany")
+        self.update_data_info()
+
+        message = "Plik CSV został pomyślnie wczytany."
+        if memory_report is not None:
+            before = memory_report['pamięć przed'].sum() / 1024 ** 2
+            after = memory_report['pamięć po'].sum() / 1024 ** 2
+            message += (f"\n\nOptymalizacja typów: {before:.1f} MB → {after:.1f} MB."
+                        f"\nSzczegóły: Dane → Raport optymalizacji typów.")
+        self.show_info("Sukces", message)
+
+    @instrumented("Raport optymalizacji typów")
+    def show_memory_report(self):
+        """Wyświetla raport pamięci per kolumna z ostatniej optymalizacji typów"""
+        if self.session.memory_report is None:
+            self.show_info("Info", "Brak raportu - włącz optymalizację typów i wczytaj plik.")
+            return
+        self.show_report(format_memory_report(self.session.memory_report))
+        self.update_status("Wyświetlono raport optymalizacji typów")
 
-        # Zapisz pozycje dla edycji komórek
-        self.parse_table_structure()
+    @instrumented("Wyświetlenie danych")
+    def show_data(self):
+        if self.session.view is None:
+            self.show_error("Błąd", "Brak wczytanego pliku CSV.")
+            return
+
+        self.table.set_view(self.session.view)
+        self.table.tkraise()
         self.update_status("Wyświetlono dane")
 
-    def show_statistics(self):
-        if self.df is None:
-            messagebox.showerror("Błąd", "Najpierw wczytaj plik CSV.")
+    def plots(self):
+        """Panel wykresów we wspólnym oknie; zamknięcie okna tylko je ukrywa"""
+        if self.plot_window is None:
+            self.plot_window = tk.Toplevel(self.root)
+            self.plot_window.title("Wykresy")
+            self.plot_window.geometry("1000x750")
+            self.plot_window.protocol("WM_DELETE_WINDOW", self.plot_window.withdraw)
+            self.plot_panel = PlotPanel(self.plot_window)
+            self.plot_panel.pack(fill="both", expand=True)
+            if self.dark_mode:
+                self.configure_widget_theme(self.plot_window, self.themes['dark'])
+        self.plot_window.deiconify()
+        self.plot_window.lift()
+        return self.plot_panel
+
+    @instrumented("Statystyki", background=True)
+    def show_statistics(self, exact=False):
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
             return
 
-        desc = self.df.describe(include='all')
-        self.text.delete('1.0', tk.END)
-        self.text.insert(tk.END, f"Statystyki tabeli:\n{desc.to_string()}\n")
-        self.update_status("Wyświetlono statystyki tabeli")
-        messagebox.showinfo("Info", "Wyświetlono statystyki tabeli.")
+        target = self.session.current()
+
+        if self.quick_look(exact):
+            size, strata = self.sample_size, self.sample_strata
+
+            def sampled(result):
+                self.show_report(format_sample_describe(result))
+                self.update_status(f"Statystyki z próby ({result['sample']})")
+                self.offer_exact(result['sample'], lambda: self.show_statistics(exact=True))
+
+            self.run_job("Statystyki", lambda cancel: self.session.quick_describe(target, cancel, size, strata),
+                         sampled)
+            return
 
-    def calculate_correlation(self):
-        if self.df is None:
-            messagebox.showerror("Błąd", "Najpierw wczytaj plik CSV.")
+        def done(desc):
+            self.withdraw_exact()
+            self.show_report(f"Statystyki tabeli:\n{desc.to_string()}\n")
+            self.update_status("Wyświetlono statystyki tabeli")
+            self.show_info("Info", "Wyświetlono statystyki tabeli.")
+
+        self.run_job("Statystyki", lambda cancel: self.session.describe(target, cancel), done)
+
+    @instrumented("Korelacja", background=True)
+    def calculate_correlation(self, exact=False):
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
             return
 
-        numeric_df = self.df.select_dtypes(include=[np.number])
-        if numeric_df.empty:
-            messagebox.showerror("Błąd", "Brak danych numerycznych w zbiorze.")
+        if len(self.session.numeric_columns()) == 0 or len(self.session.view) == 0:
+            self.show_error("Błąd", "Brak danych numerycznych w zbiorze.")
             return
 
-        correlation = numeric_df.corr(method='pearson')
-        self.text.delete('1.0', tk.END)
-        self.text.insert(tk.END, f"Macierz korelacji:\n{correlation.to_string()}\n")
+        target = self.session.current()
+
+        # Grupowanie i zmniejszanie macierzy w tle, rysowanie (matplotlib) tylko w wątku Tk
+        if self.quick_look(exact):
+            size, strata = self.sample_size, self.sample_strata
+
+            def correlate_sample(cancel):
+                result = self.session.quick_correlation(target, cancel, size, strata)
+                return result, heatmap_layout(result['correlation'])
+
+            def sampled(outcome):
+                result, layout = outcome
+                self.show_report(format_sample_correlation(result))
+                sample = result['sample']
+                self.offer_exact(sample, lambda: self.calculate_correlation(exact=True))
+                self.plots().show_heatmap(layout, 'Macierz Korelacji', sample)
+                self.update_status(f"Korelacja z próby ({sample})")
 
-        # Wykres korelacji
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(correlation, annot=True, cmap='coolwarm')
-        plt.title('Macierz Korelacji')
-        plt.show()
+            self.run_job("Korelacja", correlate_sample, sampled)
+            return
+
+        def correlate(cancel):
+            correlation = self.session.correlation(target, cancel)
+            return correlation, heatmap_layout(correlation)
 
-        self.update_status("Wyświetlono macierz korelacji")
-        messagebox.showinfo("Info", "Wyświetlono macierz korelacji i wykres.")
+        def done(outcome):
+            correlation, layout = outcome
+            self.withdraw_exact()
+            self.show_report(f"Macierz korelacji:\n{correlation.to_string()}\n")
+            self.plots().show_heatmap(layout, 'Macierz Korelacji')
+            self.update_status("Wyświetlono macierz korelacji")
+            self.show_info("Info", "Wyświetlono macierz korelacji i wykres.")
 
-    def plot_column(self):
-        if self.df is None:
-            messagebox.showerror("Błąd", "Najpierw wczytaj plik CSV.")
+        self.run_job("Korelacja", correlate, done)
+
+    def plot_column(self, column=None, exact=False):
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
             return
 
-        column = simpledialog.askstring("Wykres kolumny", "Podaj nazwę kolumny do wykresu:")
+        if column is None:
+            column = simpledialog.askstring("Wykres kolumny", "Podaj nazwę kolumny do wykresu:")
 
-        if column not in self.df.columns:
-            messagebox.showerror("Błąd", "Podano nieprawidłową kolumnę.")
+        if column not in self.session.view.columns:
+            self.show_error("Błąd", "Podano nieprawidłową kolumnę.")
             return
 
-        try:
-            plt.figure(figsize=(10, 6))
-            self.df[column].value_counts().plot(kind='bar', color='skyblue')
-            plt.title(f"Wykres słupkowy dla kolumny: {column}")
-            plt.xlabel(column)
-            plt.ylabel("Liczba wystąpień")
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            plt.show()
-
-            self.update_status(f"Wyświetlono wykres dla kolumny: {column}")
-            messagebox.showinfo("Sukces", f"Wyświetlono wykres dla kolumny: {column}")
-        except Exception as e:
-            messagebox.showerror("Błąd", f"Nie udało się utworzyć wykresu: {e}")
+        with self.measure("Wykres", profile=False):
+            self.draw_distribution(column, exact)
+
+    def draw_distribution(self, column, exact):
+        target = self.session.current()
+        quick = self.quick_look(exact)
+        size, strata = self.sample_size, self.sample_strata
+
+        def distribution(cancel):
+            if quick:
+                return self.session.quick_column_distribution(column, target, cancel, size, strata)
+            return self.session.column_distribution(column, target, cancel), None
+
+        def done(result):
+            data, sample = result
+            try:
+                self.plots().show_distribution(column, data, sample)
+            except Exception as e:
+                self.show_error("Błąd", f"Nie udało się utworzyć wykresu: {e}")
+                return
+
+            if sample is not None:
+                self.offer_exact(sample, lambda: self.plot_column(column, exact=True))
+                self.update_status(f"Wyświetlono wykres z próby dla kolumny: {column}")
+            else:
+                self.withdraw_exact()
+                self.update_status(f"Wyświetlono wykres dla kolumny: {column}")
+                self.show_info("Sukces", f"Wyświetlono wykres dla kolumny: {column}")
+
+        self.run_job("Wykres", distribution, done)
 
     def filter_data(self):
-        """Filtrowanie danych według wartości w kolumnie"""
-        if self.df is None:
-            messagebox.showerror("Błąd", "Najpierw wczytaj plik CSV.")
+        """Filtrowanie danych według warunków łączonych przez AND/OR"""
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
             return
 
         # Okno dialogowe do filtrowania
         filter_window = tk.Toplevel(self.root)
         filter_window.title("Filtrowanie danych")
-        filter_window.geometry("400x300")
+        filter_window.geometry("450x520")
 
         # Wybór kolumny
         tk.Label(filter_window, text="Wybierz kolumnę:").pack(pady=5)
         column_var = tk.StringVar()
         column_combo = ttk.Combobox(filter_window, textvariable=column_var,
-                                    values=list(self.df.columns), state="readonly")
+                                    values=list(self.session.view.columns), state="readonly")
         column_combo.pack(pady=5)
 
         # Typ filtra
         tk.Label(filter_window, text="Typ filtra:").pack(pady=5)
         filter_type = tk.StringVar(value="równa się")
         filter_combo = ttk.Combobox(filter_window, textvariable=filter_type,
-                                    values=["równa się", "zawiera", "większe niż", "mniejsze niż", "nie równa się"],
-                                    state="readonly")
+                                    values=FILTER_OPERATORS, state="readonly")
         filter_combo.pack(pady=5)
 
         # Wartość do filtrowania
@@ -324,164 +1261,131 @@ class DataWarehouseApp:
         value_entry = tk.Entry(filter_window, textvariable=value_var, width=30)
         value_entry.pack(pady=5)
 
-        def apply_filter():
+        # Lista warunków
+        predicates = []
+        predicate_list = tk.Listbox(filter_window, height=6, width=50)
+
+        def add_predicate():
             column = column_var.get()
-            filter_op = filter_type.get()
             value = value_var.get()
-
             if not column or not value:
-                messagebox.showerror("Błąd", "Wypełnij wszystkie pola.")
+                self.show_error("Błąd", "Wypełnij wszystkie pola.")
                 return
+            predicate = Predicate(column, filter_type.get(), value)
+            predicates.append(predicate)
+            predicate_list.insert(tk.END, str(predicate))
+            value_var.set("")
+
+        def remove_predicate():
+            for index in reversed(predicate_list.curselection()):
+                predicate_list.delete(index)
+                del predicates[index]
+
+        list_buttons = tk.Frame(filter_window)
+        list_buttons.pack(pady=5)
+        tk.Button(list_buttons, text="➕ Dodaj warunek", command=add_predicate).pack(side="left", padx=3)
+        tk.Button(list_buttons, text="➖ Usuń zaznaczony", command=remove_predicate).pack(side="left", padx=3)
+        predicate_list.pack(pady=5)
+
+        # Sposób łączenia i punkt startowy
+        options_frame = tk.Frame(filter_window)
+        options_frame.pack(pady=5)
+        combine_var = tk.StringVar(value="AND")
+        tk.Radiobutton(options_frame, text="Wszystkie (AND)", variable=combine_var, value="AND").pack(side="left")
+        tk.Radiobutton(options_frame, text="Dowolny (OR)", variable=combine_var, value="OR").pack(side="left")
+        narrow_var = tk.BooleanVar(value=self.session.view.is_filtered)
+        tk.Checkbutton(filter_window, text="Zawęź bieżący widok (zamiast wszystkich danych)",
+                       variable=narrow_var).pack(pady=5)
+
+        @self.measured("Filtr", profile=not self.session.out_of_core)
+        def apply_filter():
+            chosen = list(predicates)
+            # Bez listy warunków działa jak dawniej - jeden warunek z pól powyżej
+            if not chosen:
+                if not column_var.get() or not value_var.get():
+                    self.show_error("Błąd", "Wypełnij wszystkie pola.")
+                    return
+                chosen = [Predicate(column_var.get(), filter_type.get(), value_var.get())]
 
             try:
-                if filter_op == "równa się":
-                    filtered_df = self.original_df[self.original_df[column].astype(str) == value]
-                elif filter_op == "zawiera":
-                    filtered_df = self.original_df[self.original_df[column].astype(str).str.contains(value, na=False)]
-                elif filter_op == "nie równa się":
-                    filtered_df = self.original_df[self.original_df[column].astype(str) != value]
-                elif filter_op == "większe niż":
-                    filtered_df = self.original_df[
-                        pd.to_numeric(self.original_df[column], errors='coerce') > float(value)]
-                elif filter_op == "mniejsze niż":
-                    filtered_df = self.original_df[
-                        pd.to_numeric(self.original_df[column], errors='coerce') < float(value)]
-
-                self.df = filtered_df
+                query = FilterQuery(chosen, combine_var.get())
+                if self.session.out_of_core:
+                    self.filter_out_of_core(query, narrow_var.get())
+                    filter_window.destroy()
+                    return
+                self.session.apply_filter(query, narrow_var.get(), self.use_indexes_var.get())
                 self.show_data()
                 self.update_data_info()
-                self.update_status(f"Zastosowano filtr: {column} {filter_op} {value}")
+                self.update_status(f"Zastosowano filtr: {query}")
                 filter_window.destroy()
 
             except Exception as e:
-                messagebox.showerror("Błąd", f"Nie udało się zastosować filtra: {e}")
+                self.show_error("Błąd", f"Nie udało się zastosować filtra: {e}")
 
         tk.Button(filter_window, text="Zastosuj filtr", command=apply_filter).pack(pady=10)
         tk.Button(filter_window, text="Anuluj", command=filter_window.destroy).pack(pady=5)
 
+    def filter_out_of_core(self, query, narrow):
+        """Filtr strumieniowy - podgląd pasujących wierszy liczony w tle"""
+        source = self.session.filtered_source(query, narrow)
+
+        def filtered(preview):
+            self.session.set_source(source, preview)
+            self.show_data()
+            self.update_data_info()
+            self.update_status(f"Zastosowano filtr: {query}")
+
+        self.run_job("Filtr", lambda cancel: source.preview(cancel_event=cancel), filtered)
+
+    @instrumented("Reset filtra")
     def reset_filter(self):
         """Resetuje filtr i przywraca oryginalne dane"""
-        if self.original_df is not None:
-            self.df = self.original_df.copy()
+        if self.session.loaded:
+            self.session.reset_filter()
             self.show_data()
             self.update_data_info()
             self.update_status("Zresetowano filtr - przywrócono wszystkie dane")
         else:
-            messagebox.showinfo("Info", "Brak danych do przywrócenia.")
+            self.show_info("Info", "Brak danych do przywrócenia.")
 
+    @instrumented("Outliery", background=True)
     def detect_outliers(self):
         """Wykrywa outliery w danych numerycznych"""
-        if self.df is None:
-            messagebox.showerror("Błąd", "Najpierw wczytaj plik CSV.")
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
             return
 
-        numeric_columns = self.df.select_dtypes(include=[np.number]).columns
-        if len(numeric_columns) == 0:
-            messagebox.showerror("Błąd", "Brak kolumn numerycznych do analizy outlierów.")
+        if len(self.session.numeric_columns()) == 0:
+            self.show_error("Błąd", "Brak kolumn numerycznych do analizy outlierów.")
             return
 
-        outliers_info = []
+        target = self.session.current()
 
-        for col in numeric_columns:
-            # Metoda IQR (Interquartile Range)
-            Q1 = self.df[col].quantile(0.25)
-            Q3 = self.df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
+        def done(summaries):
+            self.show_report(format_outliers_report(summaries))
+            self.update_status("Przeprowadzono analizę outlierów")
 
-            outliers = self.df[(self.df[col] < lower_bound) | (self.df[col] > upper_bound)]
+        approximate = self.approx_quantiles_var.get()
+        self.run_job("Outliery", lambda cancel: self.session.outliers(approximate, target, cancel), done)
 
-            if not outliers.empty:
-                outliers_info.append(f"\n--- Kolumna: {col} ---")
-                outliers_info.append(f"Granice: {lower_bound:.2f} - {upper_bound:.2f}")
-                outliers_info.append(f"Liczba outlierów: {len(outliers)}")
-                outliers_info.append(f"Wartości outlierów: {outliers[col].tolist()}")
+    @instrumented("Analiza braków", background=True)
+    def analyze_missing_data(self):
+        """Analizuje brakujące dane"""
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
+            return
 
-                # Z-score method jako dodatkowa informacja
-                z_scores = np.abs(stats.zscore(self.df[col].dropna()))
-                z_outliers = len(z_scores[z_scores > 3])
-                outliers_info.append(f"Outliery (Z-score > 3): {z_outliers}")
+        target = self.session.current()
 
-        if outliers_info:
-            result = "ANALIZA OUTLIERÓW:\n" + "\n".join(outliers_info)
-            self.text.delete('1.0', tk.END)
-            self.text.insert(tk.END, result)
-            self.update_status("Przeprowadzono analizę outlierów")
-        else:
-            self.text.delete('1.0', tk.END)
-            self.text.insert(tk.END, "ANALIZA OUTLIERÓW:\n\nNie znaleziono outlierów w danych numerycznych.")
-            self.update_status("Nie znaleziono outlierów")
+        def done(summary):
+            self.show_report(format_missing_report(summary))
+            self.update_status("Przeprowadzono analizę brakujących danych")
 
-    def analyze_missing_data(self):
-        """Analizuje brakujące dane"""
-        if self.df is None:
-            messagebox.showerror("Błąd", "Najpierw wczytaj plik CSV.")
-            return
-
-        missing_analysis = []
-        missing_analysis.append("ANALIZA BRAKUJĄCYCH DANYCH:\n")
-
-        # Ogólne statystyki
-        total_cells = self.df.size
-        missing_cells = self.df.isnull().sum().sum()
-        missing_percentage = (missing_cells / total_cells) * 100
-
-        missing_analysis.append(f"Całkowita liczba komórek: {total_cells}")
-        missing_analysis.append(f"Brakujące komórki: {missing_cells}")
-        missing_analysis.append(f"Procent brakujących danych: {missing_percentage:.2f}%\n")
-
-        # Analiza per kolumna
-        missing_analysis.append("BRAKUJĄCE DANE PER KOLUMNA:")
-        missing_analysis.append("-" * 50)
-
-        for col in self.df.columns:
-            missing_count = self.df[col].isnull().sum()
-            missing_pct = (missing_count / len(self.df)) * 100
-            data_type = str(self.df[col].dtype)
-
-            missing_analysis.append(f"{col}:")
-            missing_analysis.append(f"  - Typ danych: {data_type}")
-            missing_analysis.append(f"  - Brakujące wartości: {missing_count}")
-            missing_analysis.append(f"  - Procent brakujących: {missing_pct:.2f}%")
-
-            if missing_count > 0:
-                # Indeksy wierszy z brakującymi danymi
-                missing_indices = self.df[self.df[col].isnull()].index.tolist()
-                missing_analysis.append(
-                    f"  - Indeksy z brakami: {missing_indices[:10]}{'...' if len(missing_indices) > 10 else ''}")
-
-            missing_analysis.append("")
-
-        # Wiersze z największą liczbą braków
-        missing_per_row = self.df.isnull().sum(axis=1)
-        worst_rows = missing_per_row.nlargest(5)
-
-        if worst_rows.max() > 0:
-            missing_analysis.append("WIERSZE Z NAJWIĘKSZĄ LICZBĄ BRAKÓW:")
-            missing_analysis.append("-" * 40)
-            for idx, missing_count in worst_rows.items():
-                if missing_count > 0:
-                    missing_analysis.append(f"Wiersz {idx}: {missing_count} brakujących wartości")
-
-        # Wzorce brakujących danych
-        if missing_cells > 0:
-            missing_analysis.append("\nWZORCE BRAKUJĄCYCH DANYCH:")
-            missing_analysis.append("-" * 30)
-            missing_combinations = self.df.isnull().value_counts().head(5)
-            for pattern, count in missing_combinations.items():
-                missing_cols = [col for col, is_missing in zip(self.df.columns, pattern) if is_missing]
-                if missing_cols:
-                    missing_analysis.append(f"Braki w kolumnach {missing_cols}: {count} wierszy")
-
-        result = "\n".join(missing_analysis)
-        self.text.delete('1.0', tk.END)
-        self.text.insert(tk.END, result)
-        self.update_status("Przeprowadzono analizę brakujących danych")
+        self.run_job("Analiza braków", lambda cancel: self.session.missing(target, cancel), done)
 
     def extract_subtable(self):
-        if self.df is None:
-            messagebox.showerror("Błąd", "Najpierw wczytaj plik CSV.")
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
             return
 
         choice = simpledialog.askstring("Podtabela",
@@ -489,166 +1393,518 @@ class DataWarehouseApp:
         if not choice:
             return
 
-        try:
-            if all(item.strip().isdigit() for item in choice.split(',')):
-                rows = [int(i.strip()) for i in choice.split(',')]
-                subtable = self.df.iloc[rows]
-            else:
-                cols = [col.strip() for col in choice.split(',')]
-                for col in cols:
-                    if col not in self.df.columns:
-                        messagebox.showerror("Błąd", f"Kolumna '{col}' nie istnieje.")
-                        return
-                subtable = self.df[cols]
-
-            self.text.delete('1.0', tk.END)
-            self.text.insert(tk.END, f"Wyodrębniona podtabela:\n{subtable.to_string(index=False)}\n")
-            self.update_status("Wyodrębniono podtabelę")
-            messagebox.showinfo("Info", "Podtabela została wyodrębniona.")
-        except Exception as e:
-            messagebox.showerror("Błąd", f"Coś poszło nie tak: {e}")
+        with self.measure("Podtabela"):
+            try:
+                if all(item.strip().isdigit() for item in choice.split(',')):
+                    rows = [int(i.strip()) for i in choice.split(',')]
+                    subtable = self.session.view.select(rows)
+                else:
+                    cols = [col.strip() for col in choice.split(',')]
+                    for col in cols:
+                        if col not in self.session.view.columns:
+                            self.show_error("Błąd", f"Kolumna '{col}' nie istnieje.")
+                            return
+                    subtable = FrameView(self.session.view.frame(cols))
+
+                # Podtabela trafia do wirtualnej tabeli (tylko podgląd, bez edycji)
+                self.table.set_view(subtable)
+                self.table.tkraise()
+                self.update_status("Wyodrębniono podtabelę")
+                self.show_info("Info", "Podtabela została wyodrębniona.")
+            except Exception as e:
+                self.show_error("Błąd", f"Coś poszło nie tak: {e}")
 
-    def replace_values(self):
-        if self.df is None:
-            messagebox.showerror("Błąd", "Najpierw wczytaj plik CSV.")
+    def group_data(self):
+        """Zestawienie (group-by) lub tabela przestawna - wynik w tabeli danych (tylko podgląd)"""
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
             return
 
-        column = simpledialog.askstring("Zamiana wartości", "Podaj nazwę kolumny:")
-        if column not in self.df.columns:
-            messagebox.showerror("Błąd", "Podano nieprawidłową kolumnę.")
+        group_window = tk.Toplevel(self.root)
+        group_window.title("Zestawienie / tabela przestawna")
+        group_window.geometry("560x520")
+
+        lists = tk.Frame(group_window)
+        lists.pack(pady=5, fill="both", expand=True)
+        choices = []
+        for title in ("Grupuj według (wiersze):", "Kolumny tabeli przestawnej (opcjonalnie):"):
+            frame = tk.Frame(lists)
+            frame.pack(side="left", padx=5, fill="both", expand=True)
+            tk.Label(frame, text=title).pack(pady=5)
+            listbox = tk.Listbox(frame, height=12, selectmode=tk.EXTENDED, exportselection=False)
+            for column in self.session.view.columns:
+                listbox.insert(tk.END, column)
+            listbox.pack(fill="both", expand=True)
+            choices.append(listbox)
+        key_list, pivot_list = choices
+
+        tk.Label(group_window, text="Miary rozdzielone przecinkami, np. liczba(*), suma(Kwota), p90(Kwota)\n"
+                                    "Funkcje: liczba, suma, średnia, min, max, unikalne, mediana, pNN (percentyl)",
+                 justify="left").pack(pady=5)
+        measures_var = tk.StringVar(value=self.last_measures)
+        tk.Entry(group_window, textvariable=measures_var, width=60).pack(pady=5)
+
+        @self.measured("Zestawienie", profile=False)
+        def run_grouping():
+            keys = [key_list.get(index) for index in key_list.curselection()]
+            pivot = [pivot_list.get(index) for index in pivot_list.curselection()]
+            if not keys:
+                self.show_error("Błąd", "Zaznacz co najmniej jedną kolumnę grupującą.")
+                return
+            if set(keys) & set(pivot):
+                self.show_error("Błąd", "Kolumna nie może być jednocześnie wierszem i kolumną tabeli przestawnej.")
+                return
+            try:
+                measures = parse_measures(measures_var.get())
+                self.session.check_aggregate(keys + pivot, measures)
+            except ValueError as e:
+                self.show_error("Błąd", str(e))
+                return
+
+            self.last_measures = measures_var.get()
+            group_window.destroy()
+            target = self.session.current()
+            approximate = self.session.out_of_core and any(m.quantile is not None for m in measures)
+
+            def aggregate(cancel):
+                if pivot:
+                    return self.session.pivot(keys, pivot, measures, target, cancel)
+                return self.session.group_by(keys, measures, target, cancel)
+
+            def done(table):
+                # Wynik trafia do wirtualnej tabeli (tylko podgląd, bez edycji) - jak podtabela
+                self.table.set_view(FrameView(table))
+                self.table.tkraise()
+                note = " (percentyle przybliżone - KLL)" if approximate else ""
+                self.update_status(f"Zestawienie według {', '.join(keys + pivot)}: {len(table)} wierszy{note}")
+
+            self.run_job("Zestawienie", aggregate, done)
+
+        buttons = tk.Frame(group_window)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text="Policz", command=run_grouping).pack(side="left", padx=3)
+        tk.Button(buttons, text="Anuluj", command=group_window.destroy).pack(side="left", padx=3)
+
+    def cube_dialog(self):
+        """Kostka OLAP: budowa (lub wczytanie zapisanej obok pliku) i zapytania zwijające kuboidy"""
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
+            return
+        if self.cube_window is not None and self.cube_window.winfo_exists():
+            self.cube_window.deiconify()
+            self.cube_window.lift()
             return
 
-        old_value = simpledialog.askstring("Zamiana wartości", "Podaj wartość do zamiany:")
-        new_value = simpledialog.askstring("Zamiana wartości", "Podaj nową wartość:")
+        cube_window = self.cube_window = tk.Toplevel(self.root)
+        cube_window.title("Kostka OLAP")
+        cube_window.geometry("560x720")
+
+        # Definicja kostki
+        tk.Label(cube_window, text="Wymiary kostki:").pack(pady=5)
+        dimension_list = tk.Listbox(cube_window, height=8, width=50, selectmode=tk.EXTENDED, exportselection=False)
+        for column in self.session.view.columns:
+            dimension_list.insert(tk.END, column)
+        dimension_list.pack(pady=5)
+        tk.Label(cube_window, text="Miary (liczba, suma, średnia, min, max), np. suma(Kwota), średnia(Kwota):").pack()
+        measures_var = tk.StringVar(value=self.last_measures)
+        tk.Entry(cube_window, textvariable=measures_var, width=60).pack(pady=5)
+        tk.Label(cube_window, text="Dodatkowe kuboidy - jeden na wiersz, wymiary po przecinku:").pack()
+        cuboids_text = tk.Text(cube_window, height=3, width=55)
+        cuboids_text.pack(pady=5)
+
+        # Zapytanie: wymiary wyniku (zwinięcie/rozwinięcie) i wycinek
+        query_frame = tk.LabelFrame(cube_window, text="Zapytanie")
+        query_frame.pack(pady=10, padx=10, fill="both", expand=True)
+        tk.Label(query_frame, text="Wymiary wyniku (brak zaznaczenia = suma całkowita):").pack(pady=5)
+        query_list = tk.Listbox(query_frame, height=6, width=50, selectmode=tk.EXTENDED, exportselection=False)
+        query_list.pack(pady=5)
+        tk.Label(query_frame, text="Wycinek, np. region=N,S; rok=2020 (pusta wartość = brak danych):").pack()
+        slices_var = tk.StringVar()
+        tk.Entry(query_frame, textvariable=slices_var, width=60).pack(pady=5)
+
+        def show_dimensions(cube):
+            query_list.delete(0, tk.END)
+            for dimension in cube.dimensions:
+                query_list.insert(tk.END, dimension)
+
+        if self.session.cube is not None:
+            show_dimensions(self.session.cube)
+
+        @self.measured("Kostka OLAP", profile=False)
+        def build():
+            dimensions = [dimension_list.get(index) for index in dimension_list.curselection()]
+            if not dimensions:
+                self.show_error("Błąd", "Zaznacz co najmniej jeden wymiar.")
+                return
+            combinations = [[part.strip() for part in line.split(',') if part.strip()]
+                            for line in cuboids_text.get("1.0", tk.END).splitlines() if line.strip()]
+            try:
+                measures = parse_measures(measures_var.get())
+                self.session.check_aggregate(dimensions, measures)
+            except ValueError as e:
+                self.show_error("Błąd", str(e))
+                return
+            self.last_measures = measures_var.get()
 
-        if old_value is None or new_value is None:
-            return
+            def built(cube):
+                if cube_window.winfo_exists():
+                    show_dimensions(cube)
+                self.show_report(cube.describe())
+                origin = "wczytano zapisaną" if cube.loaded else "zbudowano"
+                self.update_status(f"Kostka OLAP: {origin}, {len(cube.cuboids)} kuboidów, {cube.facts} faktów")
+
+            self.run_job("Kostka", lambda cancel: self.session.build_cube(dimensions, measures, combinations,
+                                                                           cancel_event=cancel), built)
 
+        @self.measured("Zapytanie kostki")
+        def query():
+            dimensions = [query_list.get(index) for index in query_list.curselection()]
+            try:
+                slices = parse_slices([part for part in slices_var.get().split(';') if part.strip()])
+                table, source = self.session.cube_query(dimensions, slices)
+            except ValueError as e:
+                self.show_error("Błąd", str(e))
+                return
+            # Wynik w wirtualnej tabeli (tylko podgląd) - jak zestawienie
+            self.table.set_view(FrameView(table))
+            self.table.tkraise()
+            self.update_status(f"Kostka: {', '.join(dimensions) or 'suma całkowita'} - {len(table)} wierszy "
+                               f"z kuboidu ({', '.join(source) or 'suma całkowita'})")
+
+        buttons = tk.Frame(cube_window)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text="Zbuduj / wczytaj kostkę", command=build).pack(side="left", padx=3)
+        tk.Button(buttons, text="Pokaż wynik", command=query).pack(side="left", padx=3)
+        tk.Button(buttons, text="Zamknij", command=cube_window.destroy).pack(side="left", padx=3)
+        if self.dark_mode:
+            self.configure_widget_theme(cube_window, self.themes['dark'])
+
+    def close_cube_window(self):
+        """Okno kostki dotyczy kolumn poprzedniego pliku"""
+        if self.cube_window is not None and self.cube_window.winfo_exists():
+            self.cube_window.destroy()
+        self.cube_window = None
+
+    def join_dimension(self):
+        """Dołącza tabelę wymiaru (model gwiazdy) - fakty zostają, wymiar trafia do pamięci w całości"""
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj tabelę faktów.")
+            return
+        if self.jobs.running():
+            self.show_info("Info", "Trwają analizy w tle. Poczekaj na ich zakończenie lub je anuluj.")
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
+        if not file_path:
+            return
         try:
-            # Próba konwersji do liczby
-            if pd.api.types.is_numeric_dtype(self.df[column]):
-                old_value = pd.to_numeric(old_value, errors='coerce')
-                new_value = pd.to_numeric(new_value, errors='coerce')
+            header = list(pd.read_csv(file_path, sep=';', nrows=0).columns)
+        except (OSError, ValueError) as e:
+            self.show_error("Błąd", f"Nie udało się odczytać nagłówka pliku: {e}")
+            return
+        star = self.session.star
+        fact_columns = [column for column in self.session.view.columns
+                        if star is None or star.resolve(column) is None]
+
+        join_window = tk.Toplevel(self.root)
+        join_window.title("Dołącz tabelę wymiaru")
+        join_window.geometry("420x300")
+
+        tk.Label(join_window, text="Nazwa wymiaru (przedrostek kolumn):").pack(pady=5)
+        name_var = tk.StringVar(value=os.path.splitext(os.path.basename(file_path))[0])
+        tk.Entry(join_window, textvariable=name_var, width=40).pack(pady=5)
+        tk.Label(join_window, text="Klucz w tabeli faktów:").pack(pady=5)
+        fact_key_var = tk.StringVar()
+        ttk.Combobox(join_window, textvariable=fact_key_var, values=fact_columns, state="readonly").pack(pady=5)
+        tk.Label(join_window, text="Klucz w tabeli wymiaru (unikalny):").pack(pady=5)
+        key_var = tk.StringVar(value=header[0] if header else "")
+        ttk.Combobox(join_window, textvariable=key_var, values=header, state="readonly").pack(pady=5)
+
+        @self.measured("Złączenie", profile=False)
+        def join():
+            name, fact_key, key = name_var.get().strip(), fact_key_var.get(), key_var.get()
+            if not name or not fact_key or not key:
+                self.show_error("Błąd", "Podaj nazwę wymiaru i wybierz klucze złączenia.")
+                return
+            join_window.destroy()
+            optimize = self.optimize_dtypes_var.get()
 
-            # Zamiana wartości
-            self.df[column] = self.df[column].replace(old_value, new_value)
+            def attach(cancel):
+                dimension = self.session.add_dimension(name, file_path, fact_key, key, optimize, cancel)
+                self.session.open_star()
+                return dimension
+
+            def done(dimension):
+                self.close_cube_window()
+                self.show_data()
+                self.update_data_info()
+                note = ""
+                if self.session.facts is not None:
+                    note = f", dopasowano {self.session.star.match_ratio(self.session.facts, name):.1%} faktów"
+                self.update_status(f"Dołączono wymiar {name}: {len(dimension.attributes)} atrybutów{note}")
+
+            self.run_job("Złączenie", attach, done)
+
+        buttons = tk.Frame(join_window)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text="Dołącz", command=join).pack(side="left", padx=3)
+        tk.Button(buttons, text="Anuluj", command=join_window.destroy).pack(side="left", padx=3)
+        if self.dark_mode:
+            self.configure_widget_theme(join_window, self.themes['dark'])
+
+    def star_columns(self):
+        """Wybór kolumn modelu gwiazdy - w pamięci liczone są tylko złączenia wybranych atrybutów"""
+        star = self.session.star
+        if star is None:
+            self.show_info("Info", "Najpierw dołącz tabelę wymiaru.")
+            return
+        if self.session.out_of_core:
+            self.show_info("Info", "W trybie out-of-core atrybuty wymiarów są dołączane tylko wtedy, "
+                                   "gdy analiza ich potrzebuje.")
+            return
+        if self.jobs.running():
+            self.show_info("Info", "Trwają analizy w tle. Poczekaj na ich zakończenie lub je anuluj.")
+            return
 
-            self.text.delete('1.0', tk.END)
-            self.text.insert(tk.END, f"Zamieniono '{old_value}' na '{new_value}' w kolumnie '{column}'.\n")
+        columns_window = tk.Toplevel(self.root)
+        columns_window.title("Kolumny modelu gwiazdy")
+        columns_window.geometry("420x460")
+        tk.Label(columns_window, text="Kolumny widoku (fakty i atrybuty wymiarów):").pack(pady=5)
+        listbox = tk.Listbox(columns_window, height=18, width=50, selectmode=tk.EXTENDED, exportselection=False)
+        current = set(self.session.view.columns)
+        for index, column in enumerate(list(self.session.facts.columns) + star.columns()):
+            listbox.insert(tk.END, column)
+            if column in current:
+                listbox.selection_set(index)
+        listbox.pack(pady=5, fill="both", expand=True)
+
+        @self.measured("Kolumny modelu gwiazdy")
+        def apply():
+            columns = [listbox.get(index) for index in listbox.curselection()]
+            if not columns:
+                self.show_error("Błąd", "Zaznacz co najmniej jedną kolumnę.")
+                return
+            columns_window.destroy()
+            self.session.open_star(columns)
+            self.close_cube_window()
             self.show_data()
-            self.update_status(f"Zamieniono wartości w kolumnie {column}")
-            messagebox.showinfo("Sukces", "Wartości zostały pomyślnie zamienione.")
-        except Exception as e:
-            messagebox.showerror("Błąd", f"Nie udało się zamienić wartości: {e}")
+            self.update_data_info()
+            self.update_status(f"Model gwiazdy: {len(columns)} kolumn")
+
+        buttons = tk.Frame(columns_window)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text="Zastosuj", command=apply).pack(side="left", padx=3)
+        tk.Button(buttons, text="Anuluj", command=columns_window.destroy).pack(side="left", padx=3)
+        if self.dark_mode:
+            self.configure_widget_theme(columns_window, self.themes['dark'])
+
+    @instrumented("Usunięcie złączeń")
+    def drop_star(self):
+        if self.session.star is None:
+            self.show_info("Info", "Brak dołączonych tabel wymiarów.")
+            return
+        if self.jobs.running():
+            self.show_info("Info", "Trwają analizy w tle. Poczekaj na ich zakończenie lub je anuluj.")
+            return
+        self.session.drop_star()
+        self.close_cube_window()
+        self.show_data()
+        self.update_data_info()
+        self.update_status("Usunięto złączenia - widok zawiera same fakty")
 
-    def save_to_csv(self):
-        if self.df is None:
-            messagebox.showerror("Błąd", "Najpierw wczytaj plik CSV.")
+    def replace_values(self):
+        """Zamiana masowa - reguły 'stara;nowa' dla wielu kolumn naraz, jeden wpis w historii"""
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
+            return
+        if self.edits_blocked():
             return
 
-        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv")])
-        if save_path:
+        replace_window = tk.Toplevel(self.root)
+        replace_window.title("Zamiana wartości")
+        replace_window.geometry("480x560")
+
+        # Wybór kolumn (wiele naraz)
+        tk.Label(replace_window, text="Kolumny (można zaznaczyć kilka):").pack(pady=5)
+        column_list = tk.Listbox(replace_window, height=8, width=50, selectmode=tk.EXTENDED, exportselection=False)
+        for column in self.session.view.columns:
+            column_list.insert(tk.END, column)
+        column_list.pack(pady=5)
+
+        # Reguły zamiany wpisywane ręcznie lub wczytane z pliku
+        tk.Label(replace_window, text="Reguły, jedna na wiersz: stara;nowa\n"
+                                      "re:wzorzec;nowa - wyrażenie regularne (kolumny tekstowe)\n"
+                                      "zakres:od..do;nowa - zakres liczb lub dat, np. zakres:..0;0\n"
+                                      "Pusta stara wartość oznacza brak danych.",
+                 justify="left").pack(pady=5)
+        rules_text = tk.Text(replace_window, height=10, width=55)
+        rules_text.pack(pady=5)
+
+        def load_rules():
+            file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv"), ("Wszystkie pliki", "*.*")])
+            if not file_path:
+                return
+            try:
+                load_mapping(file_path)  # Sprawdzenie składni przed wstawieniem do pola
+                with open(file_path, encoding='utf-8-sig') as handle:
+                    content = handle.read()
+            except (OSError, ValueError) as e:
+                self.show_error("Błąd", f"Nie udało się wczytać reguł: {e}")
+                return
+            rules_text.delete("1.0", tk.END)
+            rules_text.insert("1.0", content)
+
+        @self.measured("Zamiana wartości")
+        def apply_rules():
+            columns = [column_list.get(index) for index in column_list.curselection()]
+            if not columns:
+                self.show_error("Błąd", "Zaznacz co najmniej jedną kolumnę.")
+                return
             try:
-                self.df.to_csv(save_path, index=False, sep=';')
-                self.update_status(f"Zapisano plik: {save_path}")
-                messagebox.showinfo("Sukces", f"Plik został zapisany jako: {save_path}")
+                rules = parse_mapping(rules_text.get("1.0", tk.END))
+                if not rules:
+                    self.show_error("Błąd", "Podaj co najmniej jedną regułę zamiany.")
+                    return
+                counts = self.session.bulk_replace(columns, rules)
             except Exception as e:
-                messagebox.showerror("Błąd", f"Nie udało się zapisać pliku: {e}")
-
-    def parse_table_structure(self):
-        """Analizuje strukturę tabeli w widgecie Text dla edycji komórek"""
-        content = self.text.get('1.0', tk.END)
-        lines = content.split('\n')
-
-        # Znajdź linię z nagłówkami (pierwsza linia po "Podgląd danych:")
-        header_line_idx = None
-        for i, line in enumerate(lines):
-            if line.strip() and not line.startswith("Podgląd danych:") and line.strip() != "":
-                header_line_idx = i
-                break
+                self.show_error("Błąd", f"Nie udało się zamienić wartości: {e}")
+                return
 
-        if header_line_idx is None:
-            return
-
-        self.table_start_line = header_line_idx + 1  # +1 bo tkinter numeruje od 1
-
-        # Analizuj pozycje kolumn na podstawie nagłówków
-        header_line = lines[header_line_idx]
-        self.column_positions = []
-
-        # Znajdź kolumny DataFrame
-        if self.df is not None:
-            # Używamy to_string() żeby uzyskać identyczną strukturę
-            table_str = self.df.to_string(index=False)
-            table_lines = table_str.split('\n')
-
-            if len(table_lines) > 0:
-                header = table_lines[0]
-
-                # Znajdź pozycje kolumn
-                current_pos = 0
-                for col_name in self.df.columns:
-                    col_pos = header.find(col_name, current_pos)
-                    if col_pos != -1:
-                        col_end = col_pos + len(str(col_name))
-                        # Znajdź koniec danych kolumny (następna kolumna lub koniec linii)
-                        next_col_pos = len(header)
-                        for next_col in self.df.columns[list(self.df.columns).index(col_name) + 1:]:
-                            next_pos = header.find(next_col, col_end)
-                            if next_pos != -1:
-                                next_col_pos = next_pos
-                                break
-
-                        self.column_positions.append({
-                            'name': col_name,
-                            'start': col_pos,
-                            'end': next_col_pos,
-                            'header_end': col_end
-                        })
-                        current_pos = col_end
+            replace_window.destroy()
+            self.show_data()
+            total = sum(counts.values())
+            self.update_status(f"Zamieniono wartości: {total} komórek w {len(counts)} kolumnach")
+            lines = ["ZAMIANA WARTOŚCI:\n"]
+            lines += [f"{column}: {count} zmienionych komórek" for column, count in counts.items()]
+            lines.append("\nReguły:")
+            lines += [f"  {rule}" for rule in rules]
+            self.show_report("\n".join(lines))
+
+        buttons = tk.Frame(replace_window)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text="📂 Wczytaj reguły z pliku", command=load_rules).pack(side="left", padx=3)
+        tk.Button(buttons, text="Zamień", command=apply_rules).pack(side="left", padx=3)
+        tk.Button(buttons, text="Anuluj", command=replace_window.destroy).pack(side="left", padx=3)
+
+    @instrumented("Cofnij")
+    def undo(self):
+        """Cofa ostatnią edycję z dziennika zmian"""
+        if self.session.view is None or self.edits_blocked():
+            return
+        change = self.session.undo()
+        if change is None:
+            self.update_status("Brak zmian do cofnięcia")
+            return
+        self.table.update_view(self.session.view)
+        self.update_status(f"Cofnięto: {change.description}")
 
-    def on_double_click(self, event):
-        """Obsługuje dwuklik na komórce dla edycji"""
-        if self.df is None or not self.column_positions:
+    @instrumented("Ponów")
+    def redo(self):
+        if self.session.view is None or self.edits_blocked():
+            return
+        change = self.session.redo()
+        if change is None:
+            self.update_status("Brak zmian do ponowienia")
             return
+        self.table.update_view(self.session.view)
+        self.update_status(f"Ponowiono: {change.description}")
+
+    @instrumented("Historia zmian")
+    def show_history(self):
+        """Wyświetla dziennik zmian; zmiany po pozycji bieżącej czekają na ponowienie"""
+        journal = self.session.journal
+        lines = ["HISTORIA ZMIAN:\n"]
+        for number, change in enumerate(journal.changes, start=1):
+            marker = "" if number <= journal.position else " (cofnięta)"
+            lines.append(f"{number}. {change.description}{marker}")
+        if not journal.changes:
+            lines.append("Brak zmian.")
+        lines.append(f"\nPamięć dziennika: {journal.nbytes / 1024:.1f} KB")
+        self.show_report("\n".join(lines))
+
+    def replay_to_source(self):
+        """Nanosi zastosowane zmiany na plik źródłowy CSV (strumieniowo)"""
+        if self.session.view is None or self.edits_blocked():
+            return
+        if not len(self.session.journal):
+            self.show_info("Info", "Brak zmian do zapisania.")
+            return
+        if not messagebox.askyesno("Zapis do źródła",
+                                   f"Nadpisać plik {self.session.source_path} "
+                                   f"zmianami ({len(self.session.journal)})?"):
+            return
+        path = self.session.source_path
 
-        # Pobierz pozycję kursora
-        cursor_pos = self.text.index(tk.INSERT)
-        line_num = int(cursor_pos.split('.')[0])
-        char_num = int(cursor_pos.split('.')[1])
+        def saved(_):
+            self.update_status(f"Zapisano zmiany w pliku: {path}")
 
-        # Sprawdź czy klik był w obszarze tabeli
-        if self.table_start_line is None or line_num <= self.table_start_line:
+        with self.measure("Zapis zmian", profile=False):
+            self.run_job("Zapis zmian", lambda cancel: self.session.replay_to_source(cancel_event=cancel), saved)
+
+    def save_to_csv(self):
+        """Zapis bieżącego widoku w tle - fragmentami, bez kopii wyniku filtra"""
+        if self.session.view is None:
+            self.show_error("Błąd", "Najpierw wczytaj plik CSV.")
             return
 
-        # Oblicz wiersz danych (pomijając nagłówek)
-        data_row = line_num - self.table_start_line - 1
+        filetypes = [("CSV Files", "*.csv"), ("CSV gzip", "*.csv.gz")]
+        if HAS_ZSTD:
+            filetypes.append(("CSV zstd", "*.csv.zst"))
+        if HAS_PYARROW:
+            filetypes += [("Parquet Files", "*.parquet"), ("Feather Files", "*.feather")]
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=filetypes)
+        if not save_path:
+            return
 
-        if data_row < 0 or data_row >= len(self.df):
+        def progress(payload):
+            self.export_progress = payload  # Odczytywane w pętli Tk przez poll_export
+
+        def saved(result):
+            self.export_progress = None
+            summary = format_export_summary(save_path, result)
+            self.update_status(summary)
+            self.show_info("Sukces", summary)
+
+        self.export_progress = None
+        with self.measure("Zapis", profile=False):
+            self.run_job("Zapis", lambda cancel: self.session.export(save_path, cancel, on_progress=progress), saved)
+        self.root.after(self.LOADER_POLL_MS, self.poll_export)
+
+    def poll_export(self):
+        """Postęp i przepustowość zapisu na pasku stanu"""
+        if "Zapis" not in self.jobs.running():
             return
+        if self.export_progress is not None:
+            rows, total_rows, written_bytes, elapsed = self.export_progress
+            speed = rows / elapsed if elapsed > 0 else 0.0
+            percent = f"{rows / total_rows:.0%} | " if total_rows else ""
+            self.update_status(f"Zapis... {percent}{rows} wierszy | {written_bytes / 1024 ** 2:.1f} MB | "
+                               f"{speed:.0f} wierszy/s")
+        self.root.after(self.LOADER_POLL_MS, self.poll_export)
 
-        # Znajdź kolumnę na podstawie pozycji znaku
-        selected_column = None
-        col_index = None
+    def on_double_click(self, event):
+        """Obsługuje dwuklik na komórce dla edycji"""
+        # Edycja tylko gdy tabela pokazuje bieżące dane (nie podtabelę)
+        if self.session.view is None or self.table.view is not self.session.view:
+            return
 
-        for i, col_info in enumerate(self.column_positions):
-            if col_info['start'] <= char_num < col_info['end']:
-                selected_column = col_info['name']
-                col_index = i
-                break
+        # Trafienie komórki wyznacza model tabeli, a nie pozycja w tekście
+        cell = self.table.cell_at(event.x, event.y)
+        if cell is None or self.edits_blocked():
+            return
 
-        if selected_column is None:
+        data_row, col_index = cell
+        if data_row >= len(self.session.view):
             return
 
+        selected_column = self.session.view.columns[col_index]
+
         # Pobierz aktualną wartość
-        current_value = self.df.iloc[data_row, col_index]
+        current_value = self.session.view.value(data_row, col_index)
 
         # Utwórz okno edycji
-        self.create_cell_editor(data_row, col_index, selected_column, current_value,
-                                line_num, col_info['start'], col_info['end'])
+        self.create_cell_editor(data_row, col_index, selected_column, current_value)
 
-    def create_cell_editor(self, row_idx, col_idx, col_name, current_value,
-                           text_line, col_start, col_end):
+    def create_cell_editor(self, row_idx, col_idx, col_name, current_value):
         """Tworzy okno edycji dla pojedynczej komórki"""
         editor = tk.Toplevel(self.root)
         editor.title(f"Edycja komórki [{row_idx}, {col_name}]")
@@ -662,7 +1918,7 @@ class DataWarehouseApp:
 
         tk.Label(info_frame, text=f"Wiersz: {row_idx}", font=("Arial", 9)).pack(anchor="w")
         tk.Label(info_frame, text=f"Kolumna: {col_name}", font=("Arial", 9)).pack(anchor="w")
-        tk.Label(info_frame, text=f"Typ danych: {str(self.df[col_name].dtype)}", font=("Arial", 9)).pack(anchor="w")
+        tk.Label(info_frame, text=f"Typ danych: {str(self.session.view.base[col_name].dtype)}", font=("Arial", 9)).pack(anchor="w")
 
         # Pole edycji
         tk.Label(editor, text="Nowa wartość:", font=("Arial", 10, "bold")).pack(pady=(10, 5))
@@ -677,30 +1933,21 @@ class DataWarehouseApp:
         button_frame = tk.Frame(editor)
         button_frame.pack(pady=20)
 
+        @self.measured("Edycja komórki")
         def save_changes():
             new_value = entry_var.get()
+            if self.edits_blocked():
+                return
 
             try:
                 # Próba konwersji do odpowiedniego typu
-                if pd.api.types.is_numeric_dtype(self.df[col_name]):
-                    if new_value.strip() == "":
-                        converted_value = np.nan
-                    else:
-                        converted_value = pd.to_numeric(new_value)
-                elif pd.api.types.is_datetime64_any_dtype(self.df[col_name]):
-                    if new_value.strip() == "":
-                        converted_value = pd.NaT
-                    else:
-                        converted_value = pd.to_datetime(new_value)
-                else:
-                    converted_value = new_value if new_value.strip() != "" else np.nan
+                converted_value = convert_for_column(self.session.view.base[col_name].dtype, new_value)
 
-                # Zapisz zmianę
-                old_value = self.df.iloc[row_idx, col_idx]
-                self.df.iloc[row_idx, col_idx] = converted_value
+                # Zapisz zmianę (poszerzając typ kolumny, jeśli trzeba)
+                old_value = self.session.set_cell(row_idx, col_idx, converted_value)
 
-                # Odśwież widok
-                self.show_data()
+                # Odśwież tylko zmienioną komórkę
+                self.table.update_cell(row_idx, col_idx)
                 self.update_data_info()
 
                 # Aktualizuj status
@@ -709,9 +1956,9 @@ class DataWarehouseApp:
                 editor.destroy()
 
             except Exception as e:
-                messagebox.showerror("Błąd konwersji",
-                                     f"Nie można przekonwertować wartości '{new_value}' "
-                                     f"na typ {self.df[col_name].dtype}:\n{str(e)}")
+                self.show_error("Błąd konwersji",
+                                f"Nie można przekonwertować wartości '{new_value}' "
+                                f"na typ {self.session.view.base[col_name].dtype}:\n{str(e)}")
 
         def cancel_changes():
             editor.destroy()